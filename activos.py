@@ -0,0 +1,77 @@
+"""
+Caché local de activos gráficos (logos, imágenes fijas de los reportes).
+
+Cada activo se busca, en orden:
+  1. en memoria (bytes ya cargados),
+  2. en la carpeta de activos del repositorio (assets/<nombre>),
+  3. en la caché en disco (registro_data/activos/<nombre>),
+  4. en la red, una sola vez y con tiempo límite; el resultado se guarda
+     en la caché en disco.
+
+La descarga se hace al iniciar (`precargar`, en un hilo) y nunca durante la
+generación de un reporte: `obtener(..., red=False)` sólo mira memoria y disco.
+Si no hay red, los reportes salen sin logo en lugar de quedarse esperando.
+"""
+import os
+import threading
+import time
+
+import requests
+
+
+class Activos:
+    def __init__(self, urls: dict, carpeta_incluida: str, carpeta_cache: str,
+                 espera: float = 5.0, reintento: float = 600.0):
+        self.urls = urls                    # nombre → URL de origen
+        self.carpetas = (carpeta_incluida, carpeta_cache)
+        self.carpeta_cache = carpeta_cache
+        self.espera = espera
+        self.reintento = reintento          # segundos antes de reintentar una descarga fallida
+        self._datos = {}
+        self._fallos = {}
+        self._lock = threading.Lock()
+        os.makedirs(carpeta_cache, exist_ok=True)
+
+    def precargar(self):
+        """Carga (o descarga) todos los activos en un hilo de fondo."""
+        def cargar():
+            for nombre in self.urls:
+                self.obtener(nombre)
+        threading.Thread(target=cargar, daemon=True, name="precarga-activos").start()
+
+    def obtener(self, nombre: str, red: bool = True) -> bytes:
+        """Bytes del activo, o None si no está disponible."""
+        datos = self._datos.get(nombre)
+        if datos is None:
+            datos = self._leer_local(nombre)
+            if datos is None and red:
+                with self._lock:        # una descarga a la vez; la lectura local no espera
+                    datos = self._datos.get(nombre) or self._descargar(nombre)
+            if datos is not None:
+                self._datos[nombre] = datos
+        return datos
+
+    def _leer_local(self, nombre: str):
+        for carpeta in self.carpetas:
+            ruta = os.path.join(carpeta, nombre)
+            if os.path.exists(ruta):
+                with open(ruta, "rb") as f:
+                    return f.read()
+        return None
+
+    def _descargar(self, nombre: str):
+        url = self.urls.get(nombre)
+        if url is None or time.time() - self._fallos.get(nombre, -self.reintento) < self.reintento:
+            return None
+        try:
+            resp = requests.get(url, timeout=self.espera)
+            resp.raise_for_status()
+        except requests.RequestException:
+            self._fallos[nombre] = time.time()
+            return None
+        ruta = os.path.join(self.carpeta_cache, nombre)
+        tmp = ruta + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(resp.content)
+        os.replace(tmp, ruta)
+        return resp.content
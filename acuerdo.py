@@ -0,0 +1,132 @@
+"""
+Estadísticos de acuerdo entre evaluadores, vectorizados: cada función recibe
+una matriz con muchos ítems (o sujetos) a la vez y devuelve un arreglo por
+ítem, sin bucles de Python.
+
+  ipras(C)            método RAND/UCLA sobre C (ítems × 9, conteos de los
+                      votos 1..9):
+                        p30, p70        percentiles 30 y 70 (interpolación lineal)
+                        ipr             p70 - p30
+                        ai              índice de asimetría |5 - (p30 + p70) / 2|
+                        ipras           2,35 + 1,5 · ai
+                        desacuerdo      ipr > ipras
+  w_kendall(M)        W de Kendall de M (participantes × ítems, 0 = sin voto):
+                      concordancia del orden en que cada participante ubica
+                      los ítems. Sólo cuentan quienes votaron todos; los
+                      empates llevan rango promedio y la corrección habitual.
+  acuerdo_categorico(C)
+                      acuerdo dentro de cada pregunta categórica (p. ej. un
+                      dominio GRADE) sobre C (preguntas × categorías,
+                      conteos): proporción de pares de evaluadores que
+                      coinciden. Cada fila puede tener su propio conjunto
+                      de categorías.
+  kappa_fleiss(C)     κ de Fleiss de una pregunta categórica evaluada en
+                      varios sujetos (p. ej. un dominio GRADE en varios
+                      paquetes), sobre C (sujetos × categorías de esa
+                      pregunta, conteos): el acuerdo observado corregido por
+                      el esperado al azar según las proporciones de cada
+                      categoría.
+"""
+import numpy as np
+
+
+def _estadistico_orden(acum: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Valor (1..9) del j-ésimo voto ordenado (desde 0) de cada fila, dados los conteos acumulados."""
+    return (acum <= j[:, None]).sum(axis=1) + 1
+
+
+def percentiles_conteos(C, p: float) -> np.ndarray:
+    """Percentil `p` (0-1) de cada fila de C (ítems × 9), como numpy.percentile sobre los votos."""
+    C = np.asarray(C, dtype=np.int64).reshape(-1, 9)
+    acum = C.cumsum(axis=1)
+    n = acum[:, -1]
+    h = np.maximum(n - 1, 0) * p
+    j = np.floor(h).astype(np.int64)
+    bajo = _estadistico_orden(acum, j)
+    alto = _estadistico_orden(acum, np.minimum(j + 1, np.maximum(n - 1, 0)))
+    return np.where(n > 0, bajo + (h - j) * (alto - bajo), np.nan)
+
+
+def ipras(C) -> dict:
+    """Índices RAND/UCLA de cada fila de C (ver arriba); NaN en los ítems sin votos."""
+    p30 = percentiles_conteos(C, 0.30)
+    p70 = percentiles_conteos(C, 0.70)
+    ipr = p70 - p30
+    ai = np.abs(5 - (p30 + p70) / 2)
+    umbral = 2.35 + 1.5 * ai
+    with np.errstate(invalid="ignore"):
+        desacuerdo = ipr > umbral
+    return {"p30": p30, "p70": p70, "ipr": ipr, "ai": ai, "ipras": umbral, "desacuerdo": desacuerdo}
+
+
+def w_kendall(M) -> dict:
+    """
+    W de Kendall de M (participantes × ítems, votos 1..9, 0 = sin voto).
+    Devuelve w, m (participantes completos), n (ítems), chi2, gl y p
+    (aproximación chi-cuadrado); w es NaN con menos de 2 participantes o
+    ítems, o si nadie distingue entre ítems.
+    """
+    M = np.asarray(M, dtype=np.int64)
+    M = M[(M > 0).all(axis=1)]
+    m, n = M.shape
+    if m < 2 or n < 2:
+        return {"w": np.nan, "m": m, "n": n, "chi2": np.nan, "gl": max(n - 1, 0), "p": np.nan}
+
+    # Rangos por fila sin ordenar: con votos 1..9, el rango de v es
+    # (votos < v) + ((votos == v) + 1) / 2, a partir del histograma de la fila
+    filas = np.arange(m)[:, None]
+    H = np.bincount((filas * 10 + M).ravel(), minlength=10 * m).reshape(m, 10)
+    menores = H.cumsum(axis=1) - H
+    rangos = menores[filas, M] + (H[filas, M] + 1) / 2
+
+    R = rangos.sum(axis=0)
+    S = ((R - R.mean()) ** 2).sum()
+    empates = (H ** 3 - H).sum()
+    denominador = m * m * (n ** 3 - n) - m * empates
+    if denominador <= 0:
+        return {"w": np.nan, "m": m, "n": n, "chi2": np.nan, "gl": n - 1, "p": np.nan}
+    w = 12 * S / denominador
+    chi2 = m * (n - 1) * w
+
+    from scipy.special import gammaincc
+    return {"w": float(w), "m": m, "n": n, "chi2": float(chi2), "gl": n - 1,
+            "p": float(gammaincc((n - 1) / 2, chi2 / 2))}
+
+
+def acuerdo_categorico(C) -> dict:
+    """
+    Acuerdo dentro de cada fila de C (preguntas × categorías, cuántos
+    evaluadores eligieron cada una; cada fila con sus propias categorías):
+      n            evaluadores
+      acuerdo      proporción de pares de evaluadores que eligieron lo mismo
+                   (el acuerdo observado P_i de Fleiss; NaN con menos de 2)
+    """
+    C = np.asarray(C, dtype=np.float64)
+    n = C.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        acuerdo = np.where(n >= 2, ((C * C).sum(axis=1) - n) / (n * (n - 1)), np.nan)
+    return {"n": n.astype(np.int64), "acuerdo": acuerdo}
+
+
+def kappa_fleiss(C) -> dict:
+    """
+    κ de Fleiss de C (sujetos × categorías, cuántos evaluadores eligieron
+    cada categoría; el número de evaluadores puede variar entre sujetos).
+    Sólo cuentan los sujetos con 2 o más evaluadores. Devuelve kappa,
+    sujetos, evaluadores (media por sujeto), p_obs (media de los P_i de
+    acuerdo_categorico) y p_esp (suma de las proporciones de cada categoría
+    al cuadrado); kappa es NaN con menos de 2 sujetos o si todos eligieron
+    la misma categoría.
+    """
+    C = np.asarray(C, dtype=np.float64)
+    n_i = C.sum(axis=1)
+    C = C[n_i >= 2]
+    n_i = n_i[n_i >= 2]
+    if not len(C):
+        return {"kappa": np.nan, "sujetos": 0, "evaluadores": 0.0, "p_obs": np.nan, "p_esp": np.nan}
+    p_obs = acuerdo_categorico(C)["acuerdo"].mean()
+    p_j = C.sum(axis=0) / n_i.sum()
+    p_esp = (p_j * p_j).sum()
+    kappa = (p_obs - p_esp) / (1 - p_esp) if len(C) >= 2 and p_esp < 1 else np.nan
+    return {"kappa": float(kappa), "sujetos": len(C), "evaluadores": float(n_i.mean()),
+            "p_obs": float(p_obs), "p_esp": float(p_esp)}
@@ -0,0 +1,576 @@
+"""
+Capa de almacenamiento de las sesiones de votación.
+
+  BackendMemoria: no persiste nada (comportamiento original, todo en RAM).
+  BackendSQLite:  SQLite en modo WAL. Las sesiones se guardan al crearse o
+                  modificarse; los votos se acumulan y se escriben por lotes
+                  para que las ráfagas de votación no bloqueen a la app.
+  BackendEventos: log de eventos sólo-añadir con snapshots periódicos;
+                  recuperación = último snapshot + cola del log.
+
+El backend sólo maneja tipos básicos (dict, list, str, int, bytes); la
+reconstrucción de los objetos de la sesión la hace app.py.
+
+En las sesiones votadas por ítem, cada voto lleva además `items`: un texto
+con un dígito por recomendación ("0" = sin voto), p. ej. "7980".
+"""
+import atexit
+import base64
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS sesiones (
+    codigo   TEXT PRIMARY KEY,
+    tipo     TEXT NOT NULL DEFAULT 'STD',
+    creada   TEXT,
+    ronda    INTEGER NOT NULL DEFAULT 1,
+    activa   INTEGER NOT NULL DEFAULT 1,
+    meta     TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS votos (
+    codigo     TEXT NOT NULL,
+    ronda      INTEGER NOT NULL,
+    pid        TEXT NOT NULL,
+    nombre     TEXT,
+    voto       INTEGER,
+    comentario TEXT,
+    correo     TEXT,
+    fecha      TEXT,
+    items      TEXT,
+    PRIMARY KEY (codigo, ronda, pid)
+);
+CREATE INDEX IF NOT EXISTS idx_votos_pid ON votos (pid);
+CREATE TABLE IF NOT EXISTS votos_grade (
+    codigo     TEXT NOT NULL,
+    dominio    TEXT NOT NULL,
+    pid        TEXT NOT NULL,
+    nombre     TEXT,
+    voto       TEXT,
+    comentario TEXT,
+    fecha      TEXT,
+    PRIMARY KEY (codigo, dominio, pid)
+);
+CREATE INDEX IF NOT EXISTS idx_votos_grade_pid ON votos_grade (pid);
+CREATE TABLE IF NOT EXISTS rondas (
+    codigo  TEXT NOT NULL,
+    indice  INTEGER NOT NULL,
+    ronda   INTEGER,
+    creada  TEXT,
+    datos   TEXT NOT NULL,
+    PRIMARY KEY (codigo, indice)
+);
+CREATE TABLE IF NOT EXISTS imagenes (
+    codigo  TEXT NOT NULL,
+    indice  INTEGER NOT NULL,
+    datos   BLOB NOT NULL,
+    PRIMARY KEY (codigo, indice)
+);
+"""
+
+# Sentencias fijas: sqlite3 las compila una vez y las reutiliza desde su caché
+SQL_UPSERT_SESION = """
+    INSERT INTO sesiones (codigo, tipo, creada, ronda, activa, meta)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (codigo) DO UPDATE SET
+        tipo = excluded.tipo, creada = excluded.creada, ronda = excluded.ronda,
+        activa = excluded.activa, meta = excluded.meta
+"""
+SQL_UPSERT_VOTO = """
+    INSERT INTO votos (codigo, ronda, pid, nombre, voto, comentario, correo, fecha, items)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (codigo, ronda, pid) DO UPDATE SET
+        nombre = excluded.nombre, voto = excluded.voto, comentario = excluded.comentario,
+        correo = excluded.correo, fecha = excluded.fecha, items = excluded.items
+"""
+SQL_UPSERT_VOTO_GRADE = """
+    INSERT INTO votos_grade (codigo, dominio, pid, nombre, voto, comentario, fecha)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (codigo, dominio, pid) DO UPDATE SET
+        nombre = excluded.nombre, voto = excluded.voto,
+        comentario = excluded.comentario, fecha = excluded.fecha
+"""
+SQL_INSERT_RONDA = """
+    INSERT OR REPLACE INTO rondas (codigo, indice, ronda, creada, datos)
+    VALUES (?, ?, ?, ?, ?)
+"""
+SQL_INSERT_IMAGEN = "INSERT INTO imagenes (codigo, indice, datos) VALUES (?, ?, ?)"
+SQL_BORRAR_IMAGENES = "DELETE FROM imagenes WHERE codigo = ?"
+SQL_VOTOS_SESION = """
+    SELECT pid, nombre, voto, comentario, correo, fecha, items
+    FROM votos WHERE codigo = ? AND ronda = ? ORDER BY rowid
+"""
+SQL_VOTOS_GRADE_SESION = """
+    SELECT dominio, pid, nombre, voto, comentario, fecha
+    FROM votos_grade WHERE codigo = ? ORDER BY rowid
+"""
+SQL_IMAGENES_SESION = "SELECT datos FROM imagenes WHERE codigo = ? ORDER BY indice"
+
+# Campos de la sesión que no van en la columna 'meta'. Las imágenes viven en
+# el almacén de blobs y la sesión sólo guarda sus digests (que sí van en 'meta');
+# la tabla 'imagenes' se mantiene para leer bases anteriores.
+CAMPOS_FUERA_DE_META = ("registro", "agregado", "_origen", "dominios", "version")
+
+
+class BackendMemoria:
+    """Backend nulo: la sesión vive sólo en memoria del proceso."""
+
+    persistente = False
+
+    def cargar_sesiones(self) -> list:
+        return []
+
+    def cargar_rondas(self) -> dict:
+        return {}
+
+    def guardar_sesion(self, codigo: str, sesion: dict, imagenes=None):
+        pass
+
+    def registrar_voto(self, codigo, ronda, pid, nombre, voto, comentario, correo, fecha,
+                       items=None):
+        pass
+
+    def registrar_voto_grade(self, codigo, dominio, pid, nombre, voto, comentario, fecha):
+        pass
+
+    def guardar_ronda(self, codigo: str, indice: int, datos: dict):
+        pass
+
+    def reemplazar_todo(self, sesiones: dict, rondas: dict):
+        pass
+
+    def flush(self):
+        pass
+
+
+class BackendSQLite(BackendMemoria):
+    """
+    SQLite en modo WAL, compartido por todos los hilos de Streamlit.
+    Los votos se acumulan en memoria y se escriben con executemany cuando
+    se llena el lote o, a más tardar, cada `intervalo` segundos.
+    """
+
+    persistente = True
+
+    def __init__(self, ruta: str, tam_lote: int = 64, intervalo: float = 0.5):
+        self.ruta = ruta
+        self.tam_lote = tam_lote
+        self.intervalo = intervalo
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        self._conn = sqlite3.connect(ruta, check_same_thread=False,
+                                     cached_statements=64)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(ESQUEMA)
+        # Bases anteriores a la votación por ítem
+        if "items" not in [c[1] for c in self._conn.execute("PRAGMA table_info(votos)")]:
+            self._conn.execute("ALTER TABLE votos ADD COLUMN items TEXT")
+        self._conn.commit()
+        self._lock_db = threading.Lock()
+        self._lock_pend = threading.Lock()
+        self._lock_flush = threading.Lock()
+        self._votos_pend = []
+        self._grade_pend = []
+        self._despertar = threading.Event()
+        self._hilo = threading.Thread(target=self._escritor, daemon=True,
+                                      name="sqlite-flush")
+        self._hilo.start()
+        atexit.register(self.flush)
+
+    # — Lectura —
+    def cargar_sesiones(self) -> list:
+        """
+        Lista de (codigo, sesion, filas_votos, filas_grade, imagenes) para cada
+        sesión guardada. Las filas de votos corresponden a la ronda actual.
+        """
+        self.flush()
+        resultado = []
+        with self._lock_db:
+            sesiones = self._conn.execute(
+                "SELECT codigo, tipo, creada, ronda, activa, meta FROM sesiones ORDER BY rowid"
+            ).fetchall()
+            for codigo, tipo, creada, ronda, activa, meta in sesiones:
+                sesion = json.loads(meta)
+                sesion.update(created_at=creada, round=ronda, is_active=bool(activa))
+                if tipo != "STD":
+                    sesion["tipo"] = tipo
+                votos = self._conn.execute(SQL_VOTOS_SESION, (codigo, ronda)).fetchall()
+                grade = self._conn.execute(SQL_VOTOS_GRADE_SESION, (codigo,)).fetchall()
+                imagenes = [fila[0] for fila in self._conn.execute(SQL_IMAGENES_SESION, (codigo,))]
+                resultado.append((codigo, sesion, votos, grade, imagenes))
+        return resultado
+
+    def cargar_rondas(self) -> dict:
+        """{codigo: [datos de cada ronda archivada, en orden]}"""
+        rondas = {}
+        with self._lock_db:
+            for codigo, datos in self._conn.execute(
+                "SELECT codigo, datos FROM rondas ORDER BY codigo, indice"
+            ):
+                rondas.setdefault(codigo, []).append(json.loads(datos))
+        return rondas
+
+    # — Escritura —
+    @staticmethod
+    def _fila_sesion(codigo: str, sesion: dict):
+        meta = {k: v for k, v in sesion.items()
+                if k not in CAMPOS_FUERA_DE_META
+                and k not in ("tipo", "created_at", "round", "is_active")}
+        return (codigo, sesion.get("tipo", "STD"), sesion.get("created_at"),
+                int(sesion.get("round", 1)), int(bool(sesion.get("is_active", True))),
+                json.dumps(meta, ensure_ascii=False, default=str))
+
+    def guardar_sesion(self, codigo: str, sesion: dict, imagenes=None):
+        with self._lock_db, self._conn:
+            self._conn.execute(SQL_UPSERT_SESION, self._fila_sesion(codigo, sesion))
+            if imagenes is not None:
+                self._conn.execute(SQL_BORRAR_IMAGENES, (codigo,))
+                self._conn.executemany(SQL_INSERT_IMAGEN,
+                                       [(codigo, i, d) for i, d in enumerate(imagenes)])
+
+    def registrar_voto(self, codigo, ronda, pid, nombre, voto, comentario, correo, fecha,
+                       items=None):
+        with self._lock_pend:
+            self._votos_pend.append((codigo, ronda, pid, nombre, voto, comentario, correo, fecha,
+                                     items))
+            lleno = len(self._votos_pend) >= self.tam_lote
+        if lleno:
+            self._despertar.set()
+
+    def registrar_voto_grade(self, codigo, dominio, pid, nombre, voto, comentario, fecha):
+        with self._lock_pend:
+            self._grade_pend.append((codigo, dominio, pid, nombre, voto, comentario, fecha))
+            lleno = len(self._grade_pend) >= self.tam_lote
+        if lleno:
+            self._despertar.set()
+
+    def guardar_ronda(self, codigo: str, indice: int, datos: dict):
+        self.flush()
+        with self._lock_db, self._conn:
+            self._conn.execute(SQL_INSERT_RONDA, (
+                codigo, indice, datos.get("round"), datos.get("created_at"),
+                json.dumps(datos, ensure_ascii=False, default=str)))
+
+    def reemplazar_todo(self, sesiones: dict, rondas: dict):
+        """
+        Sustituye todo el contenido (p. ej. tras 'Cargar Estado').
+        `sesiones`: {codigo: (sesion, filas_votos, filas_grade, imagenes)}
+        `rondas`:   {codigo: [datos, ...]}
+        """
+        with self._lock_pend:
+            self._votos_pend.clear()
+            self._grade_pend.clear()
+        with self._lock_db, self._conn:
+            for tabla in ("sesiones", "votos", "votos_grade", "rondas", "imagenes"):
+                self._conn.execute(f"DELETE FROM {tabla}")
+            for codigo, (sesion, votos, grade, imagenes) in sesiones.items():
+                self._conn.execute(SQL_UPSERT_SESION, self._fila_sesion(codigo, sesion))
+                self._conn.executemany(SQL_UPSERT_VOTO, votos)
+                self._conn.executemany(SQL_UPSERT_VOTO_GRADE, grade)
+                self._conn.executemany(SQL_INSERT_IMAGEN,
+                                       [(codigo, i, d) for i, d in enumerate(imagenes)])
+            for codigo, lista in rondas.items():
+                self._conn.executemany(SQL_INSERT_RONDA, [
+                    (codigo, i, d.get("round"), d.get("created_at"),
+                     json.dumps(d, ensure_ascii=False, default=str))
+                    for i, d in enumerate(lista)])
+
+    def flush(self):
+        """
+        Escribe en una sola transacción los votos pendientes. Al volver, todo
+        voto registrado antes de la llamada está confirmado en la base.
+        """
+        with self._lock_flush:
+            with self._lock_pend:
+                votos, self._votos_pend = self._votos_pend, []
+                grade, self._grade_pend = self._grade_pend, []
+            if not votos and not grade:
+                return
+            try:
+                with self._lock_db, self._conn:
+                    if votos:
+                        self._conn.executemany(SQL_UPSERT_VOTO, votos)
+                    if grade:
+                        self._conn.executemany(SQL_UPSERT_VOTO_GRADE, grade)
+            except sqlite3.Error:
+                # Se devuelven a la cola para el siguiente intento
+                with self._lock_pend:
+                    self._votos_pend[:0] = votos
+                    self._grade_pend[:0] = grade
+                raise
+
+    def _escritor(self):
+        while True:
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass
+
+
+class BackendEventos(BackendMemoria):
+    """
+    Registro de eventos sólo-añadir (JSON por línea) con snapshots compactos.
+
+    Cada voto, sobrescritura, sesión creada/modificada, cierre de sesión y
+    nueva ronda se escribe como un evento numerado en `eventos.log`. Las
+    líneas se agrupan y se sincronizan a disco (fsync) cada `grupo` eventos
+    o `intervalo` segundos. Cada `cada_snapshot` eventos se guarda un
+    snapshot del estado junto con la posición del log (lo escribe el hilo
+    escritor, fuera del camino de cada voto); al arrancar se carga el último
+    snapshot y sólo se reproduce la cola del log.
+    El log nunca se trunca, así que conserva la auditoría completa.
+    """
+
+    persistente = True
+
+    def __init__(self, carpeta: str, grupo: int = 32, intervalo: float = 0.05,
+                 cada_snapshot: int = 10000):
+        os.makedirs(carpeta, exist_ok=True)
+        self.carpeta = carpeta
+        self.grupo = grupo
+        self.intervalo = intervalo
+        self.cada_snapshot = cada_snapshot
+        self._ruta_log = os.path.join(carpeta, "eventos.log")
+        self._ruta_snapshot = os.path.join(carpeta, "snapshot.json")
+        self._lock = threading.RLock()
+        self._lock_snapshot = threading.Lock()     # serializa la escritura de snapshots
+        self._snapshot_pendiente = False
+        self._pend = []
+        self._estado = self._estado_vacio()
+        self._seq = 0
+        self._seq_snapshot = 0      # seq del último snapshot armado
+        self._seq_escrito = 0       # seq del último snapshot ya en disco
+        self._recuperar()
+        self._log = open(self._ruta_log, "ab")
+        self._despertar = threading.Event()
+        self._hilo = threading.Thread(target=self._escritor, daemon=True,
+                                      name="eventos-fsync")
+        self._hilo.start()
+        atexit.register(self.flush)
+
+    @staticmethod
+    def _estado_vacio() -> dict:
+        return {"sesiones": {}, "votos": {}, "grade": {}, "imagenes": {}, "rondas": {}}
+
+    # — Recuperación —
+    def _recuperar(self):
+        offset = 0
+        if os.path.exists(self._ruta_snapshot):
+            with open(self._ruta_snapshot, "rb") as f:
+                snap = json.load(f)
+            self._estado = snap["estado"]
+            self._seq = self._seq_snapshot = self._seq_escrito = snap["seq"]
+            offset = snap["offset"]
+        if not os.path.exists(self._ruta_log):
+            return
+        valido = offset
+        with open(self._ruta_log, "rb") as f:
+            f.seek(offset)
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break                      # escritura incompleta (caída a mitad de línea)
+                try:
+                    ev = json.loads(linea)
+                except ValueError:
+                    break
+                if ev["n"] > self._seq:
+                    self._aplicar(ev)
+                    self._seq = ev["n"]
+                valido += len(linea)
+        if valido < os.path.getsize(self._ruta_log):
+            with open(self._ruta_log, "r+b") as f:
+                f.truncate(valido)
+
+    def _aplicar(self, ev: dict):
+        e, c, est = ev["e"], ev.get("c"), self._estado
+        if e in ("sesion", "cierre"):
+            est["sesiones"][c] = ev["s"]
+            if "img" in ev:
+                est["imagenes"][c] = ev["img"]
+        elif e in ("voto", "sobrescritura"):
+            est["votos"].setdefault(c, {}).setdefault(str(ev["r"]), {})[ev["pid"]] = ev["v"]
+        elif e == "voto_grade":
+            est["grade"].setdefault(c, {}).setdefault(ev["dom"], {})[ev["pid"]] = ev["v"]
+        elif e == "ronda":
+            rondas = est["rondas"].setdefault(c, [])
+            datos = self._datos_ronda(c)
+            if ev["i"] < len(rondas):
+                rondas[ev["i"]] = datos
+            else:
+                rondas.append(datos)
+        elif e == "reemplazo":
+            self._estado = ev["estado"]
+
+    def _datos_ronda(self, c: str) -> dict:
+        """Foto de la sesión (metadatos + votos de la ronda actual) al abrir otra ronda."""
+        datos = dict(self._estado["sesiones"].get(c, {}))
+        filas = self._estado["votos"].get(c, {}).get(str(datos.get("round", 1)), {})
+        datos.update(
+            ids=list(filas),
+            names=[v[0] for v in filas.values()],
+            votes=[v[1] for v in filas.values()],
+            comments=[v[2] for v in filas.values()],
+            correos=[v[3] for v in filas.values()],
+            fecha_voto=[v[4] for v in filas.values()],
+        )
+        if any(len(v) > 5 and v[5] for v in filas.values()):
+            datos["items"] = [(v[5] if len(v) > 5 else None) or "" for v in filas.values()]
+        return datos
+
+    # — Lectura —
+    def cargar_sesiones(self) -> list:
+        resultado = []
+        with self._lock:
+            est = self._estado
+            for codigo, sesion in est["sesiones"].items():
+                sesion = dict(sesion)
+                filas = est["votos"].get(codigo, {}).get(str(sesion.get("round", 1)), {})
+                votos = [(pid, *v) for pid, v in filas.items()]
+                grade = [(dom, pid, *v)
+                         for dom, por_pid in est["grade"].get(codigo, {}).items()
+                         for pid, v in por_pid.items()]
+                imagenes = [base64.b64decode(b) for b in est["imagenes"].get(codigo, [])]
+                resultado.append((codigo, sesion, votos, grade, imagenes))
+        return resultado
+
+    def cargar_rondas(self) -> dict:
+        with self._lock:
+            return {c: [dict(d) for d in r] for c, r in self._estado["rondas"].items()}
+
+    def leer_eventos(self, codigo: str = None):
+        """Recorre el log completo (auditoría), opcionalmente filtrado por sesión."""
+        self.flush()
+        with open(self._ruta_log, "rb") as f:
+            for linea in f:
+                ev = json.loads(linea)
+                if codigo is None or ev.get("c") == codigo:
+                    yield ev
+
+    # — Escritura —
+    def _emitir(self, ev: dict):
+        with self._lock:
+            self._seq += 1
+            ev["n"] = self._seq
+            ev["t"] = time.time()
+            self._aplicar(ev)
+            self._pend.append(json.dumps(ev, ensure_ascii=False, default=str).encode() + b"\n")
+            if self._seq - self._seq_snapshot >= self.cada_snapshot:
+                self._snapshot_pendiente = True
+            despertar = self._snapshot_pendiente or len(self._pend) >= self.grupo
+        if despertar:
+            self._despertar.set()
+
+    def guardar_sesion(self, codigo: str, sesion: dict, imagenes=None):
+        meta = {k: v for k, v in sesion.items() if k not in CAMPOS_FUERA_DE_META}
+        with self._lock:
+            anterior = self._estado["sesiones"].get(codigo, {})
+            cierre = anterior.get("is_active", True) and not meta.get("is_active", True)
+            ev = {"e": "cierre" if cierre else "sesion", "c": codigo, "s": meta}
+            if imagenes is not None:
+                ev["img"] = [base64.b64encode(d).decode() for d in imagenes]
+            self._emitir(ev)
+
+    def registrar_voto(self, codigo, ronda, pid, nombre, voto, comentario, correo, fecha,
+                       items=None):
+        v = [nombre, voto, comentario, correo, fecha] + ([items] if items is not None else [])
+        with self._lock:
+            existe = pid in self._estado["votos"].get(codigo, {}).get(str(ronda), {})
+            self._emitir({"e": "sobrescritura" if existe else "voto", "c": codigo, "r": ronda,
+                          "pid": pid, "v": v})
+
+    def registrar_voto_grade(self, codigo, dominio, pid, nombre, voto, comentario, fecha):
+        self._emitir({"e": "voto_grade", "c": codigo, "dom": dominio, "pid": pid,
+                      "v": [nombre, voto, comentario, fecha]})
+
+    def guardar_ronda(self, codigo: str, indice: int, datos: dict):
+        # La foto se reconstruye del propio estado: el evento sólo marca la ronda
+        self._emitir({"e": "ronda", "c": codigo, "i": indice})
+
+    def reemplazar_todo(self, sesiones: dict, rondas: dict):
+        estado = self._estado_vacio()
+        for codigo, (sesion, votos, grade, imagenes) in sesiones.items():
+            estado["sesiones"][codigo] = {k: v for k, v in sesion.items()
+                                          if k not in CAMPOS_FUERA_DE_META}
+            for _, ronda, pid, *v in votos:
+                estado["votos"].setdefault(codigo, {}).setdefault(str(ronda), {})[pid] = v
+            for _, dom, pid, *v in grade:
+                estado["grade"].setdefault(codigo, {}).setdefault(dom, {})[pid] = v
+            estado["imagenes"][codigo] = [base64.b64encode(d).decode() for d in imagenes]
+        estado["rondas"] = rondas
+        self._emitir({"e": "reemplazo", "estado": estado})
+        self.snapshot()
+
+    def flush(self):
+        """Escribe el grupo de eventos pendiente y lo sincroniza a disco."""
+        with self._lock:
+            if not self._pend:
+                return
+            self._log.write(b"".join(self._pend))
+            self._pend = []
+            self._log.flush()
+            os.fsync(self._log.fileno())
+
+    def snapshot(self):
+        """
+        Guarda de forma atómica el estado actual y la posición del log. Un
+        solo snapshot se escribe a la vez (cada uno en su propio archivo
+        temporal) y nunca se reemplaza uno más nuevo por otro más viejo.
+        """
+        with self._lock_snapshot:
+            with self._lock:
+                self.flush()
+                self._snapshot_pendiente = False
+                seq = self._seq
+                if seq <= self._seq_escrito:
+                    return
+                datos = json.dumps({"seq": seq, "offset": self._log.tell(),
+                                    "estado": self._estado},
+                                   ensure_ascii=False, default=str).encode()
+                self._seq_snapshot = seq
+            fd, tmp = tempfile.mkstemp(prefix="snapshot.", suffix=".tmp", dir=self.carpeta)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(datos)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self._ruta_snapshot)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+            self._seq_escrito = seq
+
+    def _escritor(self):
+        while True:
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+            try:
+                self.flush()
+                if self._snapshot_pendiente:
+                    self.snapshot()
+            except OSError:
+                pass
+
+
+def crear_backend(tipo: str = "sqlite", ruta: str = "registro_data/consenso.db"):
+    """
+    tipo="memoria": sin persistencia
+    tipo="sqlite":  `ruta` es el archivo de base de datos
+    tipo="eventos": `ruta` es la carpeta del log de eventos y los snapshots
+    """
+    if tipo == "memoria":
+        return BackendMemoria()
+    if tipo == "sqlite":
+        return BackendSQLite(ruta)
+    if tipo == "eventos":
+        return BackendEventos(ruta)
+    raise ValueError(f"Backend de almacenamiento desconocido: {tipo}")
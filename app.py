@@ -2,19 +2,27 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import uuid, qrcode, io, hashlib, datetime, base64, copy, os
-from scipy import stats
-from streamlit_autorefresh import st_autorefresh
-import requests
+import uuid, io, hashlib, datetime, base64, os, functools, threading, itertools, time, tempfile
+import contextlib
+import concurrent.futures, multiprocessing
+import sys
+# Streamlit puede agregar esta carpeta a sys.path sólo mientras corre el
+# script y quitarla al terminar; los trabajos en segundo plano y los procesos
+# del pool importan módulos de la app (reporte_docx, graficos, ...) después,
+# así que se deja una entrada propia.
+CARPETA_APP = os.path.dirname(os.path.abspath(__file__))
+if sys.path.count(CARPETA_APP) < 2:
+    sys.path.append(CARPETA_APP)
 from io import BytesIO
-# Reemplaza tus líneas de import de docx por esto:
-from docx import Document
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
-from docx.shared import Cm, Pt, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.table import WD_TABLE_ALIGNMENT, WD_ALIGN_VERTICAL
+from almacenamiento import crear_backend
+from blobs import AlmacenBlobs
+from estado_binario import EstadoBinario, es_estado_binario, guardar_estado
+from ingesta_http import ServidorVotos
+from trabajos import GestorTrabajos
+from votacion import odds_header, pagina_votacion, separar_recomendaciones
+# Las dependencias que sólo usa el panel de administración (scipy, plotly,
+# openpyxl, python-docx, qrcode, streamlit_autorefresh, ...) se importan
+# donde se usan: quien llega desde un QR (?session=) no las carga.
 
 
 # 1) set_page_config debe ir primero
@@ -133,16 +141,6 @@ def card_html(label, value):
     """
 
 
-# 3) odds_header(), para mostrar logo y título
-def odds_header():
-    header_html = """
-    <div class="app-header">
-      <div class="odds-logo">ODDS EPIDEMIOLOGY</div>
-      <div class="odds-subtitle">Sistema de Votación</div>
-    </div>
-    """
-    st.markdown(header_html, unsafe_allow_html=True)
-
 DOMINIOS_GRADE = {
     "prioridad_problema": [
         "No", "Probablemente no", "Probablemente sí", "Sí", "Varía", "No sabemos"
@@ -199,133 +197,210 @@ PREGUNTAS_GRADE = {
 }
 # ------------------------------------------------------------
 
-import io
-import pandas as pd
-from scipy import stats
+def _filas_hoja(ws, encabezados, filas) -> int:
+    """Escribe el encabezado y las filas (iterable) en una hoja write-only; devuelve cuántas filas."""
+    ws.append(encabezados)
+    n = 0
+    for n, f in enumerate(filas, 1):
+        ws.append([None if isinstance(v, float) and np.isnan(v) else v for v in f])
+    return n
 
-import io
-import pandas as pd
-import numpy as np
-from scipy import stats
 
-def crear_excel_consolidado(store: dict, history: dict) -> io.BytesIO:
+def crear_excel_consolidado(store: dict, history: dict, en_disco: bool = False, ruta: str = None,
+                            hojas: list = None, avance=None):
     """
-    Genera un Excel con tres hojas:
+    Genera un Excel con las hojas:
       1) Recomendaciones estándar
       2) Paquetes GRADE
-      3) Métricas consolidadas (n, media, mediana, desv. std, % consenso, quórum, estado)
+      3) Métricas consolidadas (n, media, mediana, desv. std, % consenso, quórum,
+         IPR/IPRAS de RAND/UCLA, estado)
+      4) Ítems: las mismas métricas por recomendación, en las sesiones votadas por ítem
+      5) Votos_por_ítem: un renglón por participante y una columna por ítem
+      6) Acuerdo: W de Kendall (sesiones por ítem y entre todas las
+         recomendaciones de voto global), acuerdo entre pares por dominio
+         GRADE y κ de Fleiss de cada dominio entre paquetes
+
+    Las filas se escriben en streaming (openpyxl en modo write-only) a partir de
+    los arreglos columnares de cada sesión, sin armar DataFrames intermedios.
+    Devuelve un BytesIO; con `en_disco=True` el libro se escribe en `ruta`
+    (o en un archivo temporal) y se devuelve la ruta, sin pasar por la RAM.
+    Si se pasa la lista `hojas`, se le agrega el resumen de cada hoja
+    (nombre, filas, columnas) a medida que se escribe; `avance(fraccion,
+    detalle)` se llama al terminar cada sesión (exportación en segundo plano).
     """
+    import openpyxl
+    from acuerdo import ipras
+    wb = openpyxl.Workbook(write_only=True)
+    sesiones = list(store.items())
+    hojas = hojas if hojas is not None else []
+    avance = avance or (lambda fraccion, detalle="": None)
+
+    def hoja(nombre, encabezados, filas, escribir=True):
+        ws = wb.create_sheet(nombre)
+        n = _filas_hoja(ws, encabezados, filas) if escribir else 0
+        hojas.append({"Hoja": nombre, "Filas": n, "Columnas": len(encabezados) if escribir else 0})
+
     # — Hoja 1: Recomendaciones estándar —
-    filas_std = []
-    for code, s in store.items():
-        if s.get("tipo", "STD") == "STD":
-            for pid, name, vote, com in zip(s["ids"], s["names"], s["votes"], s["comments"]):
-                filas_std.append({
-                    "Código": code,
-                    "Descripción": s["desc"],
-                    "Ronda": s["round"],
-                    "Creada": s["created_at"],
-                    "ID participante": pid,
-                    "Nombre": name,
-                    "Voto": vote,
-                    "Comentario": com
-                })
-    df_std = pd.DataFrame(filas_std)
+    def filas_std():
+        for i, (code, s) in enumerate(sesiones, 1):
+            if s.get("tipo", "STD") == "STD":
+                votos, _, t = registro_sesion(s).columnas()
+                for pid, name, voto, com in zip(t["ids"], t["names"], votos.tolist(), t["comments"]):
+                    yield code, s["desc"], s["round"], s["created_at"], pid, name, voto or None, com
+                avance(0.85 * i / len(sesiones), f"Recomendación {code} ({i}/{len(sesiones)})")
+
+    hoja("Recomendaciones",
+         ["Código", "Descripción", "Ronda", "Creada", "ID participante", "Nombre", "Voto", "Comentario"],
+         filas_std(), any(s.get("tipo", "STD") == "STD" for _, s in sesiones))
 
     # — Hoja 2: Paquetes GRADE —
-    filas_grade = []
-    for code, s in store.items():
-        if s.get("tipo") == "GRADE_PKG":
-            for dom, meta in s["dominios"].items():
-                for pid, name, vote, com in zip(meta["ids"], meta["names"], meta["votes"], meta["comments"]):
-                    filas_grade.append({
-                        "Paquete": code,
-                        "Dominio": dom,
-                        "ID participante": pid,
-                        "Nombre": name,
-                        "Voto": vote,
-                        "Comentario": com,
-                        "Creada": s["created_at"]
-                    })
-    df_grade = pd.DataFrame(filas_grade)
+    def filas_grade():
+        for code, s in sesiones:
+            if s.get("tipo") == "GRADE_PKG":
+                for dom, meta in s["dominios"].items():
+                    for pid, name, vote, com in zip(meta["ids"], meta["names"], meta["votes"], meta["comments"]):
+                        yield code, dom, pid, name, vote, com, s["created_at"]
+
+    avance(0.85, "Paquetes GRADE")
+    hoja("Paquetes_GRADE",
+         ["Paquete", "Dominio", "ID participante", "Nombre", "Voto", "Comentario", "Creada"],
+         filas_grade(), any(meta["ids"] for _, s in sesiones if s.get("tipo") == "GRADE_PKG"
+                            for meta in s["dominios"].values()))
 
     # — Hoja 3: Métricas consolidadas —
-    filas_metrics = []
-    for code, s in store.items():
-        votos = [v for v in s["votes"] if isinstance(v, (int, float))]
-        n = len(votos)
-        media   = np.mean(votos)            if n else np.nan
-        std     = np.std(votos, ddof=1)     if n > 1 else 0.0
-        mediana = np.median(votos)          if n else np.nan
-
-        # Bootstrap para IC95% de la mediana
-        if n >= 2:
-            res = stats.bootstrap((votos,), np.median,
-                                  confidence_level=0.95,
-                                  n_resamples=500,
-                                  method="basic")
-            lo, hi = res.confidence_interval
-        else:
-            lo = hi = mediana
-
-        pct_consenso = consensus_pct(votos) * 100
-        quorum = s.get("n_participantes", 0)//2 + 1
-
-        # Estado de consenso
-        if n < quorum:
-            estado = "⚠️ Quórum no alcanzado"
-        elif pct_consenso >= 80 and lo >= 7:
-            estado = "✅ Consenso alcanzado"
-        else:
-            estado = "❌ No alcanzó consenso"
-
-        filas_metrics.append({
-            "Código":         code,
-            "Descripción":    s["desc"],
-            "Ronda":          s["round"],
-            "Creada":         s["created_at"],
-            "Votos totales":  n,
-            "Media":          media,
-            "Desv. std.":     std,
-            "Mediana":        mediana,
-            "IC95% (lo)":     lo,
-            "IC95% (hi)":     hi,
-            "% Consenso":     pct_consenso,
-            "Quórum":         quorum,
-            "Estado":         estado
-        })
-    df_metrics = pd.DataFrame(filas_metrics)
-
-    # — Escribir a Excel en memoria —
+    def filas_metrics():
+        avance(0.9, "Métricas")
+        # Mediana e IC95% exacto de todas las sesiones en una sola pasada vectorizada
+        C = np.array([agregado_sesion(s).conteos for _, s in sesiones], dtype=np.int64).reshape(-1, 9)
+        medianas, los, his = median_ci_matriz(C)
+        rand = ipras(C)
+        desacuerdo = texto_desacuerdo(C.sum(axis=1), rand["desacuerdo"])
+        for (code, s), mediana, lo, hi, ipr, umbral, desac in zip(
+                sesiones, medianas, los, his, rand["ipr"], rand["ipras"], desacuerdo):
+            agg = agregado_sesion(s)
+            n = agg.n
+            media   = agg.media                 if n else np.nan
+            std     = agg.desv_std
+
+            if not n:
+                mediana = lo = hi = np.nan
+
+            pct_consenso = agg.consenso * 100
+            quorum = s.get("n_participantes", 0)//2 + 1
+
+            # Estado de consenso. Las sesiones por ítem no tienen voto global:
+            # se informan los participantes y las métricas van en la hoja Ítems
+            if s.get("por_item"):
+                n = len(registro_sesion(s))
+                media = std = mediana = lo = hi = pct_consenso = ipr = umbral = np.nan
+                desac = ""
+                estado = "📋 Votación por ítem (ver hoja Ítems)"
+            elif n < quorum:
+                estado = "⚠️ Quórum no alcanzado"
+            elif pct_consenso >= 80 and lo >= 7:
+                estado = "✅ Consenso alcanzado"
+            else:
+                estado = "❌ No alcanzó consenso"
+
+            yield (code, s["desc"], s["round"], s["created_at"], n, float(media), float(std),
+                   float(mediana), float(lo), float(hi), pct_consenso, quorum,
+                   float(ipr), float(umbral), desac, estado)
+
+    hoja("Métricas",
+         ["Código", "Descripción", "Ronda", "Creada", "Votos totales", "Media", "Desv. std.",
+          "Mediana", "IC95% (lo)", "IC95% (hi)", "% Consenso", "Quórum",
+          "IPR", "IPRAS", "Desacuerdo RAND", "Estado"],
+         filas_metrics(), bool(sesiones))
+
+    # — Hojas 4 y 5: sesiones votadas por ítem (métricas de todos los ítems de
+    #   una sesión en una pasada sobre su matriz participantes × ítems) —
+    por_item = [(code, s) for code, s in sesiones if s.get("por_item")]
+
+    def filas_items():
+        avance(0.95, "Ítems")
+        for code, s in por_item:
+            tabla = tabla_items_sesion(s)
+            tabla.insert(0, "Código", code)
+            yield from tabla.itertuples(index=False, name=None)
+
+    def filas_votos_items():
+        for code, s in por_item:
+            reg = registro_sesion(s)
+            with reg.lock:
+                ids, names, M = list(reg.ids), list(reg.names), matriz_items(s)
+            for pid, name, fila in zip(ids, names, M.tolist()):
+                yield (code, pid, name, *(v or None for v in fila))
+
+    ancho = max((len(separar_recomendaciones(s.get("desc", ""))) for _, s in por_item), default=0)
+    hoja("Ítems",
+         ["Código", "Ítem", "Recomendación", "Votos", "Media", "Desv. std.", "% Consenso",
+          "Mediana", "IC95% (lo)", "IC95% (hi)", "IPR", "IPRAS", "Desacuerdo RAND", "Estado"],
+         filas_items(), bool(por_item))
+    hoja("Votos_por_ítem",
+         ["Código", "ID participante", "Nombre"] + [f"Ítem {j + 1}" for j in range(ancho)],
+         filas_votos_items(), bool(por_item))
+
+    # — Hoja 6: acuerdo entre evaluadores —
+    def filas_acuerdo():
+        from acuerdo import w_kendall
+        globales = [s for _, s in sesiones if s.get("tipo", "STD") == "STD" and not s.get("por_item")]
+        if len(globales) > 1:
+            w = w_kendall(matriz_panel(globales))
+            yield ("Todas", "Recomendaciones de voto global", "W de Kendall", w["w"], w["m"], w["n"],
+                   w["chi2"], w["p"])
+        for code, s in sesiones:
+            a = acuerdo_sesion_datos(s)
+            if "kendall" in a:
+                w = a["kendall"]
+                yield code, "Ítems de la sesión", "W de Kendall", w["w"], w["m"], w["n"], w["chi2"], w["p"]
+            elif "dominios" in a:
+                for dom, n, acuerdo in a["dominios"][["Dominio", "Votos", "Acuerdo entre pares (%)"]].itertuples(
+                        index=False, name=None):
+                    yield code, f"Dominio GRADE {dom}", "Acuerdo entre pares (%)", acuerdo, n, 1, None, None
+        # κ de Fleiss de cada dominio, con los paquetes como sujetos
+        paquetes = [s for _, s in sesiones if s.get("tipo") == "GRADE_PKG"]
+        for dom, n_paq, evaluadores, p_obs, p_esp, kappa in kappa_grade_datos(paquetes).itertuples(
+                index=False, name=None):
+            yield ("Todos", f"Dominio GRADE {dom}, entre paquetes", "κ de Fleiss", kappa, evaluadores,
+                   n_paq, None, None)
+            yield ("Todos", f"Dominio GRADE {dom}, entre paquetes", "Acuerdo entre pares (%)", p_obs,
+                   evaluadores, n_paq, None, None)
+
+    hoja("Acuerdo",
+         ["Código", "Ámbito", "Estadístico", "Valor", "Evaluadores", "Ítems / paquetes", "Chi²", "p"],
+         filas_acuerdo(), bool(sesiones))
+
+    # — Guardar —
+    if en_disco:
+        if ruta is None:
+            fd, ruta = tempfile.mkstemp(prefix="consolidado_", suffix=".xlsx")
+            os.close(fd)
+        wb.save(ruta)
+        return ruta
     buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-        df_std.to_excel(writer, sheet_name="Recomendaciones", index=False)
-        df_grade.to_excel(writer, sheet_name="Paquetes_GRADE", index=False)
-        df_metrics.to_excel(writer, sheet_name="Métricas", index=False)
+    wb.save(buffer)
     buffer.seek(0)
     return buffer
 
 
-def shade_cell(cell, fill_hex: str):
-    """
-    Aplica un fondo de color (hex sin ‘#’) a una celda de python-docx.
-    """
-    tc = cell._tc
-    tcPr = tc.get_or_add_tcPr()
-    shd = OxmlElement('w:shd')
-    shd.set(qn('w:val'), 'clear')
-    shd.set(qn('w:fill'), fill_hex)
-    tcPr.append(shd)
-
-
 # Define tus colores corporativos al inicio del fichero
 PRIMARY = "#662D91"   # Morado ODDS
 SECONDARY = "#F1592A" # Naranja ODDS (opcional)
 
+# Cadencias de actualización del Dashboard (ms). 0 = manual;
+# None = esperar a que llegue un voto (long-poll) y refrescar en ese momento.
+MODOS_REFRESCO = {
+    "Cada 2 s": 2000,
+    "Cada 5 s": 5000,
+    "Cada 30 s": 30000,
+    "Al recibir votos": None,
+    "Manual": 0,
+}
+
+# Tarjetas por página de las hojas de QR: (columnas, filas)
+POR_PAGINA_QR = {"6 (2 × 3)": (2, 3), "12 (3 × 4)": (3, 4)}
+
 
-import io
-import pandas as pd
-from scipy import stats
 def to_excel(code: str) -> io.BytesIO:
     if code not in store:
         return io.BytesIO()
@@ -334,35 +409,21 @@ def to_excel(code: str) -> io.BytesIO:
 
     # A. Sesión estándar
     if s.get("tipo", "STD") == "STD":
-        # Asegurar que todas las listas tienen la misma longitud
-        n = min(
-            len(s["ids"]),
-            len(s["names"]),
-            len(s["votes"]),
-            len(s["comments"]),
-            len(s.get("correos", []))  # solo si está presente
-        )
-        df = pd.DataFrame({
-            "ID anónimo":    s["ids"][:n],
-            "Nombre real":   s["names"][:n],
-            "Correo":        s.get("correos", [""] * n)[:n],
-            "Recomendación": [s["desc"]] * n,
-            "Ronda":         [s["round"]] * n,
-            "Voto":          s["votes"][:n],
-            "Comentario":    s["comments"][:n],
-            "Fecha":         [s["created_at"]] * n
-        })
+        # Las columnas del registro están siempre alineadas
+        df = registro_sesion(s).a_dataframe()
+        df.insert(3, "Recomendación", s["desc"])
+        df.insert(4, "Ronda", s["round"])
+        df["Fecha"] = s["created_at"]
 
     elif s.get("tipo") == "GRADE_PKG":
-        dominios = list(s["dominios"].keys())
-        participantes = s["dominios"][dominios[0]]["names"]
-        votos_por_dominio = {
-            dom: s["dominios"][dom]["votes"]
-            for dom in dominios
-        }
-        df = pd.DataFrame(votos_por_dominio, index=participantes).T
-        df.index.name = "Dominio"
-        df.columns.name = "Participante"
+        votos, frecuencias, resumen = tablas_grade(s)
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+            votos.to_excel(writer, sheet_name="Votos", index=False)
+            frecuencias.to_excel(writer, sheet_name="Frecuencias", index=False)
+            resumen.to_excel(writer, sheet_name="Resumen", index=False)
+        buf.seek(0)
+        return buf
 
     buf = io.BytesIO()
     df.to_excel(buf, index=True)
@@ -370,83 +431,179 @@ def to_excel(code: str) -> io.BytesIO:
     return buf
 
 
-def crear_reporte_consolidado_recomendaciones(store: dict, history: dict) -> io.BytesIO:
-    from docx import Document
-    from docx.shared import Cm
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    import requests
-    from io import BytesIO
+def codigos_opciones(votos: list, opciones: list):
+    """
+    Votos de un dominio GRADE como códigos categóricos: posición de cada voto
+    en `opciones` (-1 = sin voto). Devuelve (códigos int16, categorías); los
+    valores que no están en la lista (p. ej. opciones renombradas) se agregan
+    al final de las categorías en lugar de perderse.
+    """
+    presentes = pd.unique(pd.Series(votos, dtype=object).dropna())
+    conocidas = set(opciones)
+    categorias = list(opciones) + [v for v in presentes if v not in conocidas]
+    return pd.Categorical(votos, categories=categorias).codes.astype(np.int16), categorias
 
-    doc = Document()
 
-    # — Logo en la cabecera —
-    logo_url = (
-        "https://static.wixstatic.com/media/89a9c2_ddc57311fc734357b9ea2b699e107ae2"
-        "~mv2.png/v1/fill/w_90,h_54,al_c,q_85,usm_0.66_1.00_0.01/"
-        "Logo%20versión%20principal.png"
-    )
-    resp = requests.get(logo_url)
-    if resp.status_code == 200:
-        img = BytesIO(resp.content)
-        header_para = doc.sections[0].header.paragraphs[0]
-        run = header_para.add_run()
-        run.add_picture(img, width=Cm(4))
-        header_para.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-
-    # — Márgenes A4 —
-    for sec in doc.sections:
-        sec.left_margin = Cm(2)
-        sec.right_margin = Cm(2)
-        sec.top_margin = Cm(2)
-        sec.bottom_margin = Cm(2)
-
-    # — Iterar cada sesión —    
-    for code, s in store.items():
-        votos = [v for v in s["votes"] if isinstance(v, (int, float))]
-        total = len(votos)
-        pct, med, lo, hi = consensus_pct(votos)*100, *median_ci(votos)
+def tablas_grade(s: dict):
+    """
+    Tablas del paquete GRADE, armadas sobre los votos codificados:
+      votos        participantes × dominios, con el juicio de cada uno (vacío
+                   si no votó ese dominio)
+      frecuencias  votos y % de cada opción, por dominio
+      resumen      votos, juicio modal, % del juicio modal y % de pares de
+                   evaluadores que coinciden (ver acuerdo.acuerdo_categorico),
+                   por dominio
+    Los dominios pueden tener distintos votantes: las filas se alinean por ID
+    de participante, no por posición en las listas de cada dominio.
+    """
+    dominios = list(s["dominios"])
+    ids, nombres, columna, codigos, categorias = [], [], [], [], []
+    for j, dom in enumerate(dominios):
+        meta = s["dominios"][dom]
+        c, cats = codigos_opciones(meta["votes"], DOMINIOS_GRADE.get(dom, meta.get("opciones", [])))
+        ids += meta["ids"]
+        nombres += meta["names"]
+        columna.append(np.full(len(c), j, dtype=np.int64))
+        codigos.append(c)
+        categorias.append(cats)
+    columna = np.concatenate(columna) if dominios else np.empty(0, dtype=np.int64)
+    codigos = np.concatenate(codigos) if dominios else np.empty(0, dtype=np.int16)
+
+    # Pivote participantes × dominios en una sola asignación (si alguien votó
+    # dos veces el mismo dominio, queda el último voto)
+    fila, pids = pd.factorize(pd.Series(ids, dtype=object))
+    _, primera = np.unique(fila, return_index=True)
+    M = np.full((len(pids), len(dominios)), -1, dtype=np.int16)
+    M[fila, columna] = codigos
+
+    votos = pd.DataFrame({"ID participante": pids, "Nombre": np.array(nombres, dtype=object)[primera]})
+    for j, dom in enumerate(dominios):
+        votos[dom] = pd.Categorical.from_codes(M[:, j], categorias[j])
+
+    # Frecuencias y juicio modal por dominio
+    from acuerdo import acuerdo_categorico
+    frecuencias, resumen = [], []
+    C = np.zeros((len(dominios), max(map(len, categorias), default=0)), dtype=np.int64)
+    for j, dom in enumerate(dominios):
+        c = M[:, j]
+        conteos = np.bincount(c[c >= 0], minlength=len(categorias[j]))
+        C[j, :len(conteos)] = conteos
+        n = int(conteos.sum())
+        pct = conteos * 100 / n if n else np.zeros(len(conteos))
+        frecuencias.append(pd.DataFrame({"Dominio": dom, "Opción": categorias[j],
+                                         "Votos": conteos, "%": pct.round(1)}))
+        modal = [categorias[j][k] for k in np.flatnonzero(conteos == conteos.max())] if n else []
+        resumen.append({"Dominio": dom, "Pregunta": PREGUNTAS_GRADE.get(dom, ""), "Votos": n,
+                        "Juicio modal": " / ".join(modal), "% juicio modal": round(pct.max(), 1) if n else np.nan})
+
+    frecuencias = (pd.concat(frecuencias, ignore_index=True) if frecuencias
+                   else pd.DataFrame(columns=["Dominio", "Opción", "Votos", "%"]))
+    resumen = pd.DataFrame(resumen, columns=["Dominio", "Pregunta", "Votos", "Juicio modal", "% juicio modal"])
+    resumen["Acuerdo entre pares (%)"] = (acuerdo_categorico(C)["acuerdo"] * 100).round(1)
+    return votos, frecuencias, resumen
+
+
+def secciones_reporte(store: dict, history: dict, n_comentarios: int = 5) -> list:
+    """
+    Datos de cada recomendación para el reporte DOCX (ver reporte_docx):
+    métricas, estado, acuerdo (IPR/IPRAS, W de Kendall), conteos del
+    histograma, comentarios más recientes e historial de rondas. Las
+    medianas, IC e IPR/IPRAS de todas las sesiones se calculan en una sola
+    pasada vectorizada.
+    """
+    from acuerdo import ipras
+    sesiones = [(code, s) for code, s in store.items() if s.get("tipo", "STD") == "STD"]
+    C = np.array([agregado_sesion(s).conteos for _, s in sesiones], dtype=np.int64).reshape(-1, 9)
+    medianas, los, his = median_ci_matriz(C)
+    rand = ipras(C)
+    secciones = []
+    for (code, s), conteos, med, lo, hi, ipr, umbral, desac in zip(
+            sesiones, C, medianas, los, his, rand["ipr"], rand["ipras"], rand["desacuerdo"]):
+        agg = agregado_sesion(s)
+        total, pct = agg.n, agg.consenso * 100
         quorum = s.get("n_participantes", 0)//2 + 1
 
-        # Título
-        h = doc.add_heading(level=1)
-        h.add_run(f"Recomendación {code}").bold = True
-
-        # Descripción y metadatos
-        doc.add_paragraph(f"Descripción: {s['desc']}")
-        doc.add_paragraph(f"Ronda: {s['round']}    Fecha: {s['created_at']}")
-
-        # Tabla de métricas
-        tbl = doc.add_table(rows=2, cols=4, style="Table Grid")
-        hdr = tbl.rows[0].cells
-        for i, title in enumerate(["Total votos", "% Consenso", "Mediana", "IC95%"]):
-            p = hdr[i].paragraphs[0]
-            run = p.add_run(title); run.bold = True
-            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-        row = tbl.rows[1].cells
-        for i, val in enumerate([total, f"{pct:.1f}%", f"{med:.1f}", f"[{lo:.1f}, {hi:.1f}]"]):
-            row[i].text = str(val)
-            row[i].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-
         # Estado de consenso
-        if total < quorum:
+        items = kendall = None
+        if s.get("por_item"):
+            tabla = tabla_items_sesion(s)
+            items = [[i, reco, n, f"{p:.1f}%", f"{m:.1f} [{a:.1f}, {b:.1f}]",
+                      texto_ipras(ir, ia, d == "⚠️ Sí"), e]
+                     for i, reco, n, p, m, a, b, ir, ia, d, e in tabla[[
+                         "Ítem", "Recomendación", "Votos", "% Consenso", "Mediana", "IC95% (lo)",
+                         "IC95% (hi)", "IPR", "IPRAS", "Desacuerdo RAND", "Estado",
+                     ]].itertuples(index=False, name=None)]
+            kendall = acuerdo_sesion_datos(s)["kendall"]
+            total = len(registro_sesion(s))
+            estado = f"📋 {int(tabla['Estado'].str.startswith('✅').sum())}/{len(tabla)} ítems con consenso"
+        elif total < quorum:
             estado = "⚠️ Quórum no alcanzado"
         elif pct >= 80 and lo >= 7:
             estado = "✅ Consenso ALCANZADO"
         else:
             estado = "❌ No alcanzó consenso"
 
-        p = doc.add_paragraph()
-        p.add_run("Estado de consenso: ").bold = True
-        p.add_run(estado)
+        # Comentarios más recientes
+        votos, fechas, t = columnas_sesion(s)
+        con_comentario = np.array([i for i, c in enumerate(t["comments"]) if c], dtype=np.int64)
+        recientes = con_comentario[np.argsort(fechas.view(np.int64)[con_comentario], kind="stable")[::-1]]
+        comentarios = [(t["names"][i], int(votos[i]) or "—", t["comments"][i])
+                       for i in recientes[:n_comentarios]]
+
+        historial = []
+        for past in history.get(code, []):
+            pagg = agregado_sesion(past)
+            pmed, plo, phi = pagg.median_ci()
+            historial.append({"ronda": past.get("round", 1), "creada": past.get("created_at", ""),
+                              "total": pagg.n, "pct": pagg.consenso * 100,
+                              "mediana": pmed, "lo": plo, "hi": phi})
+
+        secciones.append({
+            "code": code, "desc": s["desc"], "ronda": s.get("round", 1), "creada": s["created_at"],
+            "total": total, "pct": pct, "mediana": float(med), "lo": float(lo), "hi": float(hi),
+            "estado": estado, "conteos": tuple(int(c) for c in conteos),
+            "ipras": texto_ipras(ipr, umbral, desac), "kendall": kendall,
+            "comentarios": comentarios, "historial": historial, "items": items,
+        })
+    return secciones
 
-        doc.add_page_break()
 
-    # — Guardar en buffer y retornar —
-    buffer = BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-    return buffer
+def crear_reporte_consolidado_recomendaciones(store: dict, history: dict, destino=None,
+                                              avance=None) -> io.BytesIO:
+    """
+    Genera un .docx con una sección por recomendación (ver reporte_docx):
+      - Encabezado con el código, descripción, ronda y fecha de creación
+      - Tabla de métricas (Total votos, % Consenso, Mediana, IC95%, IPR/IPRAS)
+      - Estado de consenso
+      - Histograma de votos
+      - Comentarios más recientes
+      - Historial de rondas anteriores
+    y, si hay paquetes GRADE, una sección final con el acuerdo de cada dominio
+    entre paquetes (acuerdo entre pares y κ de Fleiss).
+    Parte de una plantilla ya estilada (márgenes, logo de la caché local de
+    activos) y los histogramas se generan en paralelo. Si se da `destino`
+    (ruta o archivo) el documento se guarda ahí; `avance(fraccion, detalle)`
+    informa el progreso.
+    """
+    from reporte_docx import construir_reporte, renderizar_graficos
+    avance = avance or (lambda fraccion, detalle="": None)
+    avance(0.0, "Calculando métricas")
+    secciones = secciones_reporte(store, history)
+    paquetes = [s for s in store.values() if s.get("tipo") == "GRADE_PKG"]
+    grade = [{"dominio": dom, "paquetes": n, "p_obs": p_obs, "p_esp": p_esp, "kappa": kappa}
+             for dom, n, _, p_obs, p_esp, kappa in kappa_grade_datos(paquetes).itertuples(
+                 index=False, name=None)]
+    avance(0.1, "Generando gráficos")
+    graficos = renderizar_graficos([sec["conteos"] for sec in secciones], get_pool_graficos(), PRIMARY)
+    avance(0.3, "Armando documento")
+    salida = destino if destino is not None else BytesIO()
+    construir_reporte(secciones, salida, logo=get_activos().obtener(LOGO_ODDS, red=False),
+                      graficos=graficos, color=PRIMARY.lstrip("#"), grade=grade,
+                      avance=lambda fraccion, detalle="": avance(0.3 + 0.65 * fraccion, detalle))
+    if destino is not None:
+        return destino
+    salida.seek(0)
+    return salida
 
 
 
@@ -458,8 +615,7 @@ def create_report(code: str) -> str:
     if code not in store:
         return "Sesión inválida"
     s = store[code]
-    pct = consensus_pct(s["votes"]) * 100
-    med, lo, hi = median_ci(s["votes"])
+    reg = registro_sesion(s)
     # Cabecera
     lines = [
         f"REPORTE DE CONSENSO - Sesión {code}",
@@ -467,28 +623,420 @@ def create_report(code: str) -> str:
         "",
         f"Recomendación: {s['desc']}",
         f"Ronda actual: {s['round']}",
-        f"Votos totales: {len(s['votes'])}",
-        f"% Consenso: {pct:.1f}%",
-        f"Mediana (IC95%): {med:.1f} [{lo:.1f}, {hi:.1f}]",
-        "",
-        "Comentarios:",
+        f"Votos totales: {len(reg)}",
     ]
+    if s.get("por_item"):
+        # Sin voto global: una línea por ítem, como en el reporte DOCX
+        lines.append("Resultados por ítem:")
+        for i, reco, n, p, m, a, b, e in tabla_items_sesion(s)[[
+                "Ítem", "Recomendación", "Votos", "% Consenso", "Mediana", "IC95% (lo)", "IC95% (hi)", "Estado",
+        ]].itertuples(index=False, name=None):
+            if n:
+                lines.append(f"  {i}. {reco}: {n} votos, % Consenso: {p:.1f}%, "
+                             f"Mediana (IC95%): {m:.1f} [{a:.1f}, {b:.1f}] - {e}")
+            else:
+                lines.append(f"  {i}. {reco}: sin votos")
+    else:
+        agg = reg.agregado
+        med, lo, hi = agg.median_ci()
+        lines += [f"% Consenso: {agg.consenso * 100:.1f}%",
+                  f"Mediana (IC95%): {med:.1f} [{lo:.1f}, {hi:.1f}]"]
+    lines += ["", "Comentarios:"]
     # Comentarios de la ronda actual
-    for pid, name, vote, com in zip(s["ids"], s["names"], s["votes"], s["comments"]):
+    for pid, name, com in zip(reg.ids, reg.names, reg.comments):
         if com:
             lines.append(f"- {name} (ID {pid}): “{com}”")
     # Historial de rondas anteriores
     if code in history and history[code]:
         lines.append("\nHistorial de rondas anteriores:")
         for past in history[code]:
-            ppct = consensus_pct(past["votes"]) * 100
-            lines.append(
-                f"  * Ronda {past['round']} [{past['created_at']}]: "
-                f"%Consenso={ppct:.1f}%, Mediana={median_ci(past['votes'])[0]:.1f}"
-            )
+            if past.get("por_item"):
+                tabla = tabla_items_sesion(past)
+                resumen = f"{int(tabla['Estado'].str.startswith('✅').sum())}/{len(tabla)} ítems con consenso"
+            else:
+                pagg = agregado_sesion(past)
+                resumen = f"%Consenso={pagg.consenso * 100:.1f}%, Mediana={pagg.median_ci()[0]:.1f}"
+            lines.append(f"  * Ronda {past['round']} [{past['created_at']}]: {resumen}")
     return "\n".join(lines)
 
 
+# Artefactos derivados de una sesión, cacheados por (código, versión): mientras
+# no llegue un voto ni cambie la sesión, cada refresco los reutiliza.
+@st.cache_data(max_entries=512, show_spinner=False)
+def metricas_sesion(code: str, version: int) -> dict:
+    from acuerdo import ipras
+    s = store[code]
+    agg = agregado_sesion(s)
+    mediana, lo, hi = agg.median_ci()
+    rand = ipras(agg.conteos.reshape(1, 9))
+    return {
+        "n": agg.n,
+        "media": agg.media,
+        "desv_std": agg.desv_std,
+        "mediana": mediana,
+        "lo": lo,
+        "hi": hi,
+        "pct": agg.consenso * 100,
+        "n_desacuerdo": agg.n_desacuerdo,
+        "votos_actuales": len(registro_sesion(s)),
+        "ipr": float(rand["ipr"][0]),
+        "ipras": float(rand["ipras"][0]),
+        "desacuerdo_rand": bool(rand["desacuerdo"][0]),
+    }
+
+
+def conteos_sesion(s: dict) -> tuple:
+    """Los 9 conteos (votos 1..9) del agregado de la sesión."""
+    return tuple(int(c) for c in agregado_sesion(s).conteos)
+
+
+# El gráfico se arma con los 9 conteos, no con los votos crudos (costo constante)
+@st.cache_data(max_entries=512, show_spinner=False)
+def figura_histograma(code: str, version: int) -> str:
+    """Figura plotly del histograma serializada en JSON."""
+    from graficos import figura_json
+    return figura_json(conteos_sesion(store[code]), PRIMARY)
+
+
+def estado_consenso(votos, quorum, pct, n_desacuerdo, mediana, lo, hi) -> np.ndarray:
+    """Estado de consenso de muchas filas a la vez (mismo criterio que el Dashboard de cada sesión)."""
+    def entre(a, b):
+        return (mediana >= a) & (mediana <= b) & (lo >= a) & (lo <= b) & (hi >= a) & (hi <= b)
+
+    return np.select(
+        [votos < quorum,
+         (pct >= 80) & entre(7, 9),
+         pct >= 80,
+         (pct <= 20) & entre(1, 3),
+         n_desacuerdo >= 0.8 * votos],
+        ["🕒 Quórum no alcanzado",
+         "✅ Consenso (mediana + IC95%)",
+         "✅ Consenso (% votos)",
+         "❌ No aprobado (mediana + IC95%)",
+         "❌ No aprobado (% votos)"],
+        "⚠️ Sin consenso",
+    ).astype(object)
+
+
+def matriz_items(s: dict) -> np.ndarray:
+    """
+    Votos por ítem de la sesión: matriz int8 participantes × recomendaciones
+    (0 = sin voto), con una columna por cada recomendación de la descripción.
+    """
+    k = len(separar_recomendaciones(s.get("desc", "")))
+    reg = registro_sesion(s)
+    with reg.lock:
+        M = np.zeros((len(reg), k), dtype=np.int8)
+        j = min(k, reg.n_items)
+        M[:, :j] = reg.items[:, :j]
+    return M
+
+
+def metricas_items(M: np.ndarray, quorum: int) -> dict:
+    """
+    Métricas de cada ítem en una sola pasada sobre las columnas de `M`
+    (participantes × ítems): el histograma ítems × 9 sale de un bincount.
+    Incluye los índices RAND/UCLA de desacuerdo (ver acuerdo.py).
+    """
+    from acuerdo import ipras
+    k = M.shape[1]
+    C = np.bincount((np.arange(k, dtype=np.int64) * 10 + M).ravel(),
+                    minlength=10 * k).reshape(k, 10)[:, 1:]
+    valores = np.arange(1, 10)
+    n = C.sum(axis=1)
+    nn = np.maximum(n, 1)
+    suma, suma2 = C @ valores, C @ (valores * valores)
+    media = suma / nn
+    desv = np.sqrt(np.maximum(suma2 - suma * media, 0) / np.maximum(n - 1, 1))
+    desv[n < 2] = 0.0
+    pct = C[:, 6:].sum(axis=1) / nn * 100
+    n_desacuerdo = C[:, :3].sum(axis=1)
+    mediana, lo, hi = median_ci_matriz(C)
+    rand = ipras(C)
+    return {
+        "n": n, "media": media, "desv_std": desv, "pct": pct, "n_desacuerdo": n_desacuerdo,
+        "mediana": mediana, "lo": lo, "hi": hi, "conteos": C,
+        "ipr": rand["ipr"], "ipras": rand["ipras"], "desacuerdo_rand": rand["desacuerdo"],
+        "estado": estado_consenso(n, quorum, pct, n_desacuerdo, mediana, lo, hi),
+    }
+
+
+def texto_ipras(ipr: float, umbral: float, desacuerdo: bool) -> str:
+    """'IPR / IPRAS' para los reportes, con aviso si hay desacuerdo RAND/UCLA."""
+    if np.isnan(ipr):
+        return "—"
+    return f"{ipr:.1f} / {umbral:.2f}" + (" ⚠️ desacuerdo" if desacuerdo else "")
+
+
+def texto_desacuerdo(n, desacuerdo) -> np.ndarray:
+    """Columna 'Desacuerdo RAND' de muchas filas: '—' sin votos."""
+    return np.select([np.asarray(n) == 0, desacuerdo], ["—", "⚠️ Sí"], "No").astype(object)
+
+
+def tabla_items_sesion(s: dict) -> pd.DataFrame:
+    """Resultados por ítem de una sesión votada por ítem (una fila por recomendación)."""
+    recos = separar_recomendaciones(s.get("desc", ""))
+    m = metricas_items(matriz_items(s), s.get("n_participantes", 0) // 2 + 1)
+    return pd.DataFrame({
+        "Ítem": np.arange(1, len(recos) + 1),
+        "Recomendación": recos,
+        "Votos": m["n"],
+        "Media": m["media"],
+        "Desv. std.": m["desv_std"],
+        "% Consenso": m["pct"],
+        "Mediana": m["mediana"],
+        "IC95% (lo)": m["lo"],
+        "IC95% (hi)": m["hi"],
+        "IPR": m["ipr"],
+        "IPRAS": m["ipras"],
+        "Desacuerdo RAND": texto_desacuerdo(m["n"], m["desacuerdo_rand"]),
+        "Estado": m["estado"],
+    })
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def tabla_items(code: str, version: int) -> pd.DataFrame:
+    return tabla_items_sesion(store[code])
+
+
+def acuerdo_sesion_datos(s: dict) -> dict:
+    """
+    Acuerdo entre evaluadores de la sesión (ver acuerdo.py): W de Kendall
+    entre las recomendaciones de una sesión votada por ítem; en un paquete
+    GRADE, el resumen por dominio de tablas_grade (cada dominio tiene sus
+    propias opciones, así que el acuerdo se mide dentro de cada uno). Vacío
+    en las demás sesiones; el IPR/IPRAS va con las métricas de cada ítem o
+    sesión.
+    """
+    from acuerdo import w_kendall
+    if s.get("tipo") == "GRADE_PKG":
+        return {"dominios": tablas_grade(s)[2]}
+    if s.get("por_item"):
+        return {"kendall": w_kendall(matriz_items(s))}
+    return {}
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def acuerdo_sesion(code: str, version: int) -> dict:
+    return acuerdo_sesion_datos(store[code])
+
+
+def kappa_grade_datos(paquetes: list) -> pd.DataFrame:
+    """
+    κ de Fleiss de cada dominio GRADE entre paquetes: los sujetos son los
+    paquetes y las categorías, las opciones de ese dominio (las de
+    DOMINIOS_GRADE y, a continuación, las que aparezcan fuera de la lista).
+    La matriz paquetes × opciones de cada dominio se arma con las
+    frecuencias de tablas_grade, así el acuerdo esperado sale de las
+    proporciones de las opciones del propio dominio.
+    """
+    from acuerdo import kappa_fleiss
+    columnas = ["Dominio", "Paquetes", "Evaluadores (media)", "Acuerdo entre pares (%)",
+                "Acuerdo esperado (%)", "κ de Fleiss"]
+    if not paquetes:
+        return pd.DataFrame(columns=columnas)
+    frec = pd.concat([tablas_grade(s)[1].assign(Paquete=i) for i, s in enumerate(paquetes)],
+                     ignore_index=True)
+    filas = []
+    for dom, f in frec.groupby("Dominio", sort=False):
+        opciones = list(DOMINIOS_GRADE.get(dom, []))
+        opciones += [o for o in pd.unique(f["Opción"]) if o not in set(opciones)]
+        C = np.zeros((len(paquetes), len(opciones)), dtype=np.int64)
+        C[f["Paquete"].to_numpy(), pd.Categorical(f["Opción"], categories=opciones).codes] = f["Votos"]
+        k = kappa_fleiss(C)
+        filas.append((dom, k["sujetos"], round(k["evaluadores"], 1), round(k["p_obs"] * 100, 1),
+                      round(k["p_esp"] * 100, 1), round(k["kappa"], 3)))
+    return pd.DataFrame(filas, columns=columnas)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def kappa_grade(claves: tuple) -> pd.DataFrame:
+    """κ de Fleiss por dominio entre los paquetes GRADE indicados en `claves` = ((código, versión), …)."""
+    return kappa_grade_datos([store[c] for c, _ in claves])
+
+
+def matriz_panel(sesiones: list):
+    """
+    Votos globales de varias sesiones como matriz participantes × sesiones
+    (0 = no votó), alineada por ID de participante (el mismo nombre da el
+    mismo ID en todas las sesiones).
+    """
+    ids, columna, votos = [], [], []
+    for j, s in enumerate(sesiones):
+        v, _, t = columnas_sesion(s)
+        ids += t["ids"]
+        columna.append(np.full(len(v), j, dtype=np.int64))
+        votos.append(v)
+    fila, pids = pd.factorize(pd.Series(ids, dtype=object))
+    M = np.zeros((len(pids), len(sesiones)), dtype=np.int8)
+    if sesiones:
+        M[fila, np.concatenate(columna)] = np.concatenate(votos)
+    return M
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def kendall_panel(claves: tuple) -> dict:
+    """W de Kendall entre las recomendaciones (sesiones de voto global) indicadas en `claves`."""
+    from acuerdo import w_kendall
+    return w_kendall(matriz_panel([store[c] for c, _ in claves if not store[c].get("por_item")]))
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def tablero_sesiones(claves: tuple) -> pd.DataFrame:
+    """
+    Métricas de todas las sesiones indicadas en una sola pasada vectorizada
+    sobre la matriz sesiones × 9 de conteos. `claves` = ((código, versión), …).
+    """
+    from acuerdo import ipras
+    codigos = [c for c, _ in claves]
+    sesiones = [store[c] for c in codigos]
+    C = np.array([agregado_sesion(s).conteos for s in sesiones], dtype=np.int64).reshape(-1, 9)
+    votos = np.array([len(registro_sesion(s)) for s in sesiones], dtype=np.int64)
+    quorum = np.array([s.get("n_participantes", 0) // 2 + 1 for s in sesiones], dtype=np.int64)
+    n = C.sum(axis=1)
+    pct = C[:, 6:].sum(axis=1) / np.maximum(n, 1) * 100
+    n_desacuerdo = C[:, :3].sum(axis=1)
+    mediana, lo, hi = median_ci_matriz(C)
+    rand = ipras(C)
+    estado = estado_consenso(votos, quorum, pct, n_desacuerdo, mediana, lo, hi)
+    # Las sesiones votadas por ítem no tienen voto global: se resume cuántos ítems llegaron a consenso
+    for i, s in enumerate(sesiones):
+        if s.get("por_item"):
+            e = tabla_items(codigos[i], version_sesion(s))["Estado"]
+            estado[i] = f"📋 {int(e.str.startswith('✅').sum())}/{len(e)} ítems con consenso"
+    return pd.DataFrame({
+        "Código": codigos,
+        "Recomendación": [s["desc"] for s in sesiones],
+        "Ronda": [s.get("round", 1) for s in sesiones],
+        "Votos": votos,
+        "Quórum": quorum,
+        "Avance": np.minimum(votos / quorum, 1.0) * 100,
+        "% Consenso": pct,
+        "Mediana": mediana,
+        "IC95% (lo)": lo,
+        "IC95% (hi)": hi,
+        "IPR": rand["ipr"],
+        "IPRAS": rand["ipras"],
+        "Desacuerdo RAND": texto_desacuerdo(n, rand["desacuerdo"]),
+        "Estado": estado,
+    })
+
+
+# Exportaciones en segundo plano: el libro consolidado se genera una vez por
+# versión global del store y queda en disco (ver trabajos.py).
+def exportar_excel_consolidado(ruta: str, avance) -> list:
+    hojas = []
+    crear_excel_consolidado(store, history, en_disco=True, ruta=ruta, hojas=hojas, avance=avance)
+    return hojas
+
+
+def exportar_docx_consolidado(ruta: str, avance):
+    crear_reporte_consolidado_recomendaciones(store, history, destino=ruta, avance=avance)
+
+
+def lotes_votos(store: dict, history: dict, avance=None, opciones_extra: dict = None):
+    """
+    Todos los votos, como lotes para votos_largos: por sesión, cada ronda
+    archivada y la actual; en los paquetes GRADE, un lote por dominio con el
+    voto codificado como la posición (desde 1) de la opción en DOMINIOS_GRADE,
+    y en las sesiones votadas por ítem, un lote por recomendación.
+
+    Los votos GRADE que no están en la lista del dominio siguen numerándose a
+    continuación (ver codigos_opciones); si se da `opciones_extra`, allí se
+    anotan esas opciones: {sesión: {ronda: {dominio: [opciones]}}}.
+    """
+    avance = avance or (lambda fraccion, detalle="": None)
+    sesiones = list(store.items())
+    for i, (code, s) in enumerate(sesiones, 1):
+        for r in history.get(code, []) + [s]:
+            ronda = r.get("round", 1)
+            if s.get("tipo") == "GRADE_PKG":
+                for dom, meta in r.get("dominios", {}).items():
+                    opciones = DOMINIOS_GRADE.get(dom, meta.get("opciones", []))
+                    c, categorias = codigos_opciones(meta["votes"], opciones)
+                    if opciones_extra is not None and len(categorias) > len(opciones):
+                        por_ronda = opciones_extra.setdefault(code, {}).setdefault(str(ronda), {})
+                        por_ronda[dom] = categorias[len(opciones):]
+                    yield {"sesion": code, "ronda": ronda, "dominio": dom, "participantes": meta["ids"],
+                           "votos": (c + 1).astype(np.int8)}
+            else:
+                # Las rondas archivadas se leen igual que la actual (pueden estar ya migradas)
+                votos, fechas, t = columnas_sesion(r)
+                ids, items = t["ids"], t.get("items")
+                if not items:
+                    yield {"sesion": code, "ronda": ronda, "participantes": ids,
+                           "votos": votos, "fechas": fechas}
+                    continue
+                # Votación por ítem: un lote por columna de la matriz participantes × ítems
+                k = max(map(len, items))
+                M = codigos_items("".join(x.ljust(k, "0") for x in items)).reshape(len(ids), k)
+                for j in range(k):
+                    yield {"sesion": code, "ronda": ronda, "item": j + 1, "participantes": ids,
+                           "votos": M[:, j], "fechas": fechas}
+        avance(0.95 * i / len(sesiones), f"Sesión {code} ({i}/{len(sesiones)})")
+
+
+def exportar_votos_csv(ruta: str, avance) -> int:
+    from votos_largos import escribir_csv
+    return escribir_csv(lotes_votos(store, history, avance), ruta)
+
+
+def exportar_votos_columnar(ruta: str, avance) -> int:
+    from votos_largos import escribir_columnar
+    # Los metadatos se escriben después de los votos, así que `extra` ya
+    # tiene las opciones GRADE fuera de lista cuando se serializa
+    extra = {}
+    return escribir_columnar(lotes_votos(store, history, avance, extra), ruta,
+                             metadatos={"opciones_grade": DOMINIOS_GRADE,
+                                        "opciones_extra_grade": extra,
+                                        "generado": f"{datetime.datetime.now():%Y-%m-%d %H:%M:%S}"})
+
+
+# Exportaciones de votos en formato largo: tipo de trabajo, descripción, función, extensión, MIME
+FORMATOS_VOTOS = {
+    "CSV": ("votos_csv", "Votos (.csv)", exportar_votos_csv, "csv", "text/csv"),
+    "Columnar binario (.cnsv)": ("votos_cnsv", "Votos (.cnsv)", exportar_votos_columnar, "cnsv",
+                                 "application/octet-stream"),
+}
+
+
+def mostrar_trabajo(trabajo, mime: str):
+    """
+    Avance del trabajo y botón de descarga del último archivo terminado de su
+    tipo (mientras se prepara uno nuevo, se ofrece el anterior). Devuelve el
+    trabajo que se ofrece para descargar, o None.
+    """
+    if trabajo.activo:
+        from streamlit_autorefresh import st_autorefresh
+        st.progress(trabajo.progreso, text=trabajo.detalle or "En cola…")
+        st_autorefresh(interval=1000, key=f"refresh_{trabajo.clave[0]}")
+    elif trabajo.estado == "error":
+        st.error(f"Error al generar el archivo: {trabajo.error}")
+
+    listo = trabajo if trabajo.estado == "listo" else get_trabajos().ultimo_listo(trabajo.clave[0])
+    if listo is not None:
+        if listo is not trabajo:
+            st.caption("Se ofrece la última versión generada; la actualizada se está preparando.")
+        st.download_button(
+            label=f"⬇️ Descargar {listo.descripcion}",
+            data=get_trabajos().leer(listo),
+            file_name=listo.nombre_archivo,
+            mime=mime,
+            key=f"descarga_{listo.clave[0]}"
+        )
+    return listo
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def excel_sesion(code: str, version: int) -> bytes:
+    return to_excel(code).getvalue()
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def reporte_txt(code: str, version: int) -> str:
+    return create_report(code)
+
+
 # Crear carpeta para guardar datos si no existe
 DATA_DIR = "registro_data"
 os.makedirs(DATA_DIR, exist_ok=True)
@@ -505,12 +1053,13 @@ def guardar_registros(nombre, registros):
     df = pd.DataFrame(registros)
     df.to_csv(os.path.join(DATA_DIR, f"{nombre}.csv"), index=False)
 
-# Inicializar en session_state
-if "registro_conflicto" not in st.session_state:
-    st.session_state["registro_conflicto"] = cargar_registros("registro_conflicto")
+# Inicializar en session_state (quien entra a votar no los usa: no se leen)
+if "session" not in st.query_params:
+    if "registro_conflicto" not in st.session_state:
+        st.session_state["registro_conflicto"] = cargar_registros("registro_conflicto")
 
-if "registro_confidencialidad" not in st.session_state:
-    st.session_state["registro_confidencialidad"] = cargar_registros("registro_confidencialidad")
+    if "registro_confidencialidad" not in st.session_state:
+        st.session_state["registro_confidencialidad"] = cargar_registros("registro_confidencialidad")
 
 # Lógica si la URL tiene ?registro=...
 params = st.query_params
@@ -576,16 +1125,66 @@ if "registro" in params:
 
 
 
-# 2) Almacenamiento persistente utilizando session_state
-# Esto asegura que las sesiones persistan incluso cuando Streamlit se reinicia
-# Diccionario compartido en todo el servidor
+# 2) Almacenamiento persistente
+# Diccionario compartido en todo el servidor, respaldado por el backend
+# configurado (SQLite en modo WAL por defecto) para sobrevivir reinicios.
+#   CONSENSO_BACKEND = "sqlite" | "eventos" | "memoria"
+#   CONSENSO_DB      = archivo SQLite, o carpeta del log de eventos
+@st.cache_resource
+def get_backend():
+    tipo = os.environ.get("CONSENSO_BACKEND", "sqlite")
+    defecto = os.path.join(DATA_DIR, "eventos" if tipo == "eventos" else "consenso.db")
+    return crear_backend(tipo, os.environ.get("CONSENSO_DB", defecto))
+
+
+@st.cache_resource
+def get_blobs():
+    return AlmacenBlobs(os.path.join(DATA_DIR, "blobs"))
+
+
+# Logo y demás activos fijos: se descargan una vez (o vienen en assets/) y
+# se sirven desde memoria; los reportes nunca esperan a la red.
+LOGO_ODDS = "logo_odds.png"
+LOGO_URL = "https://static.wixstatic.com/media/89a9c2_ddc57311fc734357b9ea2b699e107ae2~mv2.png/v1/fill/w_90,h_54,al_c,q_85,usm_0.66_1.00_0.01/Logo%20versi%C3%B3n%20principal.png"
+
+
+@st.cache_resource
+def get_activos():
+    from activos import Activos
+    activos = Activos(
+        {LOGO_ODDS: LOGO_URL},
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets"),
+        os.path.join(DATA_DIR, "activos"),
+    )
+    activos.precargar()
+    return activos
+
+
+@st.cache_resource
+def get_pool_graficos():
+    """Procesos para renderizar imágenes en paralelo (histogramas del DOCX, hojas de QR)."""
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=min(4, os.cpu_count() or 1), mp_context=multiprocessing.get_context("spawn"))
+
+
+@st.cache_resource
+def get_trabajos():
+    ttl = int(os.environ.get("CONSENSO_EXPORT_TTL", 3600))   # segundos
+    return GestorTrabajos(os.path.join(DATA_DIR, "exportaciones"), ttl=ttl)
+
+
 @st.cache_resource
 def get_store():
-    return {}
+    store = {}
+    for code, s, filas, filas_grade, imagenes in get_backend().cargar_sesiones():
+        store[code] = sesion_desde_backend(s, filas, filas_grade, imagenes)
+        marcar_cambio(store[code])
+    return store
 
-store = get_store()
-# Historia en memoria:
-history = {}
+
+@st.cache_resource
+def get_history():
+    return get_backend().cargar_rondas()
 
 
 # 3) Utilidades
@@ -595,40 +1194,44 @@ def make_session(desc: str, scale: str) -> str:
     store[code] = {
         "desc": desc,
         "scale": scale,
-        "votes": [],
-        "comments": [],
-        "ids": [],
-        "names": [],
+        "registro": RegistroVotos(),
         "created_at": timestamp,
         "round": 1
     }
     history[code] = []  # inicializamos el historial
+    persistir_sesion(code)
     return code
 
 
 def hash_id(name: str) -> str:
     return hashlib.sha256(name.encode()).hexdigest()[:8]
 
-# Función para validar si un correo está autorizado para votar en una sesión privada
-def correo_autorizado(correo: str, code: str) -> bool:
-    if code in store:
-        sesion = store[code]
-        if sesion.get("privado", False):
-            lista = sesion.get("correos_autorizados", [])
-            return correo.lower().strip() in [c.lower().strip() for c in lista]
-    return True
+@st.cache_resource
+def get_listas_correos() -> dict:
+    """Listas de correos autorizados ya indexadas: {código: (valor guardado, ListaCorreos)}."""
+    return {}
+
+
+def lista_correos(code: str, s: dict):
+    """ListaCorreos de la sesión; se rearma sólo si cambió la lista guardada."""
+    from correos_autorizados import ListaCorreos
+    valor = s.get("correos_autorizados") or []
+    listas = get_listas_correos()
+    cache = listas.get(code)
+    if cache is None or cache[0] is not valor:
+        cache = listas[code] = (valor, ListaCorreos.desde_guardado(valor))
+    return cache[1]
+
 
 # Función para validar si un correo está autorizado para votar en una sesión privada
 def correo_autorizado(correo: str, code: str) -> bool:
-    if code in store:
-        sesion = store[code]
-        if sesion.get("privado", False):
-            lista = sesion.get("correos_autorizados", [])
-            return correo and correo.lower().strip() in [c.lower().strip() for c in lista]
-    return True  # Si la sesión no es privada, siempre es autorizado
+    s = store.get(code)
+    if s is None or not s.get("privado", False):
+        return True  # Si la sesión no es privada, siempre es autorizado
+    return correo in lista_correos(code, s)
 
 # Función para registrar el voto
-def record_vote(code: str, vote, comment: str, name: str, correo: str = None):
+def record_vote(code: str, vote, comment: str, name: str, correo: str = None, items=None):
     if code not in store:
         return None
 
@@ -638,19 +1241,15 @@ def record_vote(code: str, vote, comment: str, name: str, correo: str = None):
     s = store[code]
     pid = hashlib.sha256(name.encode()).hexdigest()[:8]
 
-    if name and name in s["names"]:
-        idx = s["names"].index(name)
-        s["votes"][idx] = vote
-        s["comments"][idx] = comment
-        if "correos" in s and idx < len(s["correos"]):
-            s["correos"][idx] = correo  # 🟢 actualiza el correo si ya existía
-        return pid
-
-    s["votes"].append(vote)
-    s["comments"].append(comment)
-    s["ids"].append(pid)
-    s["names"].append(name)
-    s.setdefault("correos", []).append(correo)  # 🟢 añade el correo nuevo
+    # Sobrescribe si el participante ya votó (búsqueda O(1) por nombre/ID).
+    # El candado de la sesión mantiene el mismo orden en memoria y en el backend,
+    # y la ronda escrita en el backend es la del registro que recibió el voto.
+    with registro_actual(s) as reg:
+        idx, _ = reg.registrar(pid, name, vote, comment, correo, items=items)
+        get_backend().registrar_voto(
+            code, s.get("round", 1), pid, name, int(reg.votos[idx]) or None,
+            comment, correo, _fecha_texto(reg.fechas[idx]), reg.items_texto(idx))
+        marcar_cambio(s)
     return pid
 
 
@@ -660,18 +1259,172 @@ def consensus_pct(votes):
         return 0.0
     return sum(1 for v in int_votes if v >= 7) / len(int_votes)
 
-def median_ci(votes):
+def conteos_likert(votes) -> np.ndarray:
+    """
+    Histograma de 9 posiciones (índice 0 → voto 1, …, índice 8 → voto 9).
+    Los votos no numéricos o fuera de 1–9 se ignoran.
+    """
     arr = np.array([v for v in votes if isinstance(v, (int, float))], dtype=float)
-    n = arr.size
+    arr = arr[(arr >= 1) & (arr <= 9)]
+    return np.bincount(np.rint(arr).astype(np.int64) - 1, minlength=9)[:9]
+
+
+def _mediana_conteos(conteos: np.ndarray, n: int) -> float:
+    acum = np.cumsum(conteos)
+    a = np.searchsorted(acum, (n + 1) // 2) + 1      # X_(m)
+    b = np.searchsorted(acum, n // 2 + 1) + 1        # X_(m+1) (igual a X_(m) si n es impar)
+    return float(a + b) / 2
+
+
+def _distribucion_mediana(conteos: np.ndarray, n: int):
+    """
+    Distribución exacta de la mediana de n re-muestras con reemplazo
+    (la distribución bootstrap límite) a partir del histograma 1–9.
+    Devuelve (valores, probabilidades).
+    """
+    from scipy.special import betainc, gammaln
+    p = conteos / n
+    F = np.concatenate(([0.0], np.cumsum(p)))        # F[k] = P(X ≤ k), k = 0…9
+    F = np.clip(F, 0.0, 1.0)
+    F[-1] = 1.0
+    valores = np.arange(1, 10, dtype=float)
+
+    if n % 2:
+        # P(X_(m) ≤ k) = P(Bin(n, F[k]) ≥ m) = I_F[k](m, n-m+1)
+        m = (n + 1) // 2
+        cdf = betainc(m, n - m + 1, F[1:])
+        return valores, np.diff(np.concatenate(([0.0], cdf)))
+
+    # n par: mediana = (X_(m) + X_(m+1)) / 2 → distribución conjunta de los dos centrales
+    m = n // 2
+    S = np.concatenate((1.0 - F[:-1], [0.0]))        # S[k] = P(X ≥ k), k = 1…10 (índice k-1)
+    logc = gammaln(n + 1) - gammaln(m + 1) - gammaln(n - m + 1)
+    with np.errstate(divide="ignore", over="ignore"):
+        logF = np.log(F)                             # índice a = 0…9
+        logS = np.log(S)                             # índice b-1, b = 1…10
+        # H[a, b] = P(X_(m) ≤ a, X_(m+1) ≥ b) = C(n,m) F[a]^m S[b]^(n-m), válido para a < b
+        # (las celdas con a ≥ b pueden desbordar con n grande, pero no se usan)
+        H = np.exp(logc + m * logF[:, None] + (n - m) * logS[None, :])   # (10, 10): a = 0…9, b = 1…10
+    a_idx, b_idx = np.triu_indices(9, k=1)                            # 0 ≤ a-1 < b-1 ≤ 8
+    a, b = a_idx + 1, b_idx + 1
+    J = np.zeros((9, 9))
+    J[a_idx, b_idx] = H[a, b - 1] - H[a - 1, b - 1] - H[a, b] + H[a - 1, b]
+    # Diagonal: P(X_(m) = a) menos la masa ya asignada a X_(m+1) > a
+    cdf_m = betainc(m, n - m + 1, F[1:])
+    pm = np.diff(np.concatenate(([0.0], cdf_m)))
+    J[np.diag_indices(9)] = pm - J.sum(axis=1)
+    J = np.clip(J, 0.0, None)
+
+    medias = (valores[:, None] + valores[None, :]) / 2
+    rejilla = np.arange(2, 19) / 2                   # 1, 1.5, …, 9
+    probs = np.bincount((2 * medias - 2).astype(np.int64).ravel(),
+                        weights=J.ravel(), minlength=17)
+    return rejilla, probs
+
+
+def median_ci_conteos(conteos, confianza: float = 0.95):
+    """
+    Mediana e IC de la mediana calculados de forma exacta desde el histograma
+    de votos 1–9, sin re-muestreo. Reproduce el intervalo 'basic' de
+    scipy.stats.bootstrap con infinitas re-muestras.
+    """
+    return _median_ci_exacto(tuple(int(c) for c in conteos), confianza)
+
+
+@functools.lru_cache(maxsize=4096)
+def _median_ci_exacto(conteos: tuple, confianza: float):
+    conteos = np.asarray(conteos, dtype=float)
+    n = int(conteos.sum())
     if n == 0:
         return 0.0, 0.0, 0.0
-    med = np.median(arr)
-    if n < 2:
+    med = _mediana_conteos(conteos, n)
+    if n < 2 or np.count_nonzero(conteos) == 1:
         return med, med, med
+    valores, probs = _distribucion_mediana(conteos, n)
+    cdf = np.cumsum(probs) / probs.sum()
+    alfa = (1 - confianza) / 2
+    q_lo = valores[np.searchsorted(cdf, alfa - 1e-12)]
+    q_hi = valores[np.searchsorted(cdf, 1 - alfa - 1e-12)]
+    return med, float(2 * med - q_hi), float(2 * med - q_lo)
+
+
+def median_ci_matriz(conteos, confianza: float = 0.95):
+    """
+    Versión vectorizada de median_ci_conteos para muchas sesiones a la vez.
+    `conteos` es una matriz (sesiones × 9); devuelve tres arreglos
+    (mediana, lo, hi) con los mismos valores que el cálculo fila por fila.
+    """
+    from scipy.special import betainc, gammaln
+    C = np.asarray(conteos, dtype=float).reshape(-1, 9)
+    n = C.sum(axis=1)
+    nn = np.maximum(n, 1)
+
+    # Mediana muestral
+    acum = np.cumsum(C, axis=1)
+    a = (acum < ((n + 1) // 2)[:, None]).sum(axis=1) + 1
+    b = (acum < (n // 2 + 1)[:, None]).sum(axis=1) + 1
+    med = (a + b) / 2
+
+    F = np.concatenate((np.zeros((len(C), 1)), acum / nn[:, None]), axis=1)
+    F = np.clip(F, 0.0, 1.0)
+    F[:, -1] = 1.0
+    rejilla = np.arange(2, 19) / 2                   # 1, 1.5, …, 9
+    probs = np.zeros((len(C), 17))
+
+    # n impar: la mediana es X_(m) y cae en los enteros de la rejilla
+    m = (nn + 1) // 2
+    cdf = betainc(m[:, None], (nn - m + 1)[:, None], F[:, 1:])
+    impar = np.diff(np.concatenate((np.zeros((len(C), 1)), cdf), axis=1), axis=1)
+
+    # n par: distribución conjunta de X_(m) y X_(m+1) (ver _distribucion_mediana)
+    m = np.maximum(nn // 2, 1)
+    S = np.concatenate((1.0 - F[:, :-1], np.zeros((len(C), 1))), axis=1)
+    logc = gammaln(nn + 1) - gammaln(m + 1) - gammaln(nn - m + 1)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        logF = np.log(F)
+        logS = np.log(S)
+        H = np.exp(logc[:, None, None] + m[:, None, None] * logF[:, :, None]
+                   + (nn - m)[:, None, None] * logS[:, None, :])
+    H = np.nan_to_num(H)
+    a_idx, b_idx = np.triu_indices(9, k=1)
+    ai, bi = a_idx + 1, b_idx + 1
+    J = np.zeros((len(C), 9, 9))
+    J[:, a_idx, b_idx] = H[:, ai, bi - 1] - H[:, ai - 1, bi - 1] - H[:, ai, bi] + H[:, ai - 1, bi]
+    cdf_m = betainc(m[:, None], (nn - m + 1)[:, None], F[:, 1:])
+    pm = np.diff(np.concatenate((np.zeros((len(C), 1)), cdf_m), axis=1), axis=1)
+    J[:, np.arange(9), np.arange(9)] = pm - J.sum(axis=2)
+    J = np.clip(J, 0.0, None)
+    celdas = (np.arange(9)[:, None] + np.arange(9)[None, :]).ravel()   # índice en la rejilla
+    par = np.zeros((len(C), 17))
+    np.add.at(par, (slice(None), celdas), J.reshape(len(C), -1))
+
+    es_par = (n % 2 == 0)
+    probs[~es_par, ::2] = impar[~es_par]
+    probs[es_par] = par[es_par]
+
+    cdf = np.cumsum(probs, axis=1)
+    cdf /= np.where(cdf[:, -1:] > 0, cdf[:, -1:], 1.0)
+    alfa = (1 - confianza) / 2
+    q_lo = rejilla[np.minimum((cdf < alfa - 1e-12).sum(axis=1), 16)]
+    q_hi = rejilla[np.minimum((cdf < 1 - alfa - 1e-12).sum(axis=1), 16)]
+    lo, hi = 2 * med - q_hi, 2 * med - q_lo
+
+    # Casos degenerados: sin votos, un voto o todos en la misma categoría
+    trivial = (n < 2) | (np.count_nonzero(C, axis=1) == 1)
+    lo = np.where(trivial, med, lo)
+    hi = np.where(trivial, med, hi)
+    vacio = n == 0
+    med, lo, hi = (np.where(vacio, 0.0, x) for x in (med, lo, hi))
+    return med, lo, hi
+
+
+def _median_ci_bootstrap(arr: np.ndarray, n_resamples: int = 1000):
+    from scipy import stats
+    med = np.median(arr)
     try:
         res = stats.bootstrap((arr,), np.median,
                               confidence_level=0.95,
-                              n_resamples=1000,
+                              n_resamples=n_resamples,
                               method="basic")
         lo, hi = res.confidence_interval
         if np.isnan(lo) or np.isnan(hi):
@@ -680,6 +1433,788 @@ def median_ci(votes):
         lo = hi = med
     return med, lo, hi
 
+
+def median_ci(votes, metodo: str = "exacto"):
+    """
+    Mediana e IC95% de la mediana.
+      metodo="exacto": cálculo exacto desde el histograma 1–9 (por defecto)
+      metodo="legacy": bootstrap con 1.000 re-muestras (comportamiento anterior,
+                       útil para contrastar resultados)
+    """
+    if metodo == "legacy":
+        arr = np.array([v for v in votes if isinstance(v, (int, float))], dtype=float)
+        n = arr.size
+        if n == 0:
+            return 0.0, 0.0, 0.0
+        if n < 2:
+            med = np.median(arr)
+            return med, med, med
+        return _median_ci_bootstrap(arr)
+    return median_ci_conteos(conteos_likert(votes))
+
+
+def _voto_likert(v):
+    """Devuelve el voto como entero 1–9, o None si no es un voto Likert."""
+    if isinstance(v, (int, float)) and not isinstance(v, bool) and 1 <= v <= 9:
+        return int(round(v))
+    return None
+
+
+def codigos_items(items) -> np.ndarray:
+    """
+    Votos por ítem de un participante como int8 (0 = sin voto), a partir de
+    una secuencia de votos o del texto de dígitos con que se guardan ("7980").
+    """
+    if isinstance(items, str):
+        c = np.frombuffer(items.encode(), dtype=np.uint8).astype(np.int16) - ord("0")
+        return np.where((c >= 0) & (c <= 9), c, 0).astype(np.int8)
+    return np.array([_voto_likert(v) or 0 for v in items], dtype=np.int8)
+
+
+def items_a_textos(M: np.ndarray) -> list:
+    """Filas de la matriz participantes × ítems como textos de dígitos, en bloque."""
+    if not M.size:
+        return [""] * len(M)
+    B = np.ascontiguousarray(M.astype(np.uint8) + ord("0"))
+    return B.view(f"S{M.shape[1]}").ravel().astype(str).tolist()
+
+
+class AgregadoVotos:
+    """
+    Contadores incrementales de una sesión: histograma 1–9, suma, suma de
+    cuadrados y votos ≥7 / ≤3. Se actualizan en cada voto, de modo que las
+    métricas del Dashboard se obtienen en O(1) sin recorrer los votos.
+    """
+    __slots__ = ("conteos", "suma", "suma2", "n_acuerdo", "n_desacuerdo")
+
+    def __init__(self):
+        self.conteos = np.zeros(9, dtype=np.int64)
+        self.suma = 0
+        self.suma2 = 0
+        self.n_acuerdo = 0      # votos ≥ 7
+        self.n_desacuerdo = 0   # votos ≤ 3
+
+    @classmethod
+    def desde_votos(cls, votes):
+        agg = cls()
+        for v in votes:
+            agg.agregar(v)
+        return agg
+
+    @classmethod
+    def desde_conteos(cls, conteos):
+        agg = cls()
+        agg.conteos = np.asarray(conteos, dtype=np.int64).copy()
+        valores = np.arange(1, 10)
+        agg.suma = int(agg.conteos @ valores)
+        agg.suma2 = int(agg.conteos @ (valores * valores))
+        agg.n_acuerdo = int(agg.conteos[6:].sum())
+        agg.n_desacuerdo = int(agg.conteos[:3].sum())
+        return agg
+
+    def _aplicar(self, voto, signo: int):
+        v = _voto_likert(voto)
+        if v is None:
+            return
+        self.conteos[v - 1] += signo
+        self.suma += signo * v
+        self.suma2 += signo * v * v
+        if v >= 7:
+            self.n_acuerdo += signo
+        elif v <= 3:
+            self.n_desacuerdo += signo
+
+    def agregar(self, voto):
+        self._aplicar(voto, 1)
+
+    def quitar(self, voto):
+        self._aplicar(voto, -1)
+
+    def reemplazar(self, anterior, nuevo):
+        self.quitar(anterior)
+        self.agregar(nuevo)
+
+    @property
+    def n(self) -> int:
+        return int(self.conteos.sum())
+
+    @property
+    def media(self) -> float:
+        n = self.n
+        return self.suma / n if n else 0.0
+
+    @property
+    def desv_std(self) -> float:
+        n = self.n
+        if n < 2:
+            return 0.0
+        var = (self.suma2 - self.suma * self.suma / n) / (n - 1)
+        return float(np.sqrt(max(var, 0.0)))
+
+    @property
+    def consenso(self) -> float:
+        """Proporción de votos ≥7 (equivalente a consensus_pct)."""
+        n = self.n
+        return self.n_acuerdo / n if n else 0.0
+
+    @property
+    def desacuerdo(self) -> float:
+        n = self.n
+        return self.n_desacuerdo / n if n else 0.0
+
+    def median_ci(self):
+        return median_ci_conteos(self.conteos)
+
+
+class RegistroVotos:
+    """
+    Registro columnar de los votos de una sesión. Los votos se guardan en un
+    arreglo int8 (0 = voto no Likert) y las fechas en datetime64, ambos con
+    crecimiento geométrico; nombres, IDs, comentarios y correos se agregan
+    siempre juntos, por lo que las columnas no pueden desalinearse.
+    Un índice nombre/ID → fila permite búsquedas y sobrescrituras en O(1).
+
+    En las sesiones votadas por ítem, los votos de cada recomendación van en
+    una matriz int8 participantes × ítems (`items`; 0 = sin voto) que crece
+    junto con las demás columnas; el voto global queda en 0.
+
+    Cada registro tiene su propio candado: los hilos de Streamlit que votan
+    en la misma sesión se serializan, los de sesiones distintas no se
+    bloquean entre sí. Las lecturas para exportar usan `columnas()`.
+    """
+    __slots__ = ("_votos", "_fechas", "_items", "_n", "ids", "names", "comments",
+                 "correos", "_indice", "agregado", "lock")
+
+    _CAPACIDAD_INICIAL = 16
+
+    def __init__(self):
+        self._votos = np.zeros(self._CAPACIDAD_INICIAL, dtype=np.int8)
+        self._fechas = np.full(self._CAPACIDAD_INICIAL, np.datetime64("NaT"), dtype="datetime64[s]")
+        self._items = np.zeros((self._CAPACIDAD_INICIAL, 0), dtype=np.int8)
+        self._n = 0
+        self.ids = []
+        self.names = []
+        self.comments = []
+        self.correos = []
+        self._indice = {}
+        self.agregado = AgregadoVotos()
+        self.lock = threading.RLock()
+
+    def __getstate__(self):
+        return {k: getattr(self, k) for k in self.__slots__ if k != "lock"}
+
+    def __setstate__(self, estado):
+        if "_items" not in estado:      # registros anteriores a la votación por ítem
+            estado["_items"] = np.zeros((len(estado["_votos"]), 0), dtype=np.int8)
+        for k, v in estado.items():
+            setattr(self, k, v)
+        self.lock = threading.RLock()
+
+    @classmethod
+    def desde_listas(cls, s: dict):
+        """Migra una sesión con listas paralelas (formato anterior)."""
+        reg = cls()
+        names = s.get("names", [])
+        ids = s.get("ids", [])
+        votes = s.get("votes", [])
+        comments = s.get("comments", [])
+        correos = s.get("correos", [])
+        fechas = s.get("fecha_voto", [])
+        items = s.get("items", [])
+        n = min(len(names), len(votes))
+        for i in range(n):
+            reg.registrar(
+                ids[i] if i < len(ids) else hash_id(names[i]),
+                names[i],
+                votes[i],
+                comments[i] if i < len(comments) else "",
+                correos[i] if i < len(correos) else None,
+                fechas[i] if i < len(fechas) else "NaT",
+                items[i] if i < len(items) and items[i] else None,
+            )
+        return reg
+
+    @classmethod
+    def desde_columnas(cls, votos, fechas, ids, names, comments, correos, items=None):
+        """
+        Construye el registro en bloque (vectorizado) desde columnas ya
+        alineadas; `items` son los votos por ítem como textos de dígitos.
+        """
+        reg = cls()
+        n = len(votos)
+        cap = max(cls._CAPACIDAD_INICIAL, 1 << (n - 1).bit_length() if n else 0)
+        reg._votos = np.zeros(cap, dtype=np.int8)
+        reg._votos[:n] = votos
+        reg._fechas = np.full(cap, np.datetime64("NaT"), dtype="datetime64[s]")
+        reg._fechas[:n] = fechas
+        k = max((len(t) for t in items or () if t), default=0)
+        reg._items = np.zeros((cap, k), dtype=np.int8)
+        if k:
+            texto = "".join((t or "").ljust(k, "0") for t in items)
+            reg._items[:n] = codigos_items(texto).reshape(n, k)
+        reg._n = n
+        reg.ids, reg.names = list(ids), list(names)
+        reg.comments, reg.correos = list(comments), list(correos)
+        reg._indice = dict(zip(reg.ids, range(n)))
+        reg._indice.update((nm, i) for i, nm in enumerate(reg.names) if nm)
+        reg.agregado = AgregadoVotos.desde_conteos(
+            np.bincount(reg.votos[reg.votos > 0].astype(np.int64) - 1, minlength=9)[:9])
+        return reg
+
+    def __len__(self):
+        return self._n
+
+    def __contains__(self, clave):
+        return clave in self._indice
+
+    def fila(self, clave):
+        """Fila del participante (por nombre o ID), o None."""
+        return self._indice.get(clave)
+
+    @property
+    def votos(self) -> np.ndarray:
+        return self._votos[:self._n]
+
+    @property
+    def fechas(self) -> np.ndarray:
+        return self._fechas[:self._n]
+
+    @property
+    def items(self) -> np.ndarray:
+        """Matriz participantes × ítems de votos por ítem (0 = sin voto)."""
+        return self._items[:self._n]
+
+    @property
+    def n_items(self) -> int:
+        return self._items.shape[1]
+
+    def items_texto(self, idx: int):
+        """Votos por ítem de la fila `idx` como texto de dígitos, o None."""
+        return items_a_textos(self._items[idx:idx + 1])[0] if self.n_items else None
+
+    def _crecer(self):
+        cap = len(self._votos) * 2
+        votos = np.zeros(cap, dtype=np.int8)
+        votos[:self._n] = self._votos[:self._n]
+        fechas = np.full(cap, np.datetime64("NaT"), dtype="datetime64[s]")
+        fechas[:self._n] = self._fechas[:self._n]
+        items = np.zeros((cap, self.n_items), dtype=np.int8)
+        items[:self._n] = self._items[:self._n]
+        self._votos, self._fechas, self._items = votos, fechas, items
+
+    def _ensanchar(self, k: int):
+        items = np.zeros((len(self._votos), k), dtype=np.int8)
+        items[:, :self.n_items] = self._items
+        self._items = items
+
+    def registrar(self, pid: str, name: str, voto, comentario: str = "",
+                  correo: str = None, fecha=None, items=None):
+        """
+        Registra (o sobrescribe) el voto de un participante; `items`, si se
+        da, son sus votos por ítem (ver codigos_items).
+        Devuelve (fila, es_nuevo).
+        """
+        codigo = _voto_likert(voto) or 0
+        fecha = np.datetime64(datetime.datetime.now() if fecha is None else fecha, "s")
+        items = codigos_items(items) if items is not None else None
+        with self.lock:
+            if items is not None and len(items) > self.n_items:
+                self._ensanchar(len(items))
+            return self._registrar(pid, name, codigo, comentario, correo, fecha, items)
+
+    def _registrar(self, pid, name, codigo, comentario, correo, fecha, items=None):
+        idx = self._indice.get(name) if name else None
+        if idx is None:
+            idx = self._indice.get(pid)
+        if idx is not None:
+            self.agregado.reemplazar(int(self._votos[idx]) or None, codigo or None)
+            self._votos[idx] = codigo
+            self._fechas[idx] = fecha
+            if items is not None:
+                self._items[idx] = 0
+                self._items[idx, :len(items)] = items
+            self.comments[idx] = comentario
+            self.correos[idx] = correo
+            return idx, False
+
+        if self._n == len(self._votos):
+            self._crecer()
+        idx = self._n
+        self._votos[idx] = codigo
+        self._fechas[idx] = fecha
+        if items is not None:
+            self._items[idx, :len(items)] = items
+        self.ids.append(pid)
+        self.names.append(name)
+        self.comments.append(comentario)
+        self.correos.append(correo)
+        self._n += 1
+        if name:
+            self._indice[name] = idx
+        self._indice[pid] = idx
+        self.agregado.agregar(codigo or None)
+        return idx, True
+
+    def columnas(self):
+        """
+        Copia consistente (votos, fechas, textos) tomada bajo el candado, para
+        exportar mientras siguen llegando votos.
+        """
+        with self.lock:
+            n = self._n
+            textos = {
+                "ids": self.ids[:n],
+                "names": self.names[:n],
+                "comments": self.comments[:n],
+                "correos": self.correos[:n],
+            }
+            if self.n_items:
+                textos["items"] = items_a_textos(self._items[:n])
+            return self._votos[:n].copy(), self._fechas[:n].copy(), textos
+
+    def votos_lista(self) -> list:
+        """Votos como lista de Python (None para votos no Likert)."""
+        with self.lock:
+            return [int(v) if v else None for v in self.votos]
+
+    def a_dataframe(self) -> pd.DataFrame:
+        votos, fechas, t = self.columnas()
+        df = pd.DataFrame({
+            "ID anónimo":  t["ids"],
+            "Nombre real": t["names"],
+            "Correo":      t["correos"],
+            "Voto":        pd.Series(votos, dtype="Int8").mask(votos == 0),
+            "Comentario":  t["comments"],
+            "Fecha voto":  fechas,
+        })
+        if "items" in t:
+            M = pd.DataFrame(codigos_items("".join(t["items"])).reshape(len(df), -1), dtype="Int8")
+            M = M.mask(M == 0)
+            M.columns = [f"Ítem {j + 1}" for j in range(M.shape[1])]
+            df = pd.concat([df.iloc[:, :3], M, df.iloc[:, 4:]], axis=1)   # en lugar de "Voto"
+        return df
+
+
+# Candados y contador de versiones compartidos por todo el proceso: Streamlit
+# re-ejecuta el módulo en cada interacción, así que no pueden ser globales
+# del script (cada ejecución tendría los suyos).
+@st.cache_resource
+def get_sincronizacion() -> dict:
+    return {
+        "migracion": threading.Lock(),
+        "versiones": itertools.count(1),
+        "cambios": threading.Condition(),
+        "ultima": 0,        # última versión emitida (versión global del store)
+    }
+
+
+def registro_sesion(s: dict) -> RegistroVotos:
+    """
+    Registro columnar de la sesión; las sesiones en formato de listas
+    (creadas antes o restauradas desde 'Cargar Estado') se migran una vez.
+    """
+    reg = s.get("registro")
+    if reg is not None:
+        return reg
+    with _LOCK_MIGRACION:
+        return _migrar_registro(s)
+
+
+@contextlib.contextmanager
+def registro_actual(s: dict):
+    """
+    Registro vigente de la sesión con su candado tomado. nueva_ronda
+    reemplaza el registro (y el número de ronda) bajo el candado del
+    anterior: quien estaba esperando ese candado vuelve a leer el registro
+    en lugar de escribir en uno ya archivado.
+    """
+    while True:
+        reg = registro_sesion(s)
+        with reg.lock:
+            if s.get("registro") is reg:
+                yield reg
+                return
+
+
+# Evita que dos hilos migren la misma sesión a la vez (y uno pierda votos)
+_LOCK_MIGRACION = get_sincronizacion()["migracion"]
+
+
+def _migrar_registro(s: dict) -> RegistroVotos:
+    reg = s.get("registro")
+    if reg is None and "_origen" in s:
+        # Sesión cargada de un estado binario: se decodifica al primer acceso
+        estado, code = s.pop("_origen")
+        t = estado.textos(code)
+        reg = RegistroVotos.desde_columnas(
+            estado.votos(code), estado.fechas(code),
+            t["ids"], t["names"], t["comments"], t["correos"], t.get("items"))
+        s["registro"] = reg
+    elif reg is None:
+        reg = RegistroVotos.desde_listas(s)
+        for k in ("votes", "comments", "ids", "names", "correos", "fecha_voto", "items", "agregado"):
+            s.pop(k, None)
+        s["registro"] = reg
+    return reg
+
+
+def agregado_sesion(s: dict) -> AgregadoVotos:
+    return registro_sesion(s).agregado
+
+
+def _fecha_texto(fecha) -> str:
+    return None if np.isnat(fecha) else str(fecha).replace("T", " ")
+
+
+def sesion_serializable(s: dict, imagenes: bool = True) -> dict:
+    """
+    Copia de la sesión sólo con tipos básicos (listas en vez del registro).
+    Las listas (y las de cada dominio GRADE) se copian: una ronda archivada
+    no debe cambiar con los votos que sigan llegando a la sesión.
+    """
+    votos, fechas, t = registro_sesion(s).columnas()
+    d = {k: list(v) if isinstance(v, list) else v for k, v in s.items()
+         if k not in ("registro", "agregado", "_origen", "version")}
+    if "dominios" in d:
+        d["dominios"] = {dom: {k: list(v) if isinstance(v, list) else v for k, v in meta.items()}
+                         for dom, meta in d["dominios"].items()}
+    if not imagenes:
+        d.pop("imagenes_relacionadas", None)
+    d.update(
+        ids=t["ids"],
+        names=t["names"],
+        votes=[int(v) if v else None for v in votos],
+        comments=t["comments"],
+        correos=t["correos"],
+        fecha_voto=[_fecha_texto(f) for f in fechas],
+    )
+    if "items" in t:
+        d["items"] = t["items"]
+    return d
+
+
+def guardar_imagen(datos, variantes: bool = True) -> str:
+    """Guarda una imagen en el almacén de blobs y devuelve su digest."""
+    return get_blobs().guardar(datos, variantes=variantes)
+
+
+def imagenes_sesion(s: dict) -> list:
+    """
+    Digests de las imágenes de la sesión. Las imágenes guardadas como bytes
+    (formato anterior) se mueven al almacén de blobs la primera vez.
+    """
+    imagenes = s.get("imagenes_relacionadas", [])
+    if any(not isinstance(i, str) for i in imagenes):
+        imagenes = [i if isinstance(i, str) else guardar_imagen(i, variantes=False)
+                    for i in imagenes]
+        s["imagenes_relacionadas"] = imagenes
+    return imagenes
+
+
+def sesion_desde_backend(s: dict, filas, filas_grade, imagenes) -> dict:
+    """Reconstruye una sesión a partir de las filas guardadas por el backend."""
+    reg = RegistroVotos()
+    for pid, nombre, voto, comentario, correo, fecha, *resto in filas:
+        items = resto[0] if resto else None     # votos por ítem (no están en bases anteriores)
+        reg.registrar(pid, nombre, voto, comentario, correo, fecha or "NaT", items or None)
+    s["registro"] = reg
+    if s.get("tipo") == "GRADE_PKG":
+        s["dominios"] = {
+            dom: {"ids": [], "names": [], "votes": [], "comments": [], "opciones": DOMINIOS_GRADE[dom]}
+            for dom in DOMINIOS_GRADE
+        }
+        for dom, pid, nombre, voto, comentario, fecha in filas_grade:
+            meta = s["dominios"].setdefault(dom, {"ids": [], "names": [], "votes": [], "comments": []})
+            meta["ids"].append(pid)
+            meta["names"].append(nombre)
+            meta["votes"].append(voto)
+            meta["comments"].append(comentario)
+    else:
+        # 'imagenes' sólo trae bytes de bases anteriores al almacén de blobs
+        s["imagenes_relacionadas"] = s.get("imagenes_relacionadas", []) + list(imagenes)
+        imagenes_sesion(s)
+    return s
+
+
+# Versión de cada sesión: número creciente que se renueva en cada cambio
+# (voto, cierre, nueva ronda, edición). Métricas, gráfico y descargas se
+# cachean por (código, versión), así un Dashboard sin votos nuevos no recalcula.
+# Sólo vive en memoria: no se guarda en el backend ni en los estados exportados.
+_SINCRONIZACION = get_sincronizacion()
+_VERSIONES = _SINCRONIZACION["versiones"]
+_CAMBIOS = _SINCRONIZACION["cambios"]
+
+
+def marcar_cambio(s: dict = None) -> int:
+    """Renueva la versión de la sesión `s` (sin `s`, sólo la versión global)."""
+    with _CAMBIOS:
+        v = next(_VERSIONES)
+        if s is not None:
+            s["version"] = v
+        _SINCRONIZACION["ultima"] = v
+        _CAMBIOS.notify_all()
+    return v
+
+
+def version_sesion(s: dict) -> int:
+    v = s.get("version")
+    return v if v is not None else marcar_cambio(s)
+
+
+def version_store() -> int:
+    """Versión global: cambia con cualquier modificación de cualquier sesión."""
+    return _SINCRONIZACION["ultima"]
+
+
+def esperar_cambio(code: str, version: int, espera: float) -> bool:
+    """Bloquea hasta que la sesión cambie de versión o pase `espera` segundos."""
+    with _CAMBIOS:
+        return _CAMBIOS.wait_for(
+            lambda: code not in store or store[code].get("version") != version, espera)
+
+
+def persistir_sesion(code: str):
+    """Guarda los metadatos de la sesión (las imágenes van como digests)."""
+    s = store[code]
+    imagenes_sesion(s)
+    marcar_cambio(s)
+    get_backend().guardar_sesion(code, s)
+
+
+def archivar_ronda(code: str, s: dict):
+    """
+    Archiva la ronda actual en el historial: se guarda una foto compacta
+    (listas de votos, sin imágenes) en lugar de una copia profunda de la sesión.
+    """
+    rondas = history.setdefault(code, [])
+    datos = sesion_serializable(s, imagenes=False)
+    get_backend().guardar_ronda(code, len(rondas), datos)
+    rondas.append(datos)
+    marcar_cambio(s)
+
+
+# Rondas Delphi (ver delphi.py): las rondas archivadas no cambian, así que su
+# Ronda (matriz de votos + cuartiles) se arma una vez y queda en memoria.
+@st.cache_resource
+def get_rondas() -> dict:
+    """{código: {índice: (datos archivados, Ronda)}}"""
+    return {}
+
+
+def ronda_archivada(code: str, i: int):
+    """Ronda del historial `history[code][i]`; se rearma sólo si cambió el historial."""
+    from delphi import Ronda
+    pasadas = history[code]
+    i %= len(pasadas)
+    datos = pasadas[i]
+    cache = get_rondas().setdefault(code, {})
+    if i not in cache or cache[i][0] is not datos:
+        votos, _, t = columnas_sesion(datos)
+        cache[i] = (datos, Ronda.desde_columnas(datos.get("round", i + 1), votos, t["ids"], t.get("items")))
+    return cache[i][1]
+
+
+def ronda_actual(s: dict):
+    from delphi import Ronda
+    votos, _, t = columnas_sesion(s)
+    return Ronda.desde_columnas(s.get("round", 1), votos, t["ids"], t.get("items"))
+
+
+def ronda_previa(code: str, s: dict):
+    """Ronda inmediatamente anterior a la actual de la sesión, o None."""
+    if not history.get(code):
+        return None
+    ronda = ronda_archivada(code, -1)
+    return ronda if ronda.numero < s.get("round", 1) else None
+
+
+def nueva_ronda(code: str):
+    """
+    Cierra la ronda actual (queda en el historial) y abre la siguiente con el
+    registro vacío. La Ronda archivada se calcula aquí, así la
+    retroalimentación de los votantes ya está lista al abrir la nueva ronda.
+    """
+    s = store[code]
+    with registro_actual(s):
+        archivar_ronda(code, s)
+        ronda_archivada(code, -1)
+        s["round"] = s.get("round", 1) + 1
+        s["registro"] = RegistroVotos()
+        s["is_active"] = True
+    persistir_sesion(code)
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def tabla_estabilidad(code: str, version: int) -> pd.DataFrame:
+    """
+    Estabilidad entre rondas consecutivas, una fila por par de rondas e ítem.
+    Los pares archivados salen de rondas ya calculadas; sólo el último par
+    (contra la ronda en curso) depende de los votos nuevos.
+    """
+    from delphi import estabilidad
+    s = store[code]
+    rondas = [ronda_archivada(code, i) for i in range(len(history.get(code, [])))]
+    if rondas and rondas[-1].numero < s.get("round", 1):
+        rondas.append(ronda_actual(s))
+    partes = []
+    for a, b in zip(rondas, rondas[1:]):
+        e = estabilidad(a, b)
+        k = len(e["n"])
+        partes.append(pd.DataFrame({
+            "Rondas": f"{a.numero}→{b.numero}",
+            "Ítem": np.arange(1, k + 1),
+            "Participantes": e["n"],
+            "% Cambio": e["tasa_cambio"] * 100,
+            "% Hacia la mediana": e["hacia_mediana"] * 100,
+            "Acercamiento": e["acercamiento"],
+            "RIC anterior": e["ric_a"],
+            "RIC": e["ric_b"],
+            "Δ RIC": e["delta_ric"],
+            "Estable": np.where(e["estable"], "✅", "—"),
+        }))
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+
+
+def restaurar_estado(sesiones: dict, historial: dict):
+    """Reemplaza todo el estado (memoria y backend) por el indicado."""
+    store.clear()
+    store.update(sesiones)
+    history.clear()
+    history.update(historial)
+    for s in store.values():
+        marcar_cambio(s)
+    marcar_cambio()
+    backend = get_backend()
+    if not backend.persistente:
+        return
+    datos = {}
+    for code, s in store.items():
+        votos, fechas, t = columnas_sesion(s)
+        ronda = s.get("round", 1)
+        filas = [
+            (code, ronda, pid, name, int(voto) or None, com, correo, _fecha_texto(fecha), items)
+            for pid, name, voto, com, correo, fecha, items in zip(
+                t["ids"], t["names"], votos, t["comments"], t["correos"], fechas,
+                t.get("items") or itertools.repeat(None))
+        ]
+        filas_grade = [
+            (code, dom, pid, name, voto, com, None)
+            for dom, meta in s.get("dominios", {}).items()
+            for pid, name, voto, com in zip(meta["ids"], meta["names"], meta["votes"], meta["comments"])
+        ]
+        imagenes_sesion(s)
+        datos[code] = (s, filas, filas_grade, [])
+    rondas = {
+        code: [sesion_serializable(p, imagenes=False) for p in pasadas]
+        for code, pasadas in history.items()
+    }
+    backend.reemplazar_todo(datos, rondas)
+
+
+def columnas_sesion(s: dict):
+    """
+    (votos int8, fechas datetime64, textos) de la sesión. Las sesiones aún no
+    decodificadas de un estado binario se leen sin materializar su registro.
+    """
+    if "registro" not in s and "_origen" in s:
+        estado, code = s["_origen"]
+        return estado.votos(code), estado.fechas(code), estado.textos(code)
+    return registro_sesion(s).columnas()
+
+
+def exportar_estado() -> io.BytesIO:
+    """Estado completo (sesiones + historial) en el formato binario versionado."""
+    digests = []
+
+    def sesiones():
+        for code, s in store.items():
+            votos, fechas, textos = columnas_sesion(s)
+            meta = {k: v for k, v in s.items() if k not in ("registro", "agregado", "_origen", "version")}
+            digests.extend(imagenes_sesion(s))
+            yield code, meta, votos, fechas, textos
+
+    def blobs():
+        for d in dict.fromkeys(digests):
+            if get_blobs().existe(d):
+                yield d, get_blobs().leer(d)
+    historial = {
+        code: [sesion_serializable(p, imagenes=False) for p in pasadas]
+        for code, pasadas in history.items()
+    }
+    buf = io.BytesIO()
+    guardar_estado(buf, sesiones(), historial, blobs())
+    buf.seek(0)
+    return buf
+
+
+def importar_estado(fuente):
+    """Carga un estado binario; cada sesión se decodifica al primer acceso."""
+    estado = EstadoBinario(fuente)
+    # Sólo se copian al almacén los blobs que aún no existen en este servidor
+    for d in estado.digests():
+        if not get_blobs().existe(d):
+            guardar_imagen(estado.blob(d), variantes=False)
+    sesiones = {}
+    for code in estado.codigos():
+        s = estado.meta(code)
+        s["_origen"] = (estado, code)
+        if estado.version == 1 and s.get("tipo", "STD") == "STD":
+            s["imagenes_relacionadas"] = [guardar_imagen(b, variantes=False)
+                                          for b in estado.blobs(code)]
+        sesiones[code] = s
+    restaurar_estado(sesiones, estado.history())
+
+
+store = get_store()
+# Historial de rondas (persistido por el backend)
+history = get_history()
+
+
+# Ingesta de votos por HTTP (opcional): CONSENSO_HTTP_PUERTO activa un endpoint
+# asyncio en este mismo proceso que escribe en `store` con record_vote.
+def registrar_voto_http(code: str, nombre: str, voto, comentario: str = "", correo: str = None):
+    """Mismas reglas que la página de votación; devuelve (estado HTTP, respuesta)."""
+    s = store.get(code)
+    if s is None:
+        return 404, {"error": "Sesión no encontrada"}
+    if s.get("tipo", "STD") != "STD":
+        return 400, {"error": "La sesión no admite votos Likert"}
+    if not nombre or (s.get("privado", False) and not correo):
+        return 400, {"error": "Debe completar todos los campos"}
+    items = None
+    if s.get("por_item"):
+        # Un voto por recomendación, en orden
+        k = len(separar_recomendaciones(s.get("desc", "")))
+        if (not isinstance(voto, list) or len(voto) != k
+                or any(_voto_likert(v) is None or v != int(v) for v in voto)):
+            return 400, {"error": f"El voto debe ser una lista de {k} enteros entre 1 y 9"}
+        items, voto = voto, None
+    elif _voto_likert(voto) is None or voto != int(voto):
+        return 400, {"error": "El voto debe ser un entero entre 1 y 9"}
+    if not correo_autorizado(correo, code):
+        return 403, {"error": "Correo no autorizado"}
+    with registro_actual(s) as reg:
+        if nombre in reg:
+            return 409, {"error": "Ya registró su participación"}
+        pid = record_vote(code, voto if voto is None else int(voto), comentario, nombre, correo, items)
+    return 201, {"id": pid}
+
+
+@st.cache_resource
+def get_servidor_http():
+    puerto = os.environ.get("CONSENSO_HTTP_PUERTO")
+    if not puerto:
+        return None
+    try:
+        return ServidorVotos(registrar_voto_http, os.environ.get("CONSENSO_HTTP_HOST", "0.0.0.0"),
+                             int(puerto)).iniciar()
+    except OSError as e:
+        print(f"⚠️ No se pudo iniciar la ingesta HTTP en el puerto {puerto}: {e}")
+        return None
+
+
+get_servidor_http()
+
 def get_base_url():
     # URL específica para aplicación en Streamlit Cloud
     return "https://consenso-expertos-sfpqj688ihbl7m6tgrdmwb.streamlit.app"
@@ -691,30 +2226,12 @@ def create_qr_code_url(code: str):
     # Construye URL correctamente
     return f"{base_url}/?session={code}"
 
-def make_qr(code: str) -> io.BytesIO:
-    url = create_qr_code_url(code)
-    
-    buf = io.BytesIO()
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_H,  # Nivel más alto de corrección de errores
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(url)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    img.save(buf, format="PNG")
-    buf.seek(0)
-    return buf
-
-def get_qr_code_image_html(code):
-    buf = make_qr(code)
-    img_str = base64.b64encode(buf.getvalue()).decode("utf-8")
+def get_qr_code_image_html(code, formato: str = "svg"):
+    from codigos_qr import qr_data_uri
     url = create_qr_code_url(code)
     html = f"""
     <div style="text-align: center; margin-bottom: 20px;">
-        <img src="data:image/png;base64,{img_str}" width="200">
+        <img src="{qr_data_uri(url, formato)}" width="200">
         <p style="margin-top: 10px; font-size: 0.8rem;">URL: <a href="{url}" target="_blank">{url}</a></p>
     </div>
     """
@@ -722,193 +2239,45 @@ def get_qr_code_image_html(code):
 
 
 
-def crear_reporte_consolidado_recomendaciones(store: dict, history: dict) -> io.BytesIO:
-    """
-    Genera un .docx con, para cada recomendación:
-      - Logo alineado a la derecha en la cabecera
-      - Encabezado con el código
-      - Descripción
-      - Fecha de creación
-      - Tabla de métricas (Total votos, % Consenso, Mediana, IC95%)
-      - Estado de consenso
-    """
-    doc = Document()
-
-
-
 # ——————————————————————————————
 #  Integración en Streamlit
 # ——————————————————————————————
 def integrar_reporte_todas_recomendaciones():
-    st.subheader(" Descargar Reporte Consolidado de Recomendaciones")
+    st.subheader("Documento Word (.docx)")
 
     if not store:
         st.info("No hay recomendaciones registradas aún.")
         return
 
-    if st.button("⬇️ Generar y Descargar .docx"):
-        buf = crear_reporte_consolidado_recomendaciones(store, history)
-        nombre = f"reporte_recomendaciones_{datetime.datetime.now():%Y%m%d}.docx"
-        st.download_button(
-            label="Descargar Documento",
-            data=buf,
-            file_name=nombre,
-            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-        )
+    # Se genera en segundo plano, una vez por versión de los datos
+    trabajo = get_trabajos().enviar(
+        ("docx", version_store()), "Reporte de Recomendaciones (.docx)", exportar_docx_consolidado,
+        f"reporte_recomendaciones_{datetime.datetime.now():%Y%m%d}.docx")
+    mostrar_trabajo(trabajo, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
 
 
 
 # ─────────────────────────────────────────────────────────────
-# 5)  Página de votación (se adapta al tipo de sesión)
-# ─────────────────────────────────────────────────────────────
-# 5) Página de votación (adaptable al tipo de sesión)
-# ─────────────────────────────────────────────────────────────
+# 5) Página de votación según ?session=… (oculta el panel de administración)
 # ─────────────────────────────────────────────────────────────
-# 5) Página de votación (se adapta al tipo de sesión)
-# ─────────────────────────────────────────────────────────────
-# ——————————————————————————————
-# Manejo de la página de votación según ?session=…
-# ——————————————————————————————
-import streamlit as st
-import hashlib
-# … tus otros imports …
-
-# ——————————————————————————————
-# Pantalla de votación (oculta el panel de administración)
-# ——————————————————————————————
-# ——————————————————————————————
-# Manejo de la página de votación según ?session=…
-# ——————————————————————————————
 params = st.query_params
 
 if "session" in params:
-    import hashlib, re, datetime
-
-    odds_header()  # Mostrar encabezado al inicio
-
     raw = params.get("session")
     code = raw[0] if isinstance(raw, list) else raw
     code = code.strip().upper()
-
     s = store.get(code)
-    if not s:
-        st.error(f"❌ Sesión inválida: {code}")
-        st.stop()
-
-    es_privada = s.get("privado", False)
-    tipo = s.get("tipo", "STD")
-
-    # Ocultar navegación y encabezados
-    st.markdown("""
-        <style>
-        [data-testid="stSidebar"] { display: none !important; }
-        [data-testid="collapsedControl"] { display: none !important; }
-        header, footer { visibility: hidden; }
-        </style>
-    """, unsafe_allow_html=True)
-
-    # Paso 1 — Captura de nombre y correo
-    if "nombre_confirmado" not in st.session_state:
-        st.markdown("### 👤 Ingrese su nombre para comenzar")
-        nombre = st.text_input("Nombre completo:")
-        correo = st.text_input("Correo electrónico:") if es_privada else None
-
-        if st.button("Continuar"):
-            if not nombre or (es_privada and not correo):
-                st.warning("⚠️ Debe completar todos los campos.")
-            elif es_privada and not correo_autorizado(correo, code):
-                st.error("❌ Correo no autorizado.")
-            else:
-                st.session_state.nombre = nombre
-                st.session_state.correo = correo
-                st.session_state.nombre_confirmado = True
-                st.rerun()
-        st.stop()
-
-    name = st.session_state.nombre
-    correo = st.session_state.get("correo", None)
-
-    if st.session_state.get("voto_registrado"):
-        st.success("🎉 ¡Gracias por su votación!")
-        st.markdown(f"**ID de participación:** `{st.session_state.voto_id}`")
-        st.stop()
-
-    if name in s["names"]:
-        st.success("✅ Ya registró su participación.")
-        st.stop()
-
-    # Paso 3 — Mostrar recomendaciones
-    def separar_recomendaciones(texto):
-        partes = re.split(r'\s*\d+\.\s*', str(texto))
-        return [p.strip() for p in partes if p.strip()]
-
-    if "titulo" in s and s["titulo"].strip():
-        st.markdown(f"## {s['titulo']}")
-
-    st.markdown("### 📋 Recomendaciones a evaluar")
-    lista_recos = separar_recomendaciones(s["desc"])
-
-    for i, reco in enumerate(lista_recos):
-        st.markdown(f"""
-        <div style="background-color: #ffffff; padding: 15px; border-radius: 8px;
-                    box-shadow: 0 2px 5px rgba(0,0,0,0.1); margin-bottom: 15px;
-                    border-left: 4px solid #662D91;">
-            <strong>Recomendación {i+1}</strong>
-            <p>{reco}</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-    # Paso 4 — Votación
-    st.markdown("### 📊 Votación global")
-    voto = st.radio("Seleccione su nivel de acuerdo (1=Desacuerdo, 9=Acuerdo):",
-                    options=list(range(1, 10)), horizontal=True)
-    comentario = st.text_area("Comentario (opcional):")
-    acepta = st.checkbox("Confirmo que leí las recomendaciones y voto con base en mi criterio")
-
-    # Semáforo explicativo
-    st.markdown("""
-    <div style="margin-top: 20px;">
-      <div style="display: flex; justify-content: space-around; text-align: center;">
-        <div style="flex:1;">
-          <div style="background-color: #e74c3c; color: white; padding: 8px; border-radius: 6px;">1 – 3</div>
-          <div style="margin-top: 5px;">Desacuerdo</div>
-        </div>
-        <div style="flex:1;">
-          <div style="background-color: #f1c40f; color: black; padding: 8px; border-radius: 6px;">4 – 6</div>
-          <div style="margin-top: 5px;">Neutral / Dudoso</div>
-        </div>
-        <div style="flex:1;">
-          <div style="background-color: #27ae60; color: white; padding: 8px; border-radius: 6px;">7 – 9</div>
-          <div style="margin-top: 5px;">Acuerdo</div>
-        </div>
-      </div>
-    </div>
-    """, unsafe_allow_html=True)
-
-    if st.button("✅ Enviar voto"):
-        if not acepta:
-            st.warning("⚠️ Debe confirmar que leyó las recomendaciones.")
-            st.stop()
-
-        pid = hashlib.sha256(name.encode()).hexdigest()[:8]
-        s["names"].append(name)
-        s["ids"].append(pid)
-        s["votes"].append(voto)
-        s["comments"].append(comentario)
-        s.setdefault("correos", []).append(correo)
-        s.setdefault("fecha_voto", []).append(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-        store[code] = s
-
-        st.session_state.voto_registrado = True
-        st.session_state.voto_id = pid
-
-        st.balloons()
-        st.success("🎉 ¡Gracias por su votación!")
-        st.markdown(f"**ID de participación:** `{pid}`")
-        st.stop()
-
-    # Evita que cargue el panel de administración
-    st.stop()
+    previa = ronda_previa(code, s) if s and s.get("tipo", "STD") == "STD" else None
+
+    pagina_votacion(
+        code, s,
+        correo_autorizado=lambda correo: correo_autorizado(correo, code),
+        ya_participo=lambda nombre: nombre in registro_sesion(s),
+        imagenes=lambda: [get_blobs().leer(d, "media") for d in imagenes_sesion(s)],
+        registrar_voto=lambda voto, comentario, nombre, correo, items=None: record_vote(
+            code, voto, comentario, nombre, correo, items),
+        retroalimentacion=previa and (lambda nombre: previa.retroalimentacion(hash_id(nombre))),
+    )
 
 
 # … aquí continúa el resto de tu aplicación (panel de administración, sidebar, etc.) …
@@ -916,12 +2285,12 @@ if "session" in params:
 # 6) Panel de administración
 
 # Logo en la barra lateral
-logo_url = "https://static.wixstatic.com/media/89a9c2_ddc57311fc734357b9ea2b699e107ae2~mv2.png/v1/fill/w_90,h_54,al_c,q_85,usm_0.66_1.00_0.01/Logo%20versi%C3%B3n%20principal.png"
-st.sidebar.image(logo_url, width=80)
+# (desde la caché local; mientras no esté descargado, lo pide el navegador)
+st.sidebar.image(get_activos().obtener(LOGO_ODDS, red=False) or LOGO_URL, width=80)
 odds_header()
 st.sidebar.title("Panel de Control")
 st.sidebar.markdown("### ODDS Epidemiology")
-menu = st.sidebar.selectbox("Navegación", ["Inicio", "Crear Recomendación", "Dashboard", "Crear Paquete GRADE", "Reporte Consolidado"])
+menu = st.sidebar.selectbox("Navegación", ["Inicio", "Crear Recomendación", "Dashboard", "Panel General", "Crear Paquete GRADE", "Reporte Consolidado"])
 
 if menu == "Inicio":
     st.markdown("## Bienvenido al Sistema de votación para Consenso de expertos de ODDS Epidemiology")
@@ -943,11 +2312,6 @@ elif menu == "Crear Recomendación":
     st.subheader("Crear Nueva Recomendación")
     st.markdown('<div class="card">', unsafe_allow_html=True)
 
-    import re
-    def separar_recomendaciones(texto):
-        partes = re.split(r'\s*\d+\.\s*', str(texto))
-        return [p.strip() for p in partes if p.strip()]
-
     st.markdown("### Cargar recomendaciones desde Excel")
     if "uploader_key" not in st.session_state:
         st.session_state.uploader_key = 0
@@ -1005,18 +2369,22 @@ elif menu == "Crear Recomendación":
         scale = st.selectbox("Escala de votación:", ["Likert 1-9", "Sí/No"])
         n_participantes = st.number_input("¿Cuántos participantes están habilitados para votar?", min_value=1, step=1)
         es_privada = st.checkbox("¿Esta recomendación será privada?")
+        votar_por_item = st.checkbox("Votar cada recomendación por separado", value=True,
+                                     help="Si el bloque tiene varias recomendaciones, cada una recibe su propio voto 1–9.")
         imagenes_subidas = st.file_uploader("📷 Cargar imágenes relacionadas (opcional)", type=["png", "jpg", "jpeg"], accept_multiple_files=True)
 
         correos_autorizados = []
         archivo_correos = st.file_uploader("📧 Lista de correos autorizados (CSV con columna 'correo')", type=["csv"])
+        solo_huellas = st.checkbox("Guardar sólo huellas de los correos (no se conservan las direcciones)")
         if archivo_correos:
+            from correos_autorizados import ListaCorreos, leer_csv
             try:
-                df_correos = pd.read_csv(archivo_correos)
-                if "correo" in df_correos.columns:
-                    correos_autorizados = df_correos["correo"].astype(str).str.strip().tolist()
-                    st.success(f"{len(correos_autorizados)} correos cargados.")
-                else:
-                    st.error("El CSV debe contener una columna llamada 'correo'.")
+                # Se normalizan una vez aquí; la verificación de cada votante es O(1)
+                lista = ListaCorreos(leer_csv(archivo_correos), compacta=solo_huellas)
+                correos_autorizados = lista.guardado()
+                st.success(f"{len(lista)} correos cargados.")
+            except ValueError as e:
+                st.error(str(e))
             except Exception as e:
                 st.error(f"No se pudo leer el CSV: {e}")
 
@@ -1043,19 +2411,18 @@ elif menu == "Crear Recomendación":
                 "titulo": titulo_bloque,
                 "desc": desc,
                 "scale": scale,
-                "votes": [],
-                "comments": [],
-                "ids": [],
-                "names": [],
+                "registro": RegistroVotos(),
                 "created_at": timestamp,
                 "round": 1,
                 "is_active": True,
                 "n_participantes": int(n_participantes),
                 "privado": es_privada,
+                "por_item": votar_por_item and len(separar_recomendaciones(desc)) > 1,
                 "correos_autorizados": correos_autorizados,
-                "imagenes_relacionadas": [img.getvalue() for img in imagenes_subidas] if imagenes_subidas else []
+                "imagenes_relacionadas": [guardar_imagen(img.getvalue()) for img in imagenes_subidas] if imagenes_subidas else []
             }
             history[code] = []
+            persistir_sesion(code)
 
             st.success("✅ Sesión creada exitosamente.")
             col1, col2 = st.columns(2)
@@ -1076,8 +2443,17 @@ elif menu == "Crear Recomendación":
 
 
 elif menu == "Dashboard":
+    import plotly.io as pio
+    from streamlit_autorefresh import st_autorefresh
     st.subheader("Dashboard en Tiempo Real")
-    st_autorefresh(interval=5000, key="refresh_dashboard")  # 5000 ms = 5 segundos
+    # Cadencia de actualización elegida por el administrador
+    modo_refresco = st.radio("Actualización:", list(MODOS_REFRESCO), index=1,
+                             horizontal=True, key="modo_refresco")
+    intervalo = MODOS_REFRESCO[modo_refresco]
+    if intervalo:
+        st_autorefresh(interval=intervalo, key="refresh_dashboard")
+    elif intervalo == 0:
+        st.button("🔄 Actualizar")
 
     # Selección de sesión
     active_sessions = [k for k, v in store.items() if v.get("is_active", True)]
@@ -1094,25 +2470,25 @@ elif menu == "Dashboard":
         st.error("Código de sesión no encontrado.")
         st.stop()
 
-    votes = [
-        s["votes"][i] for i in range(len(s["names"]))
-        if i < len(s["votes"]) and isinstance(s["votes"][i], (int, float))
-    ]
-
-    n = len(votes)
-    media = np.mean(votes) if n > 0 else 0.0
-    desv_std = np.std(votes, ddof=1) if n > 1 else 0.0
-    mediana, lo, hi = median_ci(votes)
-    pct = consensus_pct(votes) * 100
+    # Métricas cacheadas por versión (sólo se recalculan si hubo cambios)
+    version = version_sesion(s)
+    m = metricas_sesion(code, version)
+    n = m["n"]
+    media = m["media"]
+    desv_std = m["desv_std"]
+    mediana, lo, hi = m["mediana"], m["lo"], m["hi"]
+    pct = m["pct"]
     quorum = s.get("n_participantes", 0) // 2 + 1
-    votos_actuales = len(set(s["names"]))
+    reg = registro_sesion(s)
+    votos_actuales = m["votos_actuales"]
 
     col_res, col_kpi, col_chart = st.columns([2, 1, 3])
 
     with col_res:
         if st.button("Finalizar esta sesión"):
             store[code]["is_active"] = False
-            history.setdefault(code, []).append(copy.deepcopy(s))
+            archivar_ronda(code, s)
+            persistir_sesion(code)
             st.success("✅ Sesión finalizada.")
             st.rerun()
         st.markdown(f"""
@@ -1124,78 +2500,193 @@ elif menu == "Dashboard":
         **Votos recibidos:** {votos_actuales}
         """)
 
-    with col_kpi:
-        st.markdown(card_html("Media", f"{media:.2f}"), unsafe_allow_html=True)
-        st.markdown(card_html("Desv. estándar", f"{desv_std:.2f}"), unsafe_allow_html=True)
-        st.markdown(card_html("% Consenso", f"{pct:.1f}%"), unsafe_allow_html=True)
-        if n > 0:
-            st.markdown(card_html("Mediana (IC95%)", f"{mediana:.1f} [{lo:.1f}, {hi:.1f}]"), unsafe_allow_html=True)
-
-    with col_chart:
-        if votos_actuales:
-            df = pd.DataFrame({"Voto": votes})
-            fig = px.histogram(
-                df, x="Voto", nbins=9,
-                labels={"Voto": "Escala 1–9", "count": "Frecuencia"},
-                color_discrete_sequence=[PRIMARY]
-            )
-            fig.update_traces(marker_line_width=0)
-            fig.update_layout(
-                bargap=0.4,
-                xaxis=dict(tickmode="linear", tick0=1, dtick=1),
-                margin=dict(t=30, b=20, l=0, r=0),
-                height=300,
-                plot_bgcolor="rgba(0,0,0,0)",
-                paper_bgcolor="rgba(0,0,0,0)"
-            )
-            st.plotly_chart(fig, use_container_width=True)
-
-            st.markdown(f"📊 **Total de votos recibidos:** {votos_actuales}")
-
-            # Estado de consenso justo después del gráfico
-            if votos_actuales < quorum:
-                st.info(f"🕒 Quórum no alcanzado ({votos_actuales}/{quorum})")
-            elif pct >= 80 and 7 <= mediana <= 9 and 7 <= lo <= 9 and 7 <= hi <= 9:
-                st.success("✅ CONSENSO ALCANZADO (mediana + IC95%)")
-            elif pct >= 80:
-                st.success("✅ CONSENSO ALCANZADO (% votos)")
-            elif pct <= 20 and 1 <= mediana <= 3 and 1 <= lo <= 3 and 1 <= hi <= 3:
-                st.error("❌ NO APROBADO (mediana + IC95%)")
-            elif sum(1 for v in votes if v <= 3) >= 0.8 * votos_actuales:
-                st.error("❌ NO APROBADO (% votos)")
+    if s.get("por_item"):
+        # Votación por ítem: una fila por recomendación, calculadas en una pasada sobre la matriz
+        tabla = tabla_items(code, version)
+        with col_kpi:
+            st.markdown(card_html("Ítems", f"{len(tabla)}"), unsafe_allow_html=True)
+            st.markdown(card_html("Con consenso", f"{int(tabla['Estado'].str.startswith('✅').sum())}"),
+                        unsafe_allow_html=True)
+            st.markdown(card_html("Participantes", f"{votos_actuales}"), unsafe_allow_html=True)
+            w = acuerdo_sesion(code, version)["kendall"]
+            if not np.isnan(w["w"]):
+                st.markdown(card_html("W de Kendall", f"{w['w']:.2f}"), unsafe_allow_html=True)
+                st.caption(f"Concordancia entre {w['m']} participantes que votaron todos los ítems "
+                           f"(p = {w['p']:.3g}).")
+        with col_chart:
+            if votos_actuales:
+                st.bar_chart(tabla.set_index("Ítem")["% Consenso"], color=PRIMARY)
             else:
-                st.warning("⚠️ NO SE ALCANZÓ CONSENSO")
-        else:
-            st.info("🔍 Aún no hay votos para mostrar.")
+                st.info("🔍 Aún no hay votos para mostrar.")
+        st.dataframe(
+            tabla, hide_index=True, use_container_width=True,
+            column_config={
+                "Media": st.column_config.NumberColumn(format="%.2f"),
+                "Desv. std.": st.column_config.NumberColumn(format="%.2f"),
+                "% Consenso": st.column_config.ProgressColumn(min_value=0, max_value=100, format="%.1f%%"),
+                "Mediana": st.column_config.NumberColumn(format="%.1f"),
+                "IC95% (lo)": st.column_config.NumberColumn(format="%.1f"),
+                "IC95% (hi)": st.column_config.NumberColumn(format="%.1f"),
+                "IPR": st.column_config.NumberColumn(format="%.1f"),
+                "IPRAS": st.column_config.NumberColumn(format="%.2f"),
+            },
+        )
+    else:
+        with col_kpi:
+            st.markdown(card_html("Media", f"{media:.2f}"), unsafe_allow_html=True)
+            st.markdown(card_html("Desv. estándar", f"{desv_std:.2f}"), unsafe_allow_html=True)
+            st.markdown(card_html("% Consenso", f"{pct:.1f}%"), unsafe_allow_html=True)
+            if n > 0:
+                st.markdown(card_html("Mediana (IC95%)", f"{mediana:.1f} [{lo:.1f}, {hi:.1f}]"), unsafe_allow_html=True)
+                st.markdown(card_html("IPR / IPRAS", f"{m['ipr']:.1f} / {m['ipras']:.2f}"), unsafe_allow_html=True)
+
+        with col_chart:
+            if votos_actuales:
+                st.plotly_chart(pio.from_json(figura_histograma(code, version)), use_container_width=True)
+
+                st.markdown(f"📊 **Total de votos recibidos:** {votos_actuales}")
+
+                # Estado de consenso justo después del gráfico
+                if votos_actuales < quorum:
+                    st.info(f"🕒 Quórum no alcanzado ({votos_actuales}/{quorum})")
+                elif pct >= 80 and 7 <= mediana <= 9 and 7 <= lo <= 9 and 7 <= hi <= 9:
+                    st.success("✅ CONSENSO ALCANZADO (mediana + IC95%)")
+                elif pct >= 80:
+                    st.success("✅ CONSENSO ALCANZADO (% votos)")
+                elif pct <= 20 and 1 <= mediana <= 3 and 1 <= lo <= 3 and 1 <= hi <= 3:
+                    st.error("❌ NO APROBADO (mediana + IC95%)")
+                elif m["n_desacuerdo"] >= 0.8 * votos_actuales:
+                    st.error("❌ NO APROBADO (% votos)")
+                else:
+                    st.warning("⚠️ NO SE ALCANZÓ CONSENSO")
+                if m["desacuerdo_rand"]:
+                    st.warning("⚠️ Desacuerdo según RAND/UCLA (IPR > IPRAS)")
+            else:
+                st.info("🔍 Aún no hay votos para mostrar.")
 
     # Acciones
     st.subheader("Acciones y Exportación")
     if st.button("Iniciar nueva ronda"):
-        history.setdefault(code, []).append(copy.deepcopy(s))
-        st.session_state.modify_recommendation = True
-        st.session_state.current_code = code
+        nueva_ronda(code)
+        st.success(f"✅ Ronda {s['round']} abierta. Los participantes verán su voto anterior y la mediana del grupo.")
+        st.rerun()
+
+    if s.get("tipo", "STD") == "STD" and history.get(code):
+        tabla_delphi = tabla_estabilidad(code, version)
+        if not tabla_delphi.empty:
+            st.subheader("Estabilidad entre rondas (Delphi)")
+            from delphi import UMBRAL_ESTABILIDAD
+            st.caption(f"Estable: a lo sumo {UMBRAL_ESTABILIDAD:.0%} de los participantes cambió su voto. "
+                       "Δ RIC < 0 indica que el grupo converge.")
+            st.dataframe(
+                tabla_delphi, hide_index=True, use_container_width=True,
+                column_config={
+                    "% Cambio": st.column_config.NumberColumn(format="%.1f%%"),
+                    "% Hacia la mediana": st.column_config.NumberColumn(format="%.1f%%"),
+                    "Acercamiento": st.column_config.NumberColumn(format="%.2f"),
+                    "RIC anterior": st.column_config.NumberColumn(format="%.1f"),
+                    "RIC": st.column_config.NumberColumn(format="%.1f"),
+                    "Δ RIC": st.column_config.NumberColumn(format="%+.1f"),
+                },
+            )
 
     c1, c2 = st.columns(2)
     with c1:
-        buf = to_excel(code)
-        if buf:
-            st.download_button("⬇️ Descargar Excel", data=buf.getvalue(),
+        datos_excel = excel_sesion(code, version)
+        if datos_excel:
+            st.download_button("⬇️ Descargar Excel", data=datos_excel,
                                file_name=f"consenso_{code}.xlsx",
                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
         else:
             st.warning("⚠️ No hay datos disponibles para exportar en Excel.")
 
     with c2:
-        st.download_button("⬇️ Descargar TXT", create_report(code),
+        st.download_button("⬇️ Descargar TXT", reporte_txt(code, version),
                            file_name=f"reporte_{code}.txt")
 
     # Comentarios
-    if s.get("comments"):
+    if any(reg.comments):
         st.subheader("Comentarios de Participantes")
-        for pid, name, vote, com in zip(s["ids"], s["names"], s["votes"], s["comments"]):
+        for pid, name, vote, com in zip(reg.ids, reg.names, reg.votos_lista(), reg.comments):
             if com:
                 st.markdown(f"**{name}** (ID:{pid}) — Voto: {vote}\n> {com}")
 
+    # Modo "al recibir votos": espera (long-poll) a que cambie la versión
+    if intervalo is None:
+        limite = time.monotonic() + 25
+        latido = st.empty()
+        while time.monotonic() < limite:
+            if esperar_cambio(code, version, 1.0):
+                st.rerun()
+            latido.empty()  # permite atender clics del usuario mientras espera
+        st.rerun()
+
+
+elif menu == "Panel General":
+    from streamlit_autorefresh import st_autorefresh
+    from codigos_qr import hojas_qr
+    st.subheader("Panel General de Sesiones Activas")
+    modos = [m for m, v in MODOS_REFRESCO.items() if v is not None]
+    intervalo = MODOS_REFRESCO[st.radio("Actualización:", modos, index=1,
+                                        horizontal=True, key="modo_refresco_panel")]
+    if intervalo:
+        st_autorefresh(interval=intervalo, key="refresh_panel")
+    else:
+        st.button("🔄 Actualizar")
+
+    claves = tuple(
+        (code, version_sesion(s)) for code, s in list(store.items())
+        if s.get("is_active", True) and s.get("tipo", "STD") == "STD"
+    )
+    if not claves:
+        st.info("No hay sesiones activas.")
+        st.stop()
+    tablero = tablero_sesiones(claves)
+
+    w = kendall_panel(claves)
+    k1, k2, k3, k4 = st.columns(4)
+    k1.markdown(card_html("Sesiones activas", f"{len(tablero)}"), unsafe_allow_html=True)
+    k2.markdown(card_html("Con quórum", f"{int((tablero['Votos'] >= tablero['Quórum']).sum())}"),
+                unsafe_allow_html=True)
+    k3.markdown(card_html("Con consenso", f"{int(tablero['Estado'].str.startswith('✅').sum())}"),
+                unsafe_allow_html=True)
+    k4.markdown(card_html("W de Kendall", "—" if np.isnan(w["w"]) else f"{w['w']:.2f}"),
+                unsafe_allow_html=True)
+    k4.caption(f"Entre recomendaciones: {w['m']} participantes votaron las {w['n']}.")
+
+    st.dataframe(
+        tablero, hide_index=True, use_container_width=True,
+        column_config={
+            "Avance": st.column_config.ProgressColumn("Votos / quórum", min_value=0, max_value=100, format="%.0f%%"),
+            "% Consenso": st.column_config.NumberColumn(format="%.1f%%"),
+            "Mediana": st.column_config.NumberColumn(format="%.1f"),
+            "IC95% (lo)": st.column_config.NumberColumn(format="%.1f"),
+            "IC95% (hi)": st.column_config.NumberColumn(format="%.1f"),
+            "IPR": st.column_config.NumberColumn(format="%.1f"),
+            "IPRAS": st.column_config.NumberColumn(format="%.2f"),
+        },
+    )
+
+    # Hojas imprimibles con el QR de cada sesión (una tarjeta por sala)
+    with st.expander("🖨️ Hojas de QR para imprimir"):
+        codigos = [code for code, _ in claves]
+        sel_qr = st.multiselect("Sesiones:", codigos, default=codigos, key="sesiones_qr")
+        columnas, filas = POR_PAGINA_QR[st.radio("Tarjetas por página:", list(POR_PAGINA_QR),
+                                                 horizontal=True, key="qr_por_pagina")]
+        if st.button("Generar PDF", key="generar_qr") and sel_qr:
+            entradas = [(c, store[c]["desc"], create_qr_code_url(c)) for c in sel_qr if c in store]
+            clave = ("qr_pdf", (tuple(sel_qr), columnas, filas))
+            get_trabajos().enviar(
+                clave, "Hojas de QR (.pdf)",
+                lambda ruta, avance: hojas_qr(entradas, ruta, get_pool_graficos(), columnas, filas,
+                                              avance=avance),
+                f"hojas_qr_{datetime.datetime.now():%Y%m%d}.pdf")
+            st.session_state["trabajo_qr"] = clave
+        trabajo = (get_trabajos().buscar(st.session_state.get("trabajo_qr"))
+                   or get_trabajos().ultimo_listo("qr_pdf"))
+        if trabajo is not None:
+            mostrar_trabajo(trabajo, "application/pdf")
+
 
 elif menu == "Crear Paquete GRADE":
     st.subheader("Crear / Descargar Paquetes GRADE")
@@ -1225,6 +2716,7 @@ elif menu == "Crear Paquete GRADE":
             "is_active": True
         }
         history[code] = []
+        persistir_sesion(code)
         st.success(f"Paquete GRADE creado con código **{code}**")
         st.markdown(get_qr_code_image_html(code), unsafe_allow_html=True)
         st.info("🔗 Comparte este QR para que los expertos voten.")
@@ -1246,7 +2738,25 @@ elif menu == "Crear Paquete GRADE":
             paquetes,
             format_func=lambda c: f"{c} – {len(store[c]['dominios']['prioridad_problema']['votes'])} votos"
         )
-        buf2 = to_excel(sel_pkg)
+        version_pkg = version_sesion(store[sel_pkg])
+        # κ de cada dominio: los sujetos son todos los paquetes GRADE
+        claves_grade = tuple((c, version_sesion(s)) for c, s in store.items() if s.get("tipo") == "GRADE_PKG")
+        kappas = kappa_grade(claves_grade)[["Dominio", "Paquetes", "κ de Fleiss"]]
+        st.dataframe(
+            acuerdo_sesion(sel_pkg, version_pkg)["dominios"].drop(columns="Pregunta")
+            .merge(kappas, on="Dominio", how="left"),
+            hide_index=True, use_container_width=True,
+            column_config={
+                "% juicio modal": st.column_config.NumberColumn(format="%.1f%%"),
+                "Acuerdo entre pares (%)": st.column_config.NumberColumn(format="%.1f%%"),
+                "κ de Fleiss": st.column_config.NumberColumn(format="%.2f"),
+            },
+        )
+        st.caption("Acuerdo entre pares: proporción de pares de evaluadores que eligieron la misma "
+                   "opción en el dominio, en este paquete. κ de Fleiss: ese acuerdo corregido por el "
+                   "esperado al azar, con los paquetes GRADE como sujetos (requiere al menos 2 "
+                   "paquetes con votos en el dominio).")
+        buf2 = excel_sesion(sel_pkg, version_pkg)
         st.download_button(
             "⬇️ Descargar Excel del paquete",
             data=buf2,
@@ -1261,45 +2771,72 @@ elif menu == "Reporte Consolidado":
     st.header("📊 Reporte Consolidado")
     st.subheader("Libro Excel (.xlsx)")
 
-    # 1. Generar el buffer con todas las hojas
-    buf_xls = crear_excel_consolidado(store, history)
-
-    # 2. Debug: comprobar que realmente tiene la hoja “Métricas”
-    import pandas as pd
-    xls = pd.ExcelFile(buf_xls)  
-    st.write("📑 Hojas en el Excel:", xls.sheet_names)
-
-    # 3. Botón de descarga
-    st.download_button(
-        label="⬇️ Descargar Reporte Consolidado (.xlsx)",
-        data=buf_xls.getvalue(),
-        file_name=f"reporte_consolidado_{datetime.datetime.now():%Y%m%d}.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    # 1. El libro se genera en segundo plano, una vez por versión de los datos
+    trabajo = get_trabajos().enviar(
+        ("xlsx", version_store()), "Reporte Consolidado (.xlsx)", exportar_excel_consolidado,
+        f"reporte_consolidado_{datetime.datetime.now():%Y%m%d}.xlsx")
+
+    # 2. Avance y botón de descarga
+    listo = mostrar_trabajo(trabajo, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+    # 3. Hojas del libro, según se registraron al generarlo
+    if listo is not None:
+        st.write("📑 Hojas en el Excel:")
+        st.dataframe(pd.DataFrame(listo.resultado), hide_index=True)
+
+    integrar_reporte_todas_recomendaciones()
+
+    # 4. Todos los votos en formato largo, para análisis externos (bajo pedido)
+    st.subheader("Votos en formato largo")
+    st.caption("Una fila por voto: sesión, ronda, participante, ítem, dominio, código de voto y fecha. "
+               "El binario columnar se lee con `votos_largos.TablaVotos` (mmap).")
+    formato = st.radio("Formato", list(FORMATOS_VOTOS), horizontal=True, key="formato_votos")
+    tipo, descripcion, funcion, ext, mime = FORMATOS_VOTOS[formato]
+    trabajo = get_trabajos().buscar((tipo, version_store())) or get_trabajos().ultimo_listo(tipo)
+    if st.button("Generar exportación", key="generar_votos"):
+        trabajo = get_trabajos().enviar((tipo, version_store()), descripcion, funcion,
+                                        f"votos_{datetime.datetime.now():%Y%m%d}.{ext}")
+    if trabajo is not None:
+        listo = mostrar_trabajo(trabajo, mime)
+        if listo is not None:
+            st.caption(f"{listo.resultado:,} votos exportados.")
+
+
+# Guardar estado (formato binario versionado)
+if st.sidebar.button("Guardar Estado"):
+    st.sidebar.download_button(
+        "⬇️ Descargar estado",
+        data=exportar_estado().getvalue(),
+        file_name=f"estado_consenso_{datetime.datetime.now():%Y%m%d_%H%M}.cnse",
+        mime="application/octet-stream"
     )
 
-
-# Cargar estado
-state_upload = st.sidebar.file_uploader("Cargar Estado", type=["txt"])
-if state_upload is not None:
+# Cargar estado (binario .cnse; se mantiene el formato .txt anterior)
+state_upload = st.sidebar.file_uploader("Cargar Estado", type=["cnse", "txt"])
+if state_upload is not None and st.session_state.get("estado_cargado") != state_upload.file_id:
     try:
-        content = state_upload.read().decode()
-        decoded = base64.b64decode(content).decode()
-        import ast
-        state_data = ast.literal_eval(decoded)
-
-        if "sessions" in state_data and "history" in state_data:
-            store.clear()
-            store.update(state_data["sessions"])
-            history.clear()
-            history.update(state_data["history"])
+        st.session_state["estado_cargado"] = state_upload.file_id
+        if es_estado_binario(state_upload.getbuffer()):
+            importar_estado(state_upload)
             st.sidebar.success("Estado restaurado correctamente.")
             st.rerun()
         else:
-            st.sidebar.error("El archivo no contiene datos válidos.")
+            content = state_upload.read().decode()
+            decoded = base64.b64decode(content).decode()
+            import ast
+            state_data = ast.literal_eval(decoded)
+
+            if "sessions" in state_data and "history" in state_data:
+                restaurar_estado(state_data["sessions"], state_data["history"])
+                st.sidebar.success("Estado restaurado correctamente.")
+                st.rerun()
+            else:
+                st.sidebar.error("El archivo no contiene datos válidos.")
     except Exception as e:
         st.sidebar.error(f"Error al cargar el estado: {str(e)}")
 
 elif menu == "Registro Previo":
+    from codigos_qr import qr_data_uri
     st.title("Registro Previo - Panel de Consenso")
     st.markdown("Comparta los siguientes enlaces con los participantes para que completen sus registros antes de iniciar el consenso.")
 
@@ -1307,22 +2844,14 @@ elif menu == "Registro Previo":
     st.markdown("###  Declaración de Conflictos de Interés")
     url_conflicto = "https://consenso-expertos-sfpqj688ihbl7m6tgrdmwb.streamlit.app/?registro=conflicto"
     st.code(url_conflicto)
-    qr_conflicto = qrcode.make(url_conflicto)
-    buf1 = io.BytesIO()
-    qr_conflicto.save(buf1, format="PNG")
-    img1 = base64.b64encode(buf1.getvalue()).decode()
-    st.markdown(f'<img src="data:image/png;base64,{img1}" width="180">', unsafe_allow_html=True)
+    st.markdown(f'<img src="{qr_data_uri(url_conflicto)}" width="180">', unsafe_allow_html=True)
 
     # 📄 Confidencialidad
     st.markdown("---")
     st.markdown("###  Compromiso de Confidencialidad")
     url_confid = "https://consenso-expertos-sfpqj688ihbl7m6tgrdmwb.streamlit.app/?registro=confidencialidad"
     st.code(url_confid)
-    qr_confid = qrcode.make(url_confid)
-    buf2 = io.BytesIO()
-    qr_confid.save(buf2, format="PNG")
-    img2 = base64.b64encode(buf2.getvalue()).decode()
-    st.markdown(f'<img src="data:image/png;base64,{img2}" width="180">', unsafe_allow_html=True)
+    st.markdown(f'<img src="{qr_data_uri(url_confid)}" width="180">', unsafe_allow_html=True)
 
     # 📥 Exportar datos recibidos
     st.markdown("---")
@@ -0,0 +1,95 @@
+"""
+Benchmark de arranque en frío: tiempo de importación y de primer render de
+app.py para el votante (?session=CÓDIGO, lo que abre un QR) y para el panel
+de administración.
+
+Uso:
+    python bench_arranque.py
+    python bench_arranque.py --repeticiones 5
+
+Cada medición corre en un proceso nuevo (sin módulos ya importados) sobre
+una carpeta de datos temporal con una sesión de prueba, usando el AppTest de
+Streamlit. Se informa la mediana de:
+  - importación   tiempo total en imports durante el primer run (-X importtime)
+  - módulos       cuántos módulos se importaron
+  - primer render tiempo del primer run completo del script
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+CODIGO = "BENCH1"
+MARCA = "##bench-inicio##"
+
+
+def _preparar(carpeta: str):
+    """Carpeta de datos con una sesión estándar activa."""
+    sys.path.insert(0, os.path.dirname(APP))
+    from almacenamiento import crear_backend
+    os.makedirs(os.path.join(carpeta, "registro_data"), exist_ok=True)
+    backend = crear_backend("sqlite", os.path.join(carpeta, "registro_data", "consenso.db"))
+    backend.guardar_sesion(CODIGO, {
+        "tipo": "STD", "desc": "1. Recomendación de prueba", "round": 1, "is_active": True,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"), "n_participantes": 10,
+    })
+
+
+def _hijo(modo: str):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP, default_timeout=300)
+    if modo == "votante":
+        at.query_params["session"] = CODIGO
+    print(MARCA, file=sys.stderr, flush=True)
+    t0 = time.perf_counter()
+    at.run()
+    render = time.perf_counter() - t0
+    print(json.dumps({"render": render, "errores": [e.value for e in at.exception]}))
+
+
+def _medir(modo: str, carpeta: str) -> dict:
+    env = dict(os.environ, PYTHONPROFILEIMPORTTIME="1", CONSENSO_BACKEND="sqlite")
+    env.pop("CONSENSO_HTTP_PUERTO", None)
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--hijo", modo],
+                          cwd=carpeta, env=env, capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(proc.stderr[-2000:])
+    resultado = json.loads(proc.stdout.strip().splitlines()[-1])
+    if resultado["errores"]:
+        raise RuntimeError(f"{modo}: {resultado['errores']}")
+
+    # Líneas "import time: self [us] | cumulative | paquete" posteriores a la marca
+    lineas = proc.stderr.split(MARCA, 1)[-1].splitlines()
+    propios = [int(l.split("|")[0].split(":")[1]) for l in lineas
+               if l.startswith("import time:") and "self [us]" not in l]
+    resultado.update(importacion=sum(propios) / 1e6, modulos=len(propios))
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--hijo", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.hijo:
+        return _hijo(args.hijo)
+
+    print(f"{'ruta':<15}{'importación':>13}{'módulos':>10}{'primer render':>16}")
+    for modo in ("votante", "administrador"):
+        medidas = []
+        for _ in range(args.repeticiones):
+            with tempfile.TemporaryDirectory() as carpeta:
+                _preparar(carpeta)
+                medidas.append(_medir(modo, carpeta))
+        mediana = {k: statistics.median(m[k] for m in medidas) for k in ("importacion", "modulos", "render")}
+        print(f"{modo:<15}{mediana['importacion'] * 1000:>10.0f} ms{mediana['modulos']:>10.0f}"
+              f"{mediana['render'] * 1000:>13.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Almacén de blobs direccionado por contenido para las imágenes de las sesiones.
+
+Cada imagen se guarda una sola vez en disco bajo su SHA-256
+(carpeta/ab/abcdef…); la sesión sólo conserva el digest. Al subir una
+imagen se generan sus variantes (miniatura y versión reducida), que se
+leen del disco únicamente cuando se muestran.
+"""
+import hashlib
+import io
+import os
+import tempfile
+
+try:
+    from PIL import Image
+except ImportError:  # sin Pillow se sirve siempre el original
+    Image = None
+
+
+# nombre → lado mayor en píxeles
+VARIANTES = {
+    "miniatura": 256,
+    "media": 1024,
+}
+
+
+class AlmacenBlobs:
+    def __init__(self, carpeta: str):
+        self.carpeta = carpeta
+        os.makedirs(carpeta, exist_ok=True)
+
+    def ruta(self, digest: str, variante: str = None) -> str:
+        nombre = digest if variante is None else f"{digest}.{variante}"
+        return os.path.join(self.carpeta, digest[:2], nombre)
+
+    def existe(self, digest: str) -> bool:
+        return os.path.exists(self.ruta(digest))
+
+    def _escribir(self, ruta: str, datos):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(ruta))
+        with os.fdopen(fd, "wb") as f:
+            f.write(datos)
+        os.replace(tmp, ruta)
+
+    def guardar(self, datos, variantes: bool = True) -> str:
+        """Guarda los bytes (si no existían) y devuelve su digest."""
+        digest = hashlib.sha256(datos).hexdigest()
+        if not self.existe(digest):
+            self._escribir(self.ruta(digest), datos)
+            if variantes:
+                self.generar_variantes(digest, datos)
+        return digest
+
+    def leer(self, digest: str, variante: str = None) -> bytes:
+        """
+        Bytes del original o de una variante. Si la variante no existe
+        (p. ej. blobs importados de un estado) se genera en ese momento.
+        """
+        if variante is not None and not os.path.exists(self.ruta(digest, variante)):
+            self.generar_variantes(digest)
+        ruta = self.ruta(digest, variante)
+        if not os.path.exists(ruta):
+            ruta = self.ruta(digest)
+        with open(ruta, "rb") as f:
+            return f.read()
+
+    def generar_variantes(self, digest: str, datos=None):
+        if Image is None:
+            return
+        if datos is None:
+            with open(self.ruta(digest), "rb") as f:
+                datos = f.read()
+        try:
+            original = Image.open(io.BytesIO(datos))
+            original.load()
+        except Exception:
+            return                      # no es una imagen: se sirve el original
+        for nombre, lado in VARIANTES.items():
+            img = original.copy()
+            img.thumbnail((lado, lado))
+            buf = io.BytesIO()
+            if img.mode in ("RGBA", "LA", "P"):
+                img.save(buf, format="PNG", optimize=True)
+            else:
+                img.convert("RGB").save(buf, format="JPEG", quality=85, optimize=True)
+            self._escribir(self.ruta(digest, nombre), buf.getvalue())
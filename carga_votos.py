@@ -0,0 +1,95 @@
+"""
+Generador de carga local para el endpoint HTTP de votos (ingesta_http.py).
+
+Uso:
+    python carga_votos.py --sesion ABC123 --votos 20000 --concurrencia 200
+    python carga_votos.py --host 127.0.0.1 --puerto 8502 --sesion ABC123
+
+Cada conexión envía votos con nombres únicos usando keep-alive y, al final,
+se informa el caudal (votos/s), las latencias p50/p99 y los códigos HTTP.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import random
+import time
+import uuid
+
+
+async def _cliente(host, puerto, sesion, cola, latencias, estados):
+    reader, writer = await asyncio.open_connection(host, puerto)
+    try:
+        while True:
+            try:
+                i = cola.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            cuerpo = json.dumps({
+                "nombre": f"carga-{uuid.uuid4().hex[:12]}-{i}",
+                "voto": random.randint(1, 9),
+                "comentario": "",
+                "correo": f"carga{i}@ejemplo.org",
+            }).encode()
+            t0 = time.perf_counter()
+            writer.write(
+                f"POST /sesiones/{sesion}/votos HTTP/1.1\r\n"
+                f"Host: {host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(cuerpo)}\r\n\r\n".encode() + cuerpo
+            )
+            await writer.drain()
+            cabecera = await reader.readuntil(b"\r\n\r\n")
+            estado = int(cabecera.split(b" ", 2)[1])
+            largo = 0
+            for linea in cabecera.split(b"\r\n"):
+                if linea.lower().startswith(b"content-length:"):
+                    largo = int(linea.split(b":", 1)[1])
+            await reader.readexactly(largo)
+            latencias.append(time.perf_counter() - t0)
+            estados[estado] += 1
+    finally:
+        writer.close()
+
+
+async def correr(host, puerto, sesion, votos, concurrencia):
+    cola = asyncio.Queue()
+    for i in range(votos):
+        cola.put_nowait(i)
+    latencias, estados = [], collections.Counter()
+    t0 = time.perf_counter()
+    await asyncio.gather(*[
+        _cliente(host, puerto, sesion, cola, latencias, estados)
+        for _ in range(min(concurrencia, votos))
+    ])
+    total = time.perf_counter() - t0
+    return total, sorted(latencias), estados
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--puerto", type=int, default=8502)
+    ap.add_argument("--sesion", required=True, help="Código de la sesión")
+    ap.add_argument("--votos", type=int, default=10000)
+    ap.add_argument("--concurrencia", type=int, default=100)
+    args = ap.parse_args()
+
+    total, lat, estados = asyncio.run(
+        correr(args.host, args.puerto, args.sesion.upper(), args.votos, args.concurrencia))
+    n = len(lat)
+    print(f"Votos enviados:  {n}")
+    print(f"Tiempo total:    {total:.2f} s")
+    print(f"Caudal:          {n / total:,.0f} votos/s")
+    print(f"Latencia p50:    {_percentil(lat, 50) * 1000:.2f} ms")
+    print(f"Latencia p99:    {_percentil(lat, 99) * 1000:.2f} ms")
+    print("Códigos HTTP:    " + ", ".join(f"{k}: {v}" for k, v in sorted(estados.items())))
+
+
+if __name__ == "__main__":
+    main()
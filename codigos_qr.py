@@ -0,0 +1,165 @@
+"""
+Códigos QR de las sesiones, con caché.
+
+  matriz_qr(url)        módulos del QR (corrección H), cacheados por URL
+  qr_png(url)           PNG (bytes)
+  qr_svg(url)           SVG (texto): un solo <path>, más liviano que el PNG
+  qr_data_uri(url)      data URI listo para un <img> en HTML
+  hojas_qr(entradas)    PDF imprimible con muchos QR por página (p. ej. una
+                        sala por recomendación en un congreso); las páginas
+                        se dibujan en paralelo si se da un pool de procesos
+
+Todas las cachés son LRU acotadas (`TAMANO_CACHE` URLs): armar el QR con
+corrección H es lo caro, y la misma URL se dibuja en cada rerun.
+"""
+import base64
+import concurrent.futures
+import functools
+import io
+
+import numpy as np
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+
+
+TAMANO_CACHE = 256
+A4_CM = (21.0, 29.7)
+
+
+@functools.lru_cache(maxsize=TAMANO_CACHE)
+def matriz_qr(url: str, borde: int = 4) -> np.ndarray:
+    """Módulos del QR (True = negro), con el borde incluido. Sólo lectura."""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_H,  # Nivel más alto de corrección de errores
+        border=borde,
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+    m = np.array(qr.get_matrix(), dtype=bool)
+    m.flags.writeable = False
+    return m
+
+
+def _imagen_qr(url: str, lado: int, borde: int = 4) -> Image.Image:
+    """QR como imagen bilevel de `lado` píxeles (aprox.), módulos enteros y nítidos."""
+    m = matriz_qr(url, borde)
+    modulo = max(1, lado // m.shape[0])
+    img = Image.fromarray(np.where(m, 0, 255).astype(np.uint8), mode="L")
+    return img.resize((m.shape[1] * modulo, m.shape[0] * modulo), Image.NEAREST).convert("1")
+
+
+@functools.lru_cache(maxsize=TAMANO_CACHE)
+def qr_png(url: str, box_size: int = 10, borde: int = 4) -> bytes:
+    m = matriz_qr(url, borde)
+    buf = io.BytesIO()
+    _imagen_qr(url, m.shape[0] * box_size, borde).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@functools.lru_cache(maxsize=TAMANO_CACHE)
+def qr_svg(url: str, box_size: int = 10, borde: int = 4) -> str:
+    m = matriz_qr(url, borde)
+    n = m.shape[0]
+    # Cada tramo horizontal de módulos negros es un rectángulo del path
+    bordes = np.diff(np.pad(m.view(np.int8), ((0, 0), (1, 1))), axis=1)
+    trazos = []
+    for y, fila in enumerate(bordes):
+        for x0, x1 in zip(np.flatnonzero(fila == 1), np.flatnonzero(fila == -1)):
+            trazos.append(f"M{x0} {y}h{x1 - x0}v1h-{x1 - x0}z")
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {n} {n}" width="{n * box_size}" '
+        f'height="{n * box_size}" shape-rendering="crispEdges">'
+        f'<rect width="{n}" height="{n}" fill="#fff"/><path d="{"".join(trazos)}" fill="#000"/></svg>'
+    )
+
+
+@functools.lru_cache(maxsize=TAMANO_CACHE)
+def qr_data_uri(url: str, formato: str = "svg") -> str:
+    if formato == "svg":
+        return "data:image/svg+xml;base64," + base64.b64encode(qr_svg(url).encode()).decode()
+    return "data:image/png;base64," + base64.b64encode(qr_png(url)).decode()
+
+
+# ——— Hojas imprimibles ————————————————————————————————————————————————
+
+@functools.lru_cache(maxsize=32)
+def _fuente(tamano: int):
+    # DejaVu (si está instalada) trae tildes y eñes; la fuente por defecto de Pillow no
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", tamano)
+    except OSError:
+        pass
+    try:
+        return ImageFont.load_default(size=tamano)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+
+def _ajustada(dibujo, texto: str, tamano: int, ancho: int):
+    """Fuente de a lo sumo `tamano` con la que `texto` cabe en `ancho` píxeles."""
+    while tamano > 8 and dibujo.textlength(texto, font=_fuente(tamano)) > ancho:
+        tamano -= 1
+    return _fuente(tamano)
+
+
+def _recortar(texto: str, largo: int) -> str:
+    return texto if len(texto) <= largo else texto[:largo - 1] + "…"
+
+
+def _pagina(entradas: list, columnas: int, filas: int, dpi: int) -> bytes:
+    """Una página A4 (PNG bilevel) con una grilla de QR; cada entrada es (título, subtítulo, url)."""
+    ancho, alto = (round(cm / 2.54 * dpi) for cm in A4_CM)
+    margen = dpi // 2
+    celda_w = (ancho - 2 * margen) // columnas
+    celda_h = (alto - 2 * margen) // filas
+    texto_h = celda_h // 5
+    lado = min(celda_w, celda_h - texto_h) * 9 // 10
+    titulo, subtitulo = _fuente(max(12, texto_h // 3)), _fuente(max(10, texto_h // 7))
+    util = celda_w * 19 // 20
+
+    pagina = Image.new("1", (ancho, alto), 1)
+    dibujo = ImageDraw.Draw(pagina)
+    for i, (tit, sub, url) in enumerate(entradas):
+        x = margen + (i % columnas) * celda_w
+        y = margen + (i // columnas) * celda_h
+        dibujo.rectangle([x, y, x + celda_w - 1, y + celda_h - 1], outline=0)   # línea de corte
+        qr = _imagen_qr(url, lado)
+        pagina.paste(qr, (x + (celda_w - qr.width) // 2, y + dpi // 20))
+        cx, ty = x + celda_w // 2, y + dpi // 20 + qr.height
+        dibujo.text((cx, ty), tit, fill=0, font=titulo, anchor="mt")
+        dibujo.text((cx, ty + texto_h * 4 // 10), _recortar(sub, 60), fill=0, anchor="mt",
+                    font=_ajustada(dibujo, _recortar(sub, 60), getattr(subtitulo, "size", 10), util))
+        dibujo.text((cx, ty + texto_h * 6 // 10), url, fill=0, anchor="mt",
+                    font=_ajustada(dibujo, url, getattr(subtitulo, "size", 10), util))
+    buf = io.BytesIO()
+    pagina.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def hojas_qr(entradas: list, destino, pool: concurrent.futures.Executor = None,
+             columnas: int = 2, filas: int = 3, dpi: int = 200, avance=None):
+    """
+    PDF con los QR de `entradas` [(título, subtítulo, url)], `columnas` ×
+    `filas` por página A4, en `destino` (ruta o archivo). Con `pool` cada
+    página se dibuja en un proceso; `avance(fraccion, detalle)` se llama al
+    terminar cada página.
+    """
+    avance = avance or (lambda fraccion, detalle="": None)
+    por_pagina = columnas * filas
+    grupos = [entradas[i:i + por_pagina] for i in range(0, len(entradas), por_pagina)] or [[]]
+    if pool is None or len(grupos) == 1:
+        pngs = []
+        for n, g in enumerate(grupos, 1):
+            pngs.append(_pagina(g, columnas, filas, dpi))
+            avance(0.9 * n / len(grupos), f"Página {n}/{len(grupos)}")
+    else:
+        futuros = [pool.submit(_pagina, g, columnas, filas, dpi) for g in grupos]
+        for n, _ in enumerate(concurrent.futures.as_completed(futuros), 1):
+            avance(0.9 * n / len(grupos), f"Página {n}/{len(grupos)}")
+        pngs = [f.result() for f in futuros]
+
+    paginas = [Image.open(io.BytesIO(png)) for png in pngs]
+    avance(0.95, "Armando PDF")
+    paginas[0].save(destino, format="PDF", save_all=True, append_images=paginas[1:], resolution=dpi)
+    return len(paginas)
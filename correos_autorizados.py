@@ -0,0 +1,95 @@
+"""
+Lista de correos autorizados de una sesión privada.
+
+Los correos se normalizan una sola vez (al cargar el CSV o al leer la sesión
+guardada) y quedan en un conjunto: verificar un correo es O(1) sin importar
+el tamaño de la lista (p. ej. los 50 000 socios de una sociedad científica).
+
+Dos formas de guardarla en la sesión (`ListaCorreos.guardado()`):
+  lista de correos normalizados       (formato de siempre; también se aceptan
+                                       listas sin normalizar de sesiones viejas)
+  {"sal": hex, "huellas": base64}     compacta: sólo huellas BLAKE2b de 8 bytes
+                                       con una sal propia de la lista; las
+                                       direcciones no quedan ni en memoria ni
+                                       en disco
+
+Con 8 bytes, la probabilidad de que un correo ajeno coincida con alguna
+huella de una lista de n correos es del orden de n / 2⁶⁴.
+"""
+import base64
+import csv
+import hashlib
+import io
+import os
+
+import numpy as np
+
+
+def normalizar(correo) -> str:
+    return str(correo).strip().lower()
+
+
+def _huella(correo: str, sal: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(correo.encode(), digest_size=8, key=sal).digest(), "little")
+
+
+class ListaCorreos:
+    """Conjunto de correos (o de sus huellas) con pertenencia en O(1)."""
+
+    def __init__(self, correos=(), compacta: bool = False, sal: bytes = None):
+        self.compacta = compacta
+        self.sal = (sal or os.urandom(16)) if compacta else None
+        self._conjunto = set()
+        for c in correos:
+            self.agregar(c)
+
+    def agregar(self, correo):
+        c = normalizar(correo)
+        if c:
+            self._conjunto.add(_huella(c, self.sal) if self.compacta else c)
+
+    def __contains__(self, correo) -> bool:
+        if not correo:
+            return False
+        c = normalizar(correo)
+        return (_huella(c, self.sal) if self.compacta else c) in self._conjunto
+
+    def __len__(self) -> int:
+        return len(self._conjunto)
+
+    def guardado(self):
+        """Valor para `sesion["correos_autorizados"]` (serializable a JSON)."""
+        if not self.compacta:
+            return sorted(self._conjunto)
+        huellas = np.fromiter(self._conjunto, dtype="<u8", count=len(self._conjunto))
+        huellas.sort()
+        return {"sal": self.sal.hex(), "huellas": base64.b64encode(huellas.tobytes()).decode()}
+
+    @classmethod
+    def desde_guardado(cls, valor) -> "ListaCorreos":
+        if isinstance(valor, dict):
+            lista = cls(compacta=True, sal=bytes.fromhex(valor["sal"]))
+            lista._conjunto = set(np.frombuffer(base64.b64decode(valor["huellas"]), dtype="<u8").tolist())
+            return lista
+        return cls(valor or ())
+
+
+def leer_csv(archivo, columna: str = "correo"):
+    """
+    Correos de la columna `columna` de un CSV (archivo binario, p. ej. el de
+    st.file_uploader), leídos fila por fila sin cargar el archivo entero.
+    ValueError si falta la columna.
+    """
+    archivo.seek(0)
+    texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        filas = csv.reader(texto)
+        encabezado = [normalizar(c) for c in next(filas, [])]
+        if columna not in encabezado:
+            raise ValueError(f"El CSV debe contener una columna llamada '{columna}'.")
+        i = encabezado.index(columna)
+        for fila in filas:
+            if len(fila) > i:
+                yield fila[i]
+    finally:
+        texto.detach()      # sin cerrar el archivo subido
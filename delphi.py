@@ -0,0 +1,123 @@
+"""
+Motor de rondas Delphi.
+
+  Ronda               votos de una ronda cerrada (o de la actual) como arreglos
+                      inmutables: IDs de los participantes y matriz int8
+                      participantes × ítems (0 = sin voto). Al construirse
+                      calcula cuartiles y mediana de cada ítem, que es lo que
+                      se muestra como retroalimentación en la ronda siguiente.
+  estabilidad(a, b)   cambios entre dos rondas, vectorizado sobre ítems y
+                      participantes (sólo cuentan quienes votaron el ítem en
+                      ambas):
+                        tasa_cambio       proporción que cambió su voto
+                        hacia_mediana     de quienes cambiaron, proporción que
+                                          se acercó a la mediana de la ronda a
+                        acercamiento      distancia media a esa mediana que se
+                                          redujo (puntos; > 0 = convergencia)
+                        ric_a, ric_b      rango intercuartílico en cada ronda
+                        delta_ric         ric_b - ric_a (< 0 = el grupo converge)
+                        estable           tasa_cambio ≤ UMBRAL_ESTABILIDAD
+
+Las sesiones con un solo voto global son rondas de un ítem.
+"""
+import warnings
+
+import numpy as np
+
+
+# Criterio habitual de estabilidad en Delphi: a lo sumo 15 % de respuestas cambian
+UMBRAL_ESTABILIDAD = 0.15
+
+
+class Ronda:
+    """Votos de una ronda, de sólo lectura. `numero` es el número de ronda."""
+
+    __slots__ = ("numero", "ids", "votos", "q1", "mediana", "q3", "_fila")
+
+    def __init__(self, numero: int, ids, votos):
+        self.numero = numero
+        self.ids = np.array(list(ids), dtype=str)
+        V = np.array(votos, dtype=np.int8)
+        if V.ndim == 1:
+            V = V[:, None]
+        V.flags.writeable = False
+        self.votos = V
+        self._fila = {pid: i for i, pid in enumerate(self.ids.tolist())}
+        if len(V):
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)     # ítems sin votos → NaN
+                q = np.nanpercentile(np.where(V > 0, V, np.nan), [25, 50, 75], axis=0).reshape(3, -1)
+        else:
+            q = np.full((3, V.shape[1]), np.nan)
+        for a in q:
+            a.flags.writeable = False
+        self.q1, self.mediana, self.q3 = q
+
+    @classmethod
+    def desde_columnas(cls, numero: int, votos, ids, items=None) -> "Ronda":
+        """
+        Desde las columnas de una sesión: con `items` (textos de dígitos, uno
+        por participante) la matriz es la de votos por ítem; si no, el voto
+        global es el único ítem.
+        """
+        if items:
+            k = max(map(len, items))
+            texto = "".join((t or "").ljust(k, "0") for t in items).encode()
+            V = np.frombuffer(texto, dtype=np.uint8).reshape(len(ids), k).astype(np.int8) - ord("0")
+            return cls(numero, ids, np.where((V >= 0) & (V <= 9), V, 0))
+        return cls(numero, ids, np.asarray(votos, dtype=np.int8)[:, None])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def n_items(self) -> int:
+        return self.votos.shape[1]
+
+    @property
+    def ric(self) -> np.ndarray:
+        return self.q3 - self.q1
+
+    def retroalimentacion(self, pid: str):
+        """
+        Lo que ve el participante `pid` en la ronda siguiente: por ítem, su
+        voto en esta ronda (None si no votó) y Q1, mediana y Q3 del grupo.
+        None si no participó.
+        """
+        i = self._fila.get(pid)
+        if i is None:
+            return None
+        return [(int(v) or None, float(a), float(m), float(b))
+                for v, a, m, b in zip(self.votos[i].tolist(), self.q1, self.mediana, self.q3)]
+
+
+def estabilidad(a: Ronda, b: Ronda) -> dict:
+    """Estadísticas de estabilidad de la ronda `a` a la `b`, un arreglo por ítem (ver arriba)."""
+    _, ia, ib = np.intersect1d(a.ids, b.ids, assume_unique=True, return_indices=True)
+    k = min(a.n_items, b.n_items)
+    A = a.votos[ia, :k].astype(np.int16)
+    B = b.votos[ib, :k].astype(np.int16)
+    validos = (A > 0) & (B > 0)
+    n = validos.sum(axis=0)
+    cambio = validos & (A != B)
+    n_cambio = cambio.sum(axis=0)
+
+    med = a.mediana[:k]
+    dist_a = np.abs(A - med)
+    dist_b = np.abs(B - med)
+    acerca = cambio & (dist_b < dist_a)
+    with np.errstate(invalid="ignore"):
+        acercamiento = np.where(validos, dist_a - dist_b, 0).sum(axis=0) / np.maximum(n, 1)
+
+    tasa_cambio = n_cambio / np.maximum(n, 1)
+    ric_a, ric_b = a.ric[:k], b.ric[:k]
+    return {
+        "n": n,
+        "tasa_cambio": tasa_cambio,
+        "hacia_mediana": acerca.sum(axis=0) / np.maximum(n_cambio, 1),
+        "acercamiento": acercamiento,
+        "ric_a": ric_a,
+        "ric_b": ric_b,
+        "delta_ric": ric_b - ric_a,
+        "estable": (n > 0) & (tasa_cambio <= UMBRAL_ESTABILIDAD),
+    }
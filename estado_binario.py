@@ -0,0 +1,140 @@
+"""
+Formato binario versionado para guardar / cargar el estado completo.
+
+Estructura del archivo (little-endian):
+
+  cabecera  MAGIC (6 bytes) | versión u16 | offset índice u64 | largo índice u64
+  secciones bloques de bytes sin separadores:
+              - meta de cada sesión (JSON)
+              - votos de cada sesión (int8, uno por participante)
+              - fechas de cada sesión (datetime64[s] como int64)
+              - textos de cada sesión (JSON: ids, names, comments, correos)
+              - blobs (imágenes, bytes crudos, una vez por digest; en la
+                versión 1 iban por sesión)
+              - historial (JSON)
+  índice    JSON con (offset, largo) de cada sección, al final del archivo
+
+El lector mapea el archivo en memoria (mmap) y sólo decodifica una sesión
+cuando se accede a ella; votos, fechas e imágenes son vistas sobre el mapa,
+sin copias.
+"""
+import json
+import mmap
+import struct
+
+import numpy as np
+
+
+MAGIC = b"CNSEST"
+VERSION = 2
+CABECERA = struct.Struct("<6sHQQ")
+
+
+class FormatoInvalido(ValueError):
+    pass
+
+
+def es_estado_binario(datos: bytes) -> bool:
+    return bytes(datos[:len(MAGIC)]) == MAGIC
+
+
+def guardar_estado(destino, sesiones, history: dict, blobs=()):
+    """
+    Escribe el estado en `destino` (archivo binario abierto o BytesIO).
+    `sesiones`: iterable de (codigo, meta, votos_int8, fechas_datetime64,
+                textos), con `meta` y `textos` serializables en JSON.
+    `blobs`:    iterable de (digest, bytes) con las imágenes referenciadas.
+    """
+    inicio = destino.tell()
+    destino.write(CABECERA.pack(MAGIC, VERSION, 0, 0))
+
+    def seccion(datos: bytes):
+        off = destino.tell() - inicio
+        destino.write(datos)
+        return [off, len(datos)]
+
+    def json_bytes(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode()
+
+    indice = {"sesiones": {}, "blobs": {}}
+    for codigo, meta, votos, fechas, textos in sesiones:
+        indice["sesiones"][codigo] = {
+            "meta":   seccion(json_bytes(meta)),
+            "votos":  seccion(np.ascontiguousarray(votos, dtype=np.int8).tobytes()),
+            "fechas": seccion(np.ascontiguousarray(fechas, dtype="datetime64[s]").view(np.int64).tobytes()),
+            "textos": seccion(json_bytes(textos)),
+        }
+    for digest, datos in blobs:
+        indice["blobs"][digest] = seccion(bytes(datos))
+    indice["history"] = seccion(json_bytes(history))
+
+    datos_indice = json_bytes(indice)
+    off_indice = destino.tell() - inicio
+    destino.write(datos_indice)
+    fin = destino.tell()
+    destino.seek(inicio)
+    destino.write(CABECERA.pack(MAGIC, VERSION, off_indice, len(datos_indice)))
+    destino.seek(fin)
+
+
+class EstadoBinario:
+    """
+    Lector perezoso de un estado binario. `fuente` puede ser una ruta
+    (se mapea con mmap) o un objeto con buffer (bytes, BytesIO, UploadedFile).
+    """
+
+    def __init__(self, fuente):
+        if isinstance(fuente, str):
+            with open(fuente, "rb") as f:
+                self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        elif hasattr(fuente, "getbuffer"):
+            self._buf = fuente.getbuffer()
+        else:
+            self._buf = memoryview(fuente)
+        self._vista = memoryview(self._buf)
+        if len(self._vista) < CABECERA.size:
+            raise FormatoInvalido("Archivo de estado truncado.")
+        magic, version, off, largo = CABECERA.unpack_from(self._vista, 0)
+        if magic != MAGIC:
+            raise FormatoInvalido("No es un archivo de estado válido.")
+        if version > VERSION:
+            raise FormatoInvalido(f"Versión de estado no soportada: {version}")
+        self.version = version
+        self._indice = json.loads(bytes(self._vista[off:off + largo]))
+
+    def _bytes(self, sec) -> memoryview:
+        off, largo = sec
+        return self._vista[off:off + largo]
+
+    def _json(self, sec):
+        return json.loads(bytes(self._bytes(sec)))
+
+    def codigos(self) -> list:
+        return list(self._indice["sesiones"])
+
+    def meta(self, codigo: str) -> dict:
+        return self._json(self._indice["sesiones"][codigo]["meta"])
+
+    def votos(self, codigo: str) -> np.ndarray:
+        return np.frombuffer(self._bytes(self._indice["sesiones"][codigo]["votos"]), dtype=np.int8)
+
+    def fechas(self, codigo: str) -> np.ndarray:
+        datos = self._bytes(self._indice["sesiones"][codigo]["fechas"])
+        return np.frombuffer(datos, dtype=np.int64).view("datetime64[s]")
+
+    def textos(self, codigo: str) -> dict:
+        return self._json(self._indice["sesiones"][codigo]["textos"])
+
+    def digests(self) -> list:
+        return list(self._indice.get("blobs", {}))
+
+    def blob(self, digest: str) -> memoryview:
+        """Bytes de un blob como vista de sólo lectura sobre el archivo."""
+        return self._bytes(self._indice["blobs"][digest])
+
+    def blobs(self, codigo: str) -> list:
+        """Imágenes de una sesión (sólo versión 1 del formato)."""
+        return [self._bytes(sec) for sec in self._indice["sesiones"][codigo].get("blobs", [])]
+
+    def history(self) -> dict:
+        return self._json(self._indice["history"])
@@ -0,0 +1,143 @@
+"""
+Endpoint HTTP mínimo (asyncio) para recibir votos sin pasar por una
+re-ejecución completa del script de Streamlit.
+
+Corre dentro del mismo proceso que la app, en un hilo propio, y escribe en
+el mismo `store` a través de la función `registrar` que le pasa app.py
+(que aplica las mismas reglas que la página de votación).
+
+  POST /sesiones/<CODIGO>/votos
+       {"nombre": "...", "voto": 1-9, "comentario": "...", "correo": "..."}
+       (en las sesiones votadas por ítem, "voto" es una lista: uno por recomendación)
+       → 201 {"id": "<pid>"}  | 400 | 403 | 404 | 409
+  GET  /salud → 200 {"ok": true}
+
+Las conexiones son HTTP/1.1 con keep-alive.
+"""
+import asyncio
+import json
+import threading
+
+
+RAZONES = {200: "OK", 201: "Created", 400: "Bad Request", 403: "Forbidden",
+           404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ServidorVotos:
+    """
+    `registrar(codigo, nombre, voto, comentario, correo)` debe devolver
+    (estado_http, dict_respuesta).
+    """
+
+    def __init__(self, registrar, host: str = "0.0.0.0", puerto: int = 8502,
+                 max_cuerpo: int = 16384, espera: float = 30.0):
+        self.registrar = registrar
+        self.host = host
+        self.puerto = puerto
+        self.max_cuerpo = max_cuerpo
+        self.espera = espera
+        self._loop = None
+        self._listo = threading.Event()
+        self._error = None
+
+    def iniciar(self):
+        """Arranca el servidor en un hilo daemon y espera a que escuche."""
+        hilo = threading.Thread(target=self._correr, daemon=True, name="ingesta-http")
+        hilo.start()
+        self._listo.wait()
+        if self._error:
+            raise self._error
+        return self
+
+    def _correr(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            servidor = self._loop.run_until_complete(
+                asyncio.start_server(self._atender, self.host, self.puerto))
+        except OSError as e:
+            self._error = e
+            self._listo.set()
+            return
+        self.puerto = servidor.sockets[0].getsockname()[1]
+        self._listo.set()
+        self._loop.run_forever()
+
+    async def _atender(self, reader, writer):
+        try:
+            while True:
+                try:
+                    cabecera = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.espera)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError,
+                        asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lineas = cabecera.decode("latin-1").split("\r\n")
+                try:
+                    metodo, ruta, version = lineas[0].split(" ", 2)
+                except ValueError:
+                    await self._responder(writer, 400, {"error": "Solicitud inválida"}, cerrar=True)
+                    break
+                headers = {}
+                for linea in lineas[1:]:
+                    if ":" in linea:
+                        k, v = linea.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+                try:
+                    largo = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    largo = -1
+                if largo < 0:
+                    await self._responder(writer, 400, {"error": "Content-Length inválido"}, cerrar=True)
+                    break
+                if largo > self.max_cuerpo:
+                    await self._responder(writer, 413, {"error": "Cuerpo demasiado grande"}, cerrar=True)
+                    break
+                cuerpo = await reader.readexactly(largo) if largo else b""
+                cerrar = (headers.get("connection", "").lower() == "close"
+                          or version == "HTTP/1.0")
+                estado, datos = self._despachar(metodo, ruta, cuerpo)
+                await self._responder(writer, estado, datos, cerrar)
+                if cerrar:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _despachar(self, metodo: str, ruta: str, cuerpo: bytes):
+        partes = [p for p in ruta.split("?", 1)[0].split("/") if p]
+        if partes == ["salud"]:
+            return 200, {"ok": True}
+        if len(partes) == 3 and partes[0] == "sesiones" and partes[2] == "votos":
+            if metodo != "POST":
+                return 405, {"error": "Use POST"}
+            try:
+                datos = json.loads(cuerpo or b"{}")
+            except ValueError:
+                return 400, {"error": "JSON inválido"}
+            if not isinstance(datos, dict):
+                return 400, {"error": "JSON inválido"}
+            # Un nombre o correo que no es texto (p. ej. null) cuenta como faltante
+            nombre, correo = datos.get("nombre"), datos.get("correo")
+            try:
+                return self.registrar(
+                    partes[1].strip().upper(),
+                    nombre.strip() if isinstance(nombre, str) else "",
+                    datos.get("voto"),
+                    str(datos.get("comentario", "") or ""),
+                    correo if isinstance(correo, str) else None,
+                )
+            except Exception as e:
+                return 500, {"error": str(e)}
+        return 404, {"error": "Ruta no encontrada"}
+
+    async def _responder(self, writer, estado: int, datos: dict, cerrar: bool):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode()
+        writer.write(
+            f"HTTP/1.1 {estado} {RAZONES.get(estado, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(cuerpo)}\r\n"
+            f"Connection: {'close' if cerrar else 'keep-alive'}\r\n\r\n".encode() + cuerpo
+        )
+        await writer.drain()
@@ -0,0 +1,207 @@
+"""
+Motor del reporte DOCX consolidado.
+
+  plantilla(logo)            documento base ya estilado (márgenes A4, logo en la
+                             cabecera, colores); se arma una vez y se reutiliza
+  renderizar_graficos(...)   PNG de los histogramas, en paralelo en un pool de
+                             procesos (la codificación PNG no libera el GIL)
+  construir_reporte(...)     une las secciones (una por recomendación y, si
+                             hay paquetes GRADE, la de su acuerdo) sobre la
+                             plantilla y guarda el documento
+
+Cada sección se describe con un dict de datos ya calculados (ver
+`construir_reporte`), de modo que este módulo no depende del store.
+"""
+import concurrent.futures
+import functools
+import io
+
+from docx import Document
+from docx.enum.table import WD_TABLE_ALIGNMENT
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Cm, Pt, RGBColor
+
+from graficos import grafico_png
+
+
+COLOR = "662D91"        # Morado ODDS (hex sin '#')
+
+
+def shade_cell(cell, fill_hex: str):
+    """
+    Aplica un fondo de color (hex sin ‘#’) a una celda de python-docx.
+    """
+    tc = cell._tc
+    tcPr = tc.get_or_add_tcPr()
+    shd = OxmlElement('w:shd')
+    shd.set(qn('w:val'), 'clear')
+    shd.set(qn('w:fill'), fill_hex)
+    tcPr.append(shd)
+
+
+@functools.lru_cache(maxsize=4)
+def plantilla(logo: bytes = None, color: str = COLOR) -> bytes:
+    """Documento vacío con márgenes, logo y estilos; se guarda como bytes."""
+    doc = Document()
+    for sec in doc.sections:
+        sec.left_margin = Cm(2)
+        sec.right_margin = Cm(2)
+        sec.top_margin = Cm(2)
+        sec.bottom_margin = Cm(2)
+
+    if logo is not None:
+        header_para = doc.sections[0].header.paragraphs[0]
+        header_para.add_run().add_picture(io.BytesIO(logo), width=Cm(4))
+        header_para.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+
+    for nombre in ("Heading 1", "Heading 2"):
+        doc.styles[nombre].font.color.rgb = RGBColor.from_string(color)
+    doc.styles["Normal"].font.size = Pt(10.5)
+
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def renderizar_graficos(conteos, pool: concurrent.futures.Executor = None, color: str = "#" + COLOR) -> dict:
+    """
+    PNG de cada histograma distinto (tupla de 9 conteos → bytes). Con `pool`
+    se reparten entre sus procesos; sin él se generan en este hilo.
+    """
+    unicos = list(dict.fromkeys(tuple(c) for c in conteos))
+    if pool is None or len(unicos) < 8:
+        return {c: grafico_png(c, color=color) for c in unicos}
+    trozo = max(1, len(unicos) // (4 * getattr(pool, "_max_workers", 4)))
+    return dict(zip(unicos, pool.map(_png, unicos, [color] * len(unicos), chunksize=trozo)))
+
+
+def _png(conteos, color):
+    return grafico_png(conteos, color=color)
+
+
+def _estilos(doc) -> dict:
+    """
+    Id de cada estilo usado, resuelto una sola vez: python-docx recorre todos
+    los estilos del documento cada vez que recibe uno por nombre, y eso era
+    la mitad del tiempo de armado con cientos de secciones.
+    """
+    nombres = ("Heading 1", "Heading 2", "List Bullet", "Table Grid")
+    return {n: doc.styles[n].style_id for n in nombres}
+
+
+def _parrafo(doc, texto: str = "", estilo: str = None):
+    p = doc.add_paragraph(texto)
+    if estilo is not None:
+        p._p.style = estilo
+    return p
+
+
+def _tabla(doc, encabezados, filas, color: str, estilos: dict):
+    tbl = doc.add_table(rows=1 + len(filas), cols=len(encabezados))
+    tbl._tbl.tblStyle_val = estilos["Table Grid"]
+    tbl.alignment = WD_TABLE_ALIGNMENT.CENTER
+    filas_tbl = tbl.rows
+    for celda, titulo in zip(filas_tbl[0].cells, encabezados):
+        shade_cell(celda, color)
+        p = celda.paragraphs[0]
+        run = p.add_run(titulo)
+        run.bold = True
+        run.font.color.rgb = RGBColor(0xFF, 0xFF, 0xFF)
+        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    for fila_tbl, valores in zip(filas_tbl[1:], filas):
+        for celda, valor in zip(fila_tbl.cells, valores):
+            celda.text = str(valor)
+            celda.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+    return tbl
+
+
+def _texto_kendall(w: dict) -> str:
+    if w.get("w") is None or w["w"] != w["w"]:      # sin datos o NaN
+        return "—"
+    return f"{w['w']:.2f} (n = {w['m']}, p = {w['p']:.3g})"
+
+
+def _texto_pct(x: float) -> str:
+    return "—" if x != x else f"{x:.1f}%"
+
+
+def _seccion_grade(doc, grade: list, color: str, estilos: dict):
+    _parrafo(doc, estilo=estilos["Heading 1"]).add_run("Acuerdo en los paquetes GRADE").bold = True
+    _parrafo(doc, "Por dominio, con los paquetes como sujetos: acuerdo entre pares (proporción media "
+                  "de pares de evaluadores que eligieron la misma opción), acuerdo esperado al azar "
+                  "según las proporciones de cada opción, y κ de Fleiss.")
+    _tabla(doc, ["Dominio", "Paquetes", "Acuerdo entre pares", "Acuerdo esperado", "κ de Fleiss"],
+           [[g["dominio"], g["paquetes"], _texto_pct(g["p_obs"]), _texto_pct(g["p_esp"]),
+             "—" if g["kappa"] != g["kappa"] else f"{g['kappa']:.2f}"] for g in grade],
+           color, estilos)
+
+
+def _seccion(doc, sec: dict, png: bytes, color: str, estilos: dict):
+    _parrafo(doc, estilo=estilos["Heading 1"]).add_run(f"Recomendación {sec['code']}").bold = True
+
+    _parrafo(doc, f"Descripción: {sec['desc']}")
+    _parrafo(doc, f"Ronda: {sec['ronda']}    Fecha: {sec['creada']}")
+
+    if sec.get("items"):
+        w = sec.get("kendall") or {}
+        _tabla(doc, ["Participantes", "Ítems", "W de Kendall"],
+               [[sec["total"], len(sec["items"]), _texto_kendall(w)]], color, estilos)
+    else:
+        _tabla(doc, ["Total votos", "% Consenso", "Mediana", "IC95%", "IPR / IPRAS"],
+               [[sec["total"], f"{sec['pct']:.1f}%", f"{sec['mediana']:.1f}",
+                 f"[{sec['lo']:.1f}, {sec['hi']:.1f}]", sec.get("ipras", "—")]], color, estilos)
+
+    p = _parrafo(doc)
+    p.add_run("Estado de consenso: ").bold = True
+    p.add_run(sec["estado"])
+
+    if sec.get("items"):
+        _parrafo(doc, "Resultados por ítem", estilos["Heading 2"])
+        _tabla(doc, ["Ítem", "Recomendación", "Votos", "% Consenso", "Mediana (IC95%)", "IPR / IPRAS",
+                     "Estado"], sec["items"], color, estilos)
+    elif png is not None and sec["total"]:
+        p = _parrafo(doc)
+        p.add_run().add_picture(io.BytesIO(png), width=Cm(14))
+        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    if sec["comentarios"]:
+        _parrafo(doc, "Comentarios destacados", estilos["Heading 2"])
+        for nombre, voto, com in sec["comentarios"]:
+            _parrafo(doc, f"{nombre} (voto {voto}): “{com}”", estilos["List Bullet"])
+
+    if sec["historial"]:
+        _parrafo(doc, "Historial de rondas", estilos["Heading 2"])
+        _tabla(doc, ["Ronda", "Fecha", "Votos", "% Consenso", "Mediana (IC95%)"],
+               [[r["ronda"], r["creada"], r["total"], f"{r['pct']:.1f}%",
+                 f"{r['mediana']:.1f} [{r['lo']:.1f}, {r['hi']:.1f}]"] for r in sec["historial"]],
+               color, estilos)
+
+
+def construir_reporte(secciones: list, destino, logo: bytes = None, graficos: dict = None,
+                      avance=None, color: str = COLOR, grade: list = None):
+    """
+    Arma el documento a partir de la plantilla y lo guarda en `destino`
+    (ruta o archivo). Cada sección es un dict con: code, desc, ronda, creada,
+    total, pct, mediana, lo, hi, estado, conteos (tupla de 9), ipras (texto
+    "IPR / IPRAS"), kendall (resultado de acuerdo.w_kendall en las sesiones
+    votadas por ítem, o None), comentarios [(nombre, voto, comentario)],
+    historial [dict con ronda, creada, total, pct, mediana, lo, hi] e items
+    (filas de resultados por ítem en las sesiones votadas por ítem, o None).
+    `grade`, si se da, agrega al final el acuerdo de los paquetes GRADE: un
+    dict por dominio con dominio, paquetes, p_obs y p_esp (%) y kappa.
+    """
+    avance = avance or (lambda fraccion, detalle="": None)
+    graficos = graficos or {}
+    doc = Document(io.BytesIO(plantilla(logo, color)))
+    estilos = _estilos(doc)
+    for i, sec in enumerate(secciones, 1):
+        _seccion(doc, sec, graficos.get(sec["conteos"]), color, estilos)
+        if i < len(secciones) or grade:
+            doc.add_page_break()
+        avance(i / len(secciones), f"Recomendación {sec['code']} ({i}/{len(secciones)})")
+    if grade:
+        _seccion_grade(doc, grade, color, estilos)
+    doc.save(destino)
+    return destino
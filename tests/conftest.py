@@ -0,0 +1,26 @@
+"""
+app.py es un script de Streamlit: al importarlo fuera de `streamlit run`
+corre en modo "bare" (los widgets devuelven su valor por defecto y el
+panel de administración queda en "Inicio"), lo que basta para usar sus
+funciones. Se importa una sola vez, dentro de una carpeta temporal y con
+el backend SQLite, para no tocar registro_data/ del repositorio.
+"""
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    carpeta = tmp_path_factory.mktemp("app")
+    anterior = os.getcwd()
+    os.chdir(carpeta)
+    os.environ["CONSENSO_BACKEND"] = "sqlite"
+    os.environ.pop("CONSENSO_HTTP_PUERTO", None)
+    sys.path.insert(0, RAIZ)
+    import app as modulo
+    yield modulo
+    os.chdir(anterior)
@@ -0,0 +1,60 @@
+"""Motor exacto de mediana e IC95% contra el bootstrap de siempre (metodo="legacy")."""
+import numpy as np
+import pytest
+
+
+def _votos_aleatorios(rng):
+    n = int(rng.integers(15, 80))
+    p = rng.dirichlet(np.ones(9) * rng.choice([0.7, 3.0]))
+    return rng.choice(np.arange(1, 10), n, p=p).tolist()
+
+
+def test_exacto_coincide_con_legacy(app):
+    rng = np.random.default_rng(2024)
+    diferencias = []
+    for _ in range(150):
+        votos = _votos_aleatorios(rng)
+        np.random.seed(0)          # el bootstrap legacy usa el generador global
+        med, lo, hi = app.median_ci(votos)
+        med_l, lo_l, hi_l = app.median_ci(votos, metodo="legacy")
+        assert med == med_l
+        assert lo <= med <= hi
+        diferencias.append(max(abs(lo - lo_l), abs(hi - hi_l)))
+    diferencias = np.array(diferencias)
+    # 1.000 re-muestras sobre 9 valores discretos: a veces un cuantil salta un escalón
+    assert (diferencias <= 0.05).mean() >= 0.8
+    assert (diferencias <= 1.0).mean() >= 0.95
+
+
+@pytest.mark.parametrize("metodo", ["exacto", "legacy"])
+def test_sin_votos(app, metodo):
+    assert app.median_ci([], metodo=metodo) == (0.0, 0.0, 0.0)
+    assert app.median_ci(["x", None], metodo=metodo) == (0.0, 0.0, 0.0)
+
+
+@pytest.mark.parametrize("metodo", ["exacto", "legacy"])
+def test_un_voto(app, metodo):
+    assert tuple(map(float, app.median_ci([7], metodo=metodo))) == (7.0, 7.0, 7.0)
+
+
+@pytest.mark.parametrize("metodo", ["exacto", "legacy"])
+def test_todos_en_una_categoria(app, metodo):
+    assert tuple(map(float, app.median_ci([8] * 25, metodo=metodo))) == (8.0, 8.0, 8.0)
+
+
+def test_conteos_equivale_a_votos(app):
+    votos = [1, 2, 2, 5, 7, 7, 7, 8, 9, 9]
+    assert app.median_ci(votos) == app.median_ci_conteos(app.conteos_likert(votos))
+
+
+def test_matriz_igual_a_fila_por_fila(app):
+    rng = np.random.default_rng(7)
+    C = rng.integers(0, 12, size=(300, 9))
+    C[rng.random(C.shape) < 0.4] = 0
+    C[:5] = 0                                    # sin votos
+    C[5:10] = np.eye(9, dtype=np.int64)[:5]      # un voto
+    C[10:15, 4] = 20                             # todos en la misma categoría
+    C[10:15, np.arange(9) != 4] = 0
+    medianas, los, his = app.median_ci_matriz(C)
+    for fila, med, lo, hi in zip(C, medianas, los, his):
+        assert (med, lo, hi) == pytest.approx(app.median_ci_conteos(fila)), fila.tolist()
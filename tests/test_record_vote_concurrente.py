@@ -0,0 +1,78 @@
+"""
+record_vote desde muchos hilos a la vez, como los de Streamlit: varias
+sesiones, participantes que se repiten (sobrescrituras) y votos no Likert.
+Al final el registro de cada sesión debe estar alineado y coincidir con lo
+que quedó en el backend.
+"""
+import random
+import sqlite3
+import threading
+
+import numpy as np
+
+HILOS = 8
+VOTOS_POR_HILO = 300
+SESIONES = 4
+PARTICIPANTES = 60
+
+
+def test_record_vote_concurrente(app):
+    codigos = [app.make_session(f"Concurrencia {i}", "Likert 1-9") for i in range(SESIONES)]
+    barrera = threading.Barrier(HILOS)
+    errores = []
+
+    def votar(semilla):
+        rng = random.Random(semilla)
+        barrera.wait()
+        try:
+            for _ in range(VOTOS_POR_HILO):
+                code = rng.choice(codigos)
+                nombre = f"experto-{rng.randrange(PARTICIPANTES)}"
+                voto = rng.choice([*range(1, 10), "No voto"])
+                app.record_vote(code, voto, f"{semilla}", nombre)
+        except Exception as e:      # pragma: no cover - se informa abajo
+            errores.append(e)
+
+    hilos = [threading.Thread(target=votar, args=(i,)) for i in range(HILOS)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert not errores
+
+    backend = app.get_backend()
+    backend.flush()
+    con = sqlite3.connect(backend.ruta)
+    try:
+        for code in codigos:
+            s = app.store[code]
+            reg = app.registro_sesion(s)
+            votos, fechas, t = reg.columnas()
+            n = len(reg)
+
+            # Columnas alineadas
+            assert len(votos) == len(fechas) == n
+            assert len(reg.ids) == len(reg.names) == len(reg.comments) == len(reg.correos) == n
+            assert len(reg.items) == n
+
+            # Un participante por fila, y el índice apunta a su fila
+            assert len(set(reg.names)) == n
+            for i, (pid, nombre) in enumerate(zip(reg.ids, reg.names)):
+                assert pid == app.hash_id(nombre)
+                assert reg.fila(nombre) == i
+                assert reg.fila(pid) == i
+
+            # El agregado incremental cuenta cada fila del registro con voto Likert
+            assert app.agregado_sesion(s).n == n - int((votos == 0).sum())
+            np.testing.assert_array_equal(
+                app.agregado_sesion(s).conteos,
+                np.bincount(votos[votos > 0].astype(np.int64) - 1, minlength=9))
+
+            # El backend tiene una fila por participante, con el mismo último voto
+            filas = dict(con.execute(
+                "SELECT pid, voto FROM votos WHERE codigo = ? AND ronda = ?",
+                (code, s.get("round", 1))).fetchall())
+            assert len(filas) == n
+            assert filas == {pid: int(v) or None for pid, v in zip(reg.ids, votos.tolist())}
+    finally:
+        con.close()
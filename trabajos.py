@@ -0,0 +1,128 @@
+"""
+Ejecución de exportaciones (Excel, DOCX) en segundo plano.
+
+Cada trabajo corre en un hilo del pool y escribe su archivo en disco; la UI
+consulta el avance (fracción + detalle, p. ej. la sesión en curso) y, al
+terminar, ofrece la descarga. Los archivos terminados se borran al vencer
+su TTL.
+
+Se usan hilos y no procesos: las exportaciones leen el `store` en memoria
+del proceso de Streamlit, que no se puede compartir con otros procesos sin
+copiarlo entero.
+"""
+import concurrent.futures
+import os
+import threading
+import time
+import uuid
+
+
+class Trabajo:
+    __slots__ = ("id", "clave", "descripcion", "nombre_archivo", "ruta", "estado",
+                 "progreso", "detalle", "resultado", "error", "creado", "terminado")
+
+    def __init__(self, clave, descripcion: str, nombre_archivo: str, ruta: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.clave = clave
+        self.descripcion = descripcion
+        self.nombre_archivo = nombre_archivo
+        self.ruta = ruta
+        self.estado = "pendiente"       # pendiente | en curso | listo | error
+        self.progreso = 0.0
+        self.detalle = ""
+        self.resultado = None
+        self.error = None
+        self.creado = time.time()
+        self.terminado = None
+
+    @property
+    def activo(self) -> bool:
+        return self.estado in ("pendiente", "en curso")
+
+
+class GestorTrabajos:
+    def __init__(self, carpeta: str, ttl: float = 3600, max_hilos: int = 2):
+        self.carpeta = carpeta
+        self.ttl = ttl
+        os.makedirs(carpeta, exist_ok=True)
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_hilos, thread_name_prefix="exportacion")
+        self._trabajos = {}
+        self._lock = threading.Lock()
+        self.limpiar(huerfanos=True)
+
+    def enviar(self, clave, descripcion: str, funcion, nombre_archivo: str) -> Trabajo:
+        """
+        Encola `funcion(ruta, avance)`, que debe escribir el archivo en `ruta` y
+        puede informar su avance con `avance(fraccion, detalle)`. Lo que
+        devuelva queda en `trabajo.resultado`.
+
+        `clave` = (tipo, versión de los datos). Si ya existe un trabajo con la
+        misma clave, o uno del mismo tipo todavía en curso, se devuelve ese en
+        lugar de encolar otro (con votos entrando, la versión cambia a cada
+        momento y los trabajos se acumularían).
+        """
+        self.limpiar()
+        with self._lock:
+            previo = self.buscar(clave)
+            if previo is not None and previo.estado != "error":
+                return previo
+            activos = [t for t in self._trabajos.values() if t.clave[0] == clave[0] and t.activo]
+            if activos:
+                return activos[0]
+            ext = os.path.splitext(nombre_archivo)[1]
+            trabajo = Trabajo(clave, descripcion, nombre_archivo, "")
+            trabajo.ruta = os.path.join(self.carpeta, trabajo.id + ext)
+            self._trabajos[trabajo.id] = trabajo
+        self._pool.submit(self._correr, trabajo, funcion)
+        return trabajo
+
+    def _correr(self, trabajo: Trabajo, funcion):
+        def avance(fraccion: float, detalle: str = ""):
+            trabajo.progreso = min(max(float(fraccion), 0.0), 1.0)
+            trabajo.detalle = detalle
+
+        trabajo.estado = "en curso"
+        tmp = trabajo.ruta + ".parcial"
+        try:
+            trabajo.resultado = funcion(tmp, avance)
+            os.replace(tmp, trabajo.ruta)
+            trabajo.progreso = 1.0
+            trabajo.estado = "listo"
+        except Exception as e:
+            trabajo.error = str(e)
+            trabajo.estado = "error"
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        finally:
+            trabajo.terminado = time.time()
+
+    def buscar(self, clave):
+        """Trabajo más reciente con esa clave, o None."""
+        candidatos = [t for t in self._trabajos.values() if t.clave == clave]
+        return max(candidatos, key=lambda t: t.creado) if candidatos else None
+
+    def ultimo_listo(self, tipo):
+        """Último trabajo terminado de ese tipo, o None."""
+        listos = [t for t in self._trabajos.values() if t.clave[0] == tipo and t.estado == "listo"]
+        return max(listos, key=lambda t: t.terminado) if listos else None
+
+    def leer(self, trabajo: Trabajo) -> bytes:
+        with open(trabajo.ruta, "rb") as f:
+            return f.read()
+
+    def limpiar(self, huerfanos: bool = False):
+        """Borra los trabajos terminados hace más de `ttl` segundos y sus archivos."""
+        limite = time.time() - self.ttl
+        with self._lock:
+            vencidos = [t for t in self._trabajos.values()
+                        if t.terminado is not None and t.terminado < limite]
+            for t in vencidos:
+                del self._trabajos[t.id]
+                if os.path.exists(t.ruta):
+                    os.remove(t.ruta)
+        if huerfanos:
+            # Archivos de ejecuciones anteriores del servidor
+            for nombre in os.listdir(self.carpeta):
+                ruta = os.path.join(self.carpeta, nombre)
+                if os.path.isfile(ruta) and os.path.getmtime(ruta) < limite:
+                    os.remove(ruta)
@@ -0,0 +1,187 @@
+"""
+Página de votación: lo que ve quien abre el enlace o QR de una sesión
+(?session=CÓDIGO).
+
+Es la ruta más visitada y, en el celular, la más sensible al arranque en
+frío, así que este módulo sólo depende de streamlit. El acceso a los datos
+(autorización, registro del voto, imágenes) lo pasa app.py como funciones,
+y el panel de administración con sus dependencias pesadas (scipy, plotly,
+python-docx, ...) no se carga en esta ruta.
+"""
+import re
+
+import streamlit as st
+
+
+def odds_header():
+    header_html = """
+    <div class="app-header">
+      <div class="odds-logo">ODDS EPIDEMIOLOGY</div>
+      <div class="odds-subtitle">Sistema de Votación</div>
+    </div>
+    """
+    st.markdown(header_html, unsafe_allow_html=True)
+
+
+def separar_recomendaciones(texto):
+    partes = re.split(r'\s*\d+\.\s*', str(texto))
+    return [p.strip() for p in partes if p.strip()]
+
+
+SEMAFORO_HTML = """
+    <div style="margin-top: 20px;">
+      <div style="display: flex; justify-content: space-around; text-align: center;">
+        <div style="flex:1;">
+          <div style="background-color: #e74c3c; color: white; padding: 8px; border-radius: 6px;">1 – 3</div>
+          <div style="margin-top: 5px;">Desacuerdo</div>
+        </div>
+        <div style="flex:1;">
+          <div style="background-color: #f1c40f; color: black; padding: 8px; border-radius: 6px;">4 – 6</div>
+          <div style="margin-top: 5px;">Neutral / Dudoso</div>
+        </div>
+        <div style="flex:1;">
+          <div style="background-color: #27ae60; color: white; padding: 8px; border-radius: 6px;">7 – 9</div>
+          <div style="margin-top: 5px;">Acuerdo</div>
+        </div>
+      </div>
+    </div>
+    """
+
+
+def texto_retroalimentacion(previo, q1, mediana, q3) -> str:
+    if mediana != mediana:      # NaN: nadie votó el ítem en la ronda anterior
+        return "Ronda anterior: sin votos del grupo."
+    suyo = f"su voto {previo} · " if previo else ""
+    return f"Ronda anterior: {suyo}mediana del grupo {mediana:g} (RIC {q1:g}–{q3:g})"
+
+
+def pagina_votacion(code: str, s: dict, correo_autorizado, ya_participo, imagenes, registrar_voto,
+                    retroalimentacion=None):
+    """
+    Dibuja la página de votación de la sesión `s` y detiene el script.
+      correo_autorizado(correo) -> bool       (sesiones privadas)
+      ya_participo(nombre) -> bool
+      imagenes() -> lista de imágenes (bytes) relacionadas
+      registrar_voto(voto, comentario, nombre, correo, items=None) -> ID de participación
+      retroalimentacion(nombre) -> por ítem, (voto anterior, Q1, mediana, Q3)
+                                   de la ronda previa, o None (ver delphi.py)
+    En las sesiones votadas por ítem (`s["por_item"]`) cada recomendación
+    tiene su propio voto 1–9; se envían como `items` (uno por recomendación)
+    y `voto` va en None.
+    """
+    odds_header()  # Mostrar encabezado al inicio
+
+    if not s:
+        st.error(f"❌ Sesión inválida: {code}")
+        st.stop()
+
+    es_privada = s.get("privado", False)
+
+    # Ocultar navegación y encabezados
+    st.markdown("""
+        <style>
+        [data-testid="stSidebar"] { display: none !important; }
+        [data-testid="collapsedControl"] { display: none !important; }
+        header, footer { visibility: hidden; }
+        </style>
+    """, unsafe_allow_html=True)
+
+    # Paso 1 — Captura de nombre y correo
+    if "nombre_confirmado" not in st.session_state:
+        st.markdown("### 👤 Ingrese su nombre para comenzar")
+        nombre = st.text_input("Nombre completo:")
+        correo = st.text_input("Correo electrónico:") if es_privada else None
+
+        if st.button("Continuar"):
+            if not nombre or (es_privada and not correo):
+                st.warning("⚠️ Debe completar todos los campos.")
+            elif es_privada and not correo_autorizado(correo):
+                st.error("❌ Correo no autorizado.")
+            else:
+                st.session_state.nombre = nombre
+                st.session_state.correo = correo
+                st.session_state.nombre_confirmado = True
+                st.rerun()
+        st.stop()
+
+    name = st.session_state.nombre
+    correo = st.session_state.get("correo", None)
+
+    # Se recuerda la ronda en que votó: en la ronda siguiente puede volver a votar
+    if st.session_state.get("voto_registrado") == (code, s.get("round", 1)):
+        st.success("🎉 ¡Gracias por su votación!")
+        st.markdown(f"**ID de participación:** `{st.session_state.voto_id}`")
+        st.stop()
+
+    if ya_participo(name):
+        st.success("✅ Ya registró su participación.")
+        st.stop()
+
+    # Paso 3 — Mostrar recomendaciones
+    if "titulo" in s and s["titulo"].strip():
+        st.markdown(f"## {s['titulo']}")
+
+    st.markdown("### 📋 Recomendaciones a evaluar")
+    lista_recos = separar_recomendaciones(s["desc"])
+    por_item = s.get("por_item", False) and len(lista_recos) > 1
+    votos_items = []
+    # Delphi: voto anterior del participante y mediana del grupo, precalculados
+    previa = (retroalimentacion and retroalimentacion(name)) or []
+    if previa:
+        st.info(f"🔁 Ronda {s.get('round', 1)}: puede mantener o cambiar su voto "
+                "a la luz de la respuesta del grupo en la ronda anterior.")
+
+    for i, reco in enumerate(lista_recos):
+        st.markdown(f"""
+        <div style="background-color: #ffffff; padding: 15px; border-radius: 8px;
+                    box-shadow: 0 2px 5px rgba(0,0,0,0.1); margin-bottom: 15px;
+                    border-left: 4px solid #662D91;">
+            <strong>Recomendación {i+1}</strong>
+            <p>{reco}</p>
+        </div>
+        """, unsafe_allow_html=True)
+        if por_item:
+            if i < len(previa):
+                st.caption(texto_retroalimentacion(*previa[i]))
+            votos_items.append(st.radio(f"Nivel de acuerdo con la recomendación {i+1}:",
+                                        options=list(range(1, 10)), horizontal=True, key=f"voto_item_{i}",
+                                        index=(previa[i][0] or 1) - 1 if i < len(previa) else 0))
+
+    if s.get("imagenes_relacionadas"):
+        st.markdown("### 📷 Imágenes relacionadas")
+        for img in imagenes():
+            st.image(img, use_container_width=True)
+
+    # Paso 4 — Votación
+    if por_item:
+        voto = None
+    else:
+        st.markdown("### 📊 Votación global")
+        if previa:
+            st.caption(texto_retroalimentacion(*previa[0]))
+        voto = st.radio("Seleccione su nivel de acuerdo (1=Desacuerdo, 9=Acuerdo):",
+                        options=list(range(1, 10)), horizontal=True,
+                        index=(previa[0][0] or 1) - 1 if previa else 0)
+    comentario = st.text_area("Comentario (opcional):")
+    acepta = st.checkbox("Confirmo que leí las recomendaciones y voto con base en mi criterio")
+
+    # Semáforo explicativo
+    st.markdown(SEMAFORO_HTML, unsafe_allow_html=True)
+
+    if st.button("✅ Enviar voto"):
+        if not acepta:
+            st.warning("⚠️ Debe confirmar que leyó las recomendaciones.")
+            st.stop()
+
+        pid = registrar_voto(voto, comentario, name, correo, items=votos_items if por_item else None)
+
+        st.session_state.voto_registrado = (code, s.get("round", 1))
+        st.session_state.voto_id = pid
+
+        st.balloons()
+        st.success("🎉 ¡Gracias por su votación!")
+        st.markdown(f"**ID de participación:** `{pid}`")
+        st.stop()
+
+    # Evita que cargue el panel de administración
+    st.stop()
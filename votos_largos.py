@@ -0,0 +1,247 @@
+"""
+Exportación de todos los votos en formato largo (una fila por voto), para
+cargarlos en herramientas de análisis externas.
+
+Columnas:
+  sesion        código de la sesión
+  ronda         número de ronda (las archivadas incluidas)
+  participante  ID anónimo del participante
+  item          número de ítem dentro de la sesión (1 si la sesión tiene uno)
+  dominio       dominio GRADE ('' en las recomendaciones estándar)
+  voto          código del voto: 1–9 en la escala Likert; en los dominios
+                GRADE, posición (desde 1) de la opción en la lista del
+                dominio, y las opciones fuera de la lista a continuación;
+                0 = sin voto
+  fecha         fecha y hora del voto (vacía / NaT si no se registró)
+
+Los votos llegan en lotes (ver `_trozos`) y se escriben en trozos de a lo
+sumo `TROZO` filas, así la memoria no crece con el total exportado:
+
+  escribir_csv(lotes, destino)        CSV con encabezado
+  escribir_columnar(lotes, destino)   binario columnar (ver abajo)
+  TablaVotos(fuente)                  lector del binario, con mmap
+
+Estructura del binario (little-endian):
+
+  cabecera  MAGIC (6 bytes) | versión u16 | filas u64 | offset índice u64 | largo índice u64
+  columnas  cada columna contigua (filas × tamaño del tipo), alineada a 8 bytes;
+            sesion, participante y dominio van como códigos int32 / int16
+            sobre su lista de categorías
+  índice    JSON con el tipo y offset de cada columna, las categorías y los
+            metadatos, al final del archivo
+"""
+import json
+import mmap
+import shutil
+import struct
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # sin pyarrow el CSV se escribe con pandas (unas 7 veces más lento)
+    pa = None
+
+from estado_binario import FormatoInvalido
+
+
+MAGIC = b"CNSVOT"
+VERSION = 1
+CABECERA = struct.Struct("<6sHQQQ")
+TROZO = 100_000
+
+COLUMNAS = (
+    ("sesion",       "<i4"),
+    ("ronda",        "<i2"),
+    ("participante", "<i4"),
+    ("item",         "<i2"),
+    ("dominio",      "<i2"),
+    ("voto",         "i1"),
+    ("fecha",        "<M8[s]"),
+)
+CATEGORICAS = ("sesion", "participante", "dominio")
+
+
+class _Categorias:
+    """Diccionario valor → código, en el orden en que aparecen los valores."""
+
+    def __init__(self):
+        self.valores = []
+        self._codigos = {}
+
+    def codigo(self, valor) -> int:
+        c = self._codigos.get(valor)
+        if c is None:
+            c = self._codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return c
+
+    def codigos(self, valores) -> np.ndarray:
+        return np.fromiter((self.codigo(v) for v in valores), dtype=np.int32, count=len(valores))
+
+
+def _trozos(lotes, tam: int = TROZO):
+    """
+    Agrupa los lotes en trozos de a lo sumo `tam` filas, como dict de
+    columnas numpy (las de texto como arreglos de objetos).
+
+    Cada lote es un dict con: sesion, ronda, participantes (lista de IDs) y
+    votos (int8), y opcionalmente item, dominio y fechas (datetime64[s]).
+    """
+    pendientes, n = [], 0
+    for lote in lotes:
+        m = len(lote["votos"])
+        if not m:
+            continue
+        fechas = lote.get("fechas")
+        cols = {
+            "sesion":       np.full(m, lote["sesion"], dtype=object),
+            "ronda":        np.full(m, lote.get("ronda", 1), dtype=np.int16),
+            "participante": np.array(lote["participantes"], dtype=object),
+            "item":         np.full(m, lote.get("item", 1), dtype=np.int16),
+            "dominio":      np.full(m, lote.get("dominio", ""), dtype=object),
+            "voto":         np.asarray(lote["votos"], dtype=np.int8),
+            "fecha":        (np.full(m, np.datetime64("NaT"), dtype="datetime64[s]") if fechas is None
+                             else np.asarray(fechas, dtype="datetime64[s]")),
+        }
+        for ini in range(0, m, tam):
+            parte = {k: v[ini:ini + tam] for k, v in cols.items()} if m > tam else cols
+            pendientes.append(parte)
+            n += len(parte["voto"])
+            if n >= tam:
+                yield _unir(pendientes)
+                pendientes, n = [], 0
+    if pendientes:
+        yield _unir(pendientes)
+
+
+def _unir(partes: list) -> dict:
+    if len(partes) == 1:
+        return partes[0]
+    return {k: np.concatenate([p[k] for p in partes]) for k in partes[0]}
+
+
+def escribir_csv(lotes, destino, tam: int = TROZO) -> int:
+    """Escribe los votos como CSV en `destino` (ruta o archivo binario). Devuelve las filas."""
+    f = open(destino, "wb") if isinstance(destino, str) else destino
+    filas = 0
+    try:
+        encabezado = True
+        for trozo in _trozos(lotes, tam):
+            if pa is not None:
+                pa_csv.write_csv(pa.table(trozo), f, pa_csv.WriteOptions(
+                    include_header=encabezado, quoting_style="needed"))
+            else:
+                pd.DataFrame(trozo, copy=False).to_csv(f, header=encabezado, index=False,
+                                                       lineterminator="\n", encoding="utf-8")
+            encabezado = False
+            filas += len(trozo["voto"])
+        if encabezado:      # sin votos: sólo el encabezado
+            f.write((",".join(nombre for nombre, _ in COLUMNAS) + "\n").encode())
+    finally:
+        if f is not destino:
+            f.close()
+    return filas
+
+
+def escribir_columnar(lotes, destino, metadatos: dict = None, tam: int = TROZO) -> int:
+    """
+    Escribe los votos en el formato columnar en `destino` (ruta o archivo
+    binario). Cada columna se acumula en un temporal mientras llegan los
+    trozos y al final se copian una detrás de otra. Devuelve las filas.
+    """
+    categorias = {nombre: _Categorias() for nombre in CATEGORICAS}
+    temporales = {nombre: tempfile.TemporaryFile() for nombre, _ in COLUMNAS}
+    try:
+        filas = 0
+        for trozo in _trozos(lotes, tam):
+            for nombre, tipo in COLUMNAS:
+                col = trozo[nombre]
+                if nombre in categorias:
+                    col = categorias[nombre].codigos(col)
+                temporales[nombre].write(np.ascontiguousarray(col, dtype=tipo).tobytes())
+            filas += len(trozo["voto"])
+
+        f = open(destino, "wb") if isinstance(destino, str) else destino
+        try:
+            inicio = f.tell()
+            f.write(CABECERA.pack(MAGIC, VERSION, 0, 0, 0))
+            indice = {"columnas": {}, "metadatos": metadatos or {}}
+            for nombre, tipo in COLUMNAS:
+                f.write(b"\0" * (-(f.tell() - inicio) % 8))
+                indice["columnas"][nombre] = {"tipo": tipo, "offset": f.tell() - inicio}
+                if nombre in categorias:
+                    indice["columnas"][nombre]["categorias"] = categorias[nombre].valores
+                temporales[nombre].seek(0)
+                shutil.copyfileobj(temporales[nombre], f, 1 << 20)
+
+            datos_indice = json.dumps(indice, ensure_ascii=False, separators=(",", ":")).encode()
+            off_indice = f.tell() - inicio
+            f.write(datos_indice)
+            fin = f.tell()
+            f.seek(inicio)
+            f.write(CABECERA.pack(MAGIC, VERSION, filas, off_indice, len(datos_indice)))
+            f.seek(fin)
+        finally:
+            if f is not destino:
+                f.close()
+    finally:
+        for tmp in temporales.values():
+            tmp.close()
+    return filas
+
+
+class TablaVotos:
+    """
+    Lector del binario columnar. `fuente` puede ser una ruta (se mapea con
+    mmap) o un objeto con buffer (bytes, BytesIO). Las columnas son vistas
+    sobre el archivo, sin copias.
+    """
+
+    def __init__(self, fuente):
+        if isinstance(fuente, str):
+            with open(fuente, "rb") as f:
+                self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        elif hasattr(fuente, "getbuffer"):
+            self._buf = fuente.getbuffer()
+        else:
+            self._buf = memoryview(fuente)
+        self._vista = memoryview(self._buf)
+        if len(self._vista) < CABECERA.size:
+            raise FormatoInvalido("Archivo de votos truncado.")
+        magic, version, filas, off, largo = CABECERA.unpack_from(self._vista, 0)
+        if magic != MAGIC:
+            raise FormatoInvalido("No es un archivo de votos válido.")
+        if version > VERSION:
+            raise FormatoInvalido(f"Versión de archivo de votos no soportada: {version}")
+        self.version = version
+        self.filas = filas
+        self._indice = json.loads(bytes(self._vista[off:off + largo]))
+        self.metadatos = self._indice.get("metadatos", {})
+
+    def __len__(self) -> int:
+        return self.filas
+
+    def columnas(self) -> list:
+        return list(self._indice["columnas"])
+
+    def columna(self, nombre: str) -> np.ndarray:
+        """Valores de la columna (códigos, en las categóricas) como vista de sólo lectura."""
+        col = self._indice["columnas"][nombre]
+        return np.frombuffer(self._vista, dtype=np.dtype(col["tipo"]), count=self.filas,
+                             offset=col["offset"])
+
+    def categorias(self, nombre: str) -> list:
+        return self._indice["columnas"][nombre].get("categorias")
+
+    def a_dataframe(self, columnas: list = None) -> pd.DataFrame:
+        """DataFrame con las columnas pedidas; las categóricas como pd.Categorical."""
+        datos = {}
+        for nombre in columnas or self.columnas():
+            valores = self.columna(nombre)
+            cats = self.categorias(nombre)
+            datos[nombre] = valores if cats is None else pd.Categorical.from_codes(valores, cats)
+        return pd.DataFrame(datos, copy=False)